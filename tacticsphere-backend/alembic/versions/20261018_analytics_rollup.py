@@ -0,0 +1,153 @@
+"""add analytics_daily_rollup table
+
+Revision ID: 20261018_analytics_rollup
+Revises: 20250115_add_subpilares
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_analytics_rollup"
+down_revision = "20250115_add_subpilares"
+branch_labels = None
+depends_on = None
+
+
+def _likert_value(raw):
+    if raw is None:
+        return None
+    try:
+        value = float(str(raw).replace(",", "."))
+    except ValueError:
+        return None
+    if value != value or value < 1 or value > 5:
+        return None
+    return value
+
+
+def _backfill(conn) -> None:
+    """Carga inicial del rollup a partir de las respuestas LIKERT existentes."""
+    rows = conn.execute(
+        sa.text(
+            """
+            SELECT r.valor, r.fecha_respuesta, r.empleado_id,
+                   p.peso AS pregunta_peso, p.pilar_id, pi.peso AS pilar_peso,
+                   e.departamento_id, a.empresa_id, a.alcance_tipo, a.alcance_id, a.anonimo
+            FROM respuestas r
+            JOIN preguntas p ON p.id = r.pregunta_id
+            JOIN pilares pi ON pi.id = p.pilar_id
+            JOIN asignaciones a ON a.id = r.asignacion_id
+            LEFT JOIN empleados e ON e.id = r.empleado_id
+            WHERE p.tipo = 'LIKERT'
+            """
+        ).columns(fecha_respuesta=sa.DateTime, anonimo=sa.Boolean)
+    )
+    groups = {}
+    for row in rows:
+        value = _likert_value(row.valor)
+        if value is None or row.fecha_respuesta is None:
+            continue
+        weight = float(row.pregunta_peso or 1) * float(row.pilar_peso or 1)
+        if weight <= 0:
+            continue
+        anonimo = bool(row.anonimo)
+        departamento_id = row.departamento_id if not anonimo else None
+        if departamento_id is None and row.alcance_tipo == "DEPARTAMENTO":
+            departamento_id = row.alcance_id
+        key = (row.empresa_id, row.fecha_respuesta.date(), row.pilar_id, departamento_id, row.empleado_id, anonimo)
+        level = min(max(int(round(value)), 1), 5)
+        entry = groups.setdefault(key, [0.0] * 7)
+        entry[0] += value * weight
+        entry[1] += weight
+        entry[1 + level] += weight
+
+    rollup = sa.table(
+        "analytics_daily_rollup",
+        sa.column("empresa_id", sa.Integer),
+        sa.column("dia", sa.Date),
+        sa.column("pilar_id", sa.Integer),
+        sa.column("departamento_id", sa.Integer),
+        sa.column("empleado_id", sa.Integer),
+        sa.column("anonimo", sa.Boolean),
+        sa.column("value_sum", sa.Float),
+        sa.column("weight_sum", sa.Float),
+        sa.column("level_1", sa.Float),
+        sa.column("level_2", sa.Float),
+        sa.column("level_3", sa.Float),
+        sa.column("level_4", sa.Float),
+        sa.column("level_5", sa.Float),
+    )
+    payload = [
+        {
+            "empresa_id": key[0],
+            "dia": key[1],
+            "pilar_id": key[2],
+            "departamento_id": key[3],
+            "empleado_id": key[4],
+            "anonimo": key[5],
+            "value_sum": data[0],
+            "weight_sum": data[1],
+            "level_1": data[2],
+            "level_2": data[3],
+            "level_3": data[4],
+            "level_4": data[5],
+            "level_5": data[6],
+        }
+        for key, data in groups.items()
+    ]
+    chunk = 1000
+    for start in range(0, len(payload), chunk):
+        op.bulk_insert(rollup, payload[start:start + chunk])
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    if "analytics_daily_rollup" in inspector.get_table_names():
+        return
+
+    op.create_table(
+        "analytics_daily_rollup",
+        sa.Column("id", sa.Integer(), primary_key=True, nullable=False),
+        sa.Column("empresa_id", sa.Integer(), sa.ForeignKey("empresas.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("dia", sa.Date(), nullable=False),
+        sa.Column("pilar_id", sa.Integer(), sa.ForeignKey("pilares.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("departamento_id", sa.Integer(), nullable=True),
+        sa.Column("empleado_id", sa.Integer(), sa.ForeignKey("empleados.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("anonimo", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("value_sum", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("weight_sum", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("level_1", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("level_2", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("level_3", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("level_4", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("level_5", sa.Float(), nullable=False, server_default="0"),
+        sa.UniqueConstraint(
+            "empresa_id", "dia", "pilar_id", "departamento_id", "empleado_id", "anonimo",
+            name="uq_rollup_grupo",
+        ),
+    )
+    op.create_index("ix_analytics_daily_rollup_id", "analytics_daily_rollup", ["id"], unique=False)
+    op.create_index("ix_analytics_daily_rollup_empresa_id", "analytics_daily_rollup", ["empresa_id"], unique=False)
+    op.create_index("ix_analytics_daily_rollup_pilar_id", "analytics_daily_rollup", ["pilar_id"], unique=False)
+    op.create_index(
+        "ix_analytics_daily_rollup_departamento_id", "analytics_daily_rollup", ["departamento_id"], unique=False
+    )
+    op.create_index("ix_analytics_daily_rollup_empleado_id", "analytics_daily_rollup", ["empleado_id"], unique=False)
+    op.create_index("ix_rollup_empresa_dia", "analytics_daily_rollup", ["empresa_id", "dia"], unique=False)
+
+    _backfill(conn)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_rollup_empresa_dia", table_name="analytics_daily_rollup")
+    op.drop_index("ix_analytics_daily_rollup_empleado_id", table_name="analytics_daily_rollup")
+    op.drop_index("ix_analytics_daily_rollup_departamento_id", table_name="analytics_daily_rollup")
+    op.drop_index("ix_analytics_daily_rollup_pilar_id", table_name="analytics_daily_rollup")
+    op.drop_index("ix_analytics_daily_rollup_empresa_id", table_name="analytics_daily_rollup")
+    op.drop_index("ix_analytics_daily_rollup_id", table_name="analytics_daily_rollup")
+    op.drop_table("analytics_daily_rollup")
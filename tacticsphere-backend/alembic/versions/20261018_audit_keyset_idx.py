@@ -0,0 +1,31 @@
+"""add composite (created_at, id) index to audit_logs
+
+Revision ID: 20261018_audit_keyset_idx
+Revises: 20261018_progress_counters
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_audit_keyset_idx"
+down_revision = "20261018_progress_counters"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    # audit_logs la crea create_all al arrancar; si aún no existe, se creará con el índice
+    if "audit_logs" not in inspector.get_table_names():
+        return
+    indexes = {idx["name"] for idx in inspector.get_indexes("audit_logs")}
+    if "ix_audit_logs_created_at_id" not in indexes:
+        op.create_index("ix_audit_logs_created_at_id", "audit_logs", ["created_at", "id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_audit_logs_created_at_id", table_name="audit_logs")
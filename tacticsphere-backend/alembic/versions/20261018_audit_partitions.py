@@ -0,0 +1,149 @@
+"""partition audit_logs by month on PostgreSQL
+
+Revision ID: 20261018_audit_partitions
+Revises: 20261018_audit_search_idx
+Create Date: 2026-10-18 00:00:00.000000
+
+Solo PostgreSQL: convierte audit_logs en una tabla particionada por
+RANGE(created_at) con una partición por mes (audit_logs_pYYYYMM) y una DEFAULT.
+La PK pasa a (id, created_at) porque debe incluir la clave de partición.
+En SQLite la tabla queda igual; la retención trabaja por rangos de created_at.
+"""
+
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_audit_partitions"
+down_revision = "20261018_audit_search_idx"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 2
+
+INDEXES = [
+    ("ix_audit_logs_id", "id"),
+    ("ix_audit_logs_created_at", "created_at"),
+    ("ix_audit_logs_user_id", "user_id"),
+    ("ix_audit_logs_empresa_id", "empresa_id"),
+    ("ix_audit_logs_action", "action"),
+    ("ix_audit_logs_entity_type", "entity_type"),
+    ("ix_audit_logs_entity_id", "entity_id"),
+    ("ix_audit_logs_created_at_id", "created_at, id"),
+]
+TRGM_COLUMNS = ("notes", "user_email", "entity_type", "path")
+COLUMNS = (
+    "id, created_at, user_id, user_email, user_role, empresa_id, action, entity_type, entity_id, "
+    "notes, ip, user_agent, path, method, diff_before, diff_after, extra"
+)
+
+
+def _month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def _add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + (value.month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _create_table_sql(sequence: str, partitioned: bool) -> str:
+    pk = "PRIMARY KEY (id, created_at)" if partitioned else "PRIMARY KEY (id)"
+    suffix = " PARTITION BY RANGE (created_at)" if partitioned else ""
+    return f"""
+        CREATE TABLE audit_logs (
+            id INTEGER NOT NULL DEFAULT nextval('{sequence}'),
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            user_id INTEGER REFERENCES usuarios(id) ON DELETE SET NULL,
+            user_email VARCHAR(255),
+            user_role VARCHAR(50),
+            empresa_id INTEGER,
+            action audit_action_enum NOT NULL,
+            entity_type VARCHAR(120),
+            entity_id INTEGER,
+            notes TEXT,
+            ip VARCHAR(64),
+            user_agent VARCHAR(512),
+            path VARCHAR(256),
+            method VARCHAR(16),
+            diff_before JSON,
+            diff_after JSON,
+            extra JSON,
+            {pk}
+        ){suffix}
+    """
+
+
+def _create_indexes(conn) -> None:
+    for name, cols in INDEXES:
+        op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON audit_logs ({cols})")
+    has_trgm = conn.execute(sa.text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).scalar()
+    if has_trgm:
+        for col in TRGM_COLUMNS:
+            op.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_audit_logs_{col}_trgm "
+                f"ON audit_logs USING gin (lower({col}) gin_trgm_ops)"
+            )
+
+
+def _swap_table(conn, partitioned: bool) -> None:
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_old")
+    sequence = conn.execute(sa.text("SELECT pg_get_serial_sequence('audit_logs_old', 'id')")).scalar()
+    if sequence is None:
+        sequence = "audit_logs_id_seq"
+        op.execute(f"CREATE SEQUENCE IF NOT EXISTS {sequence}")
+        op.execute(f"SELECT setval('{sequence}', COALESCE((SELECT MAX(id) FROM audit_logs_old), 0) + 1, false)")
+    else:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    # Los índices conservan su nombre en la tabla vieja
+    for name, _ in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    for col in TRGM_COLUMNS:
+        op.execute(f"DROP INDEX IF EXISTS ix_audit_logs_{col}_trgm")
+
+    op.execute(_create_table_sql(sequence, partitioned))
+    if partitioned:
+        oldest = conn.execute(sa.text("SELECT MIN(created_at) FROM audit_logs_old")).scalar()
+        current = _month_start(datetime.utcnow())
+        start = _month_start(oldest) if oldest and oldest < current else current
+        end = _add_months(current, MONTHS_AHEAD + 1)
+        while start < end:
+            op.execute(
+                f"CREATE TABLE audit_logs_p{start:%Y%m} PARTITION OF audit_logs "
+                f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{_add_months(start, 1):%Y-%m-%d}')"
+            )
+            start = _add_months(start, 1)
+        op.execute("CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT")
+
+    op.execute(f"INSERT INTO audit_logs ({COLUMNS}) SELECT {COLUMNS} FROM audit_logs_old")
+    op.execute("DROP TABLE audit_logs_old")
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY audit_logs.id")
+    _create_indexes(conn)
+
+
+def _is_partitioned(conn) -> bool:
+    return bool(
+        conn.execute(
+            sa.text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('audit_logs')")
+        ).scalar()
+    )
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if conn.dialect.name != "postgresql":
+        return
+    if "audit_logs" not in inspect(conn).get_table_names() or _is_partitioned(conn):
+        return
+    _swap_table(conn, partitioned=True)
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if conn.dialect.name != "postgresql" or not _is_partitioned(conn):
+        return
+    _swap_table(conn, partitioned=False)
@@ -0,0 +1,70 @@
+"""add text search index for audit_logs (FTS5 trigram on SQLite, pg_trgm on PostgreSQL)
+
+Revision ID: 20261018_audit_search_idx
+Revises: 20261018_audit_keyset_idx
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_audit_search_idx"
+down_revision = "20261018_audit_keyset_idx"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ("notes", "user_email", "entity_type", "path")
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    tables = set(inspector.get_table_names())
+    # audit_logs la crea create_all al arrancar; ahí también se asegura el índice
+    if "audit_logs" not in tables:
+        return
+
+    cols = ", ".join(COLUMNS)
+    new_vals = ", ".join(f"new.{c}" for c in COLUMNS)
+    old_vals = ", ".join(f"old.{c}" for c in COLUMNS)
+
+    if conn.dialect.name == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS audit_logs_fts USING fts5("
+            f"{cols}, content='audit_logs', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS audit_logs_fts_ai AFTER INSERT ON audit_logs BEGIN "
+            f"INSERT INTO audit_logs_fts(rowid, {cols}) VALUES (new.id, {new_vals}); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS audit_logs_fts_ad AFTER DELETE ON audit_logs BEGIN "
+            f"INSERT INTO audit_logs_fts(audit_logs_fts, rowid, {cols}) VALUES ('delete', old.id, {old_vals}); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS audit_logs_fts_au AFTER UPDATE ON audit_logs BEGIN "
+            f"INSERT INTO audit_logs_fts(audit_logs_fts, rowid, {cols}) VALUES ('delete', old.id, {old_vals}); "
+            f"INSERT INTO audit_logs_fts(rowid, {cols}) VALUES (new.id, {new_vals}); END"
+        )
+        if "audit_logs_fts" not in tables:
+            op.execute("INSERT INTO audit_logs_fts(audit_logs_fts) VALUES ('rebuild')")
+    elif conn.dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for col in COLUMNS:
+            op.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_audit_logs_{col}_trgm "
+                f"ON audit_logs USING gin (lower({col}) gin_trgm_ops)"
+            )
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if conn.dialect.name == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            op.execute(f"DROP TRIGGER IF EXISTS audit_logs_fts_{suffix}")
+        op.execute("DROP TABLE IF EXISTS audit_logs_fts")
+    elif conn.dialect.name == "postgresql":
+        for col in COLUMNS:
+            op.execute(f"DROP INDEX IF EXISTS ix_audit_logs_{col}_trgm")
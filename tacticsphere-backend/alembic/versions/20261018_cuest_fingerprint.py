@@ -0,0 +1,34 @@
+"""add preguntas_fingerprint to cuestionarios
+
+Revision ID: 20261018_cuest_fingerprint
+Revises: 20261018_respuesta_score
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_cuest_fingerprint"
+down_revision = "20261018_respuesta_score"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Sin backfill: con la huella en NULL el primer /survey/simple/begin sincroniza y la guarda
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    columns = {col["name"] for col in inspector.get_columns("cuestionarios")}
+    if "preguntas_fingerprint" not in columns:
+        op.add_column(
+            "cuestionarios",
+            sa.Column("preguntas_fingerprint", sa.String(length=64), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("cuestionarios") as batch_op:
+        batch_op.drop_column("preguntas_fingerprint")
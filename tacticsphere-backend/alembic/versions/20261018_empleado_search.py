@@ -0,0 +1,101 @@
+"""add empleados.search_text with trigram search index
+
+Revision ID: 20261018_empleado_search
+Revises: 20261018_audit_partitions
+Create Date: 2026-10-18 00:00:00.000000
+
+search_text = nombre + apellidos + email + RUT normalizados (minúsculas, sin
+tildes, RUT sin puntos ni guion). SQLite: tabla FTS5 trigram sincronizada por
+triggers. PostgreSQL: índice GIN pg_trgm sobre lower(search_text).
+"""
+
+import re
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_empleado_search"
+down_revision = "20261018_audit_partitions"
+branch_labels = None
+depends_on = None
+
+
+def _normalize(value):
+    text = unicodedata.normalize("NFKD", value or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+def _search_text(row) -> str:
+    parts = (
+        _normalize(row.nombre),
+        _normalize(row.apellidos),
+        _normalize(row.email),
+        re.sub(r"[^0-9k]", "", _normalize(row.rut)),
+    )
+    return " ".join(part for part in parts if part)
+
+
+def _backfill(conn) -> None:
+    rows = conn.execute(sa.text("SELECT id, nombre, apellidos, email, rut FROM empleados")).all()
+    payload = [{"b_id": row.id, "b_search_text": _search_text(row)} for row in rows]
+    chunk = 1000
+    for start in range(0, len(payload), chunk):
+        conn.execute(
+            sa.text("UPDATE empleados SET search_text = :b_search_text WHERE id = :b_id"),
+            payload[start:start + chunk],
+        )
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    tables = set(inspector.get_table_names())
+    if "empleados" not in tables:
+        return
+    if "search_text" not in {col["name"] for col in inspector.get_columns("empleados")}:
+        op.add_column("empleados", sa.Column("search_text", sa.Text(), nullable=True))
+        _backfill(conn)
+
+    if conn.dialect.name == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS empleados_fts USING fts5("
+            "search_text, content='empleados', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS empleados_fts_ai AFTER INSERT ON empleados BEGIN "
+            "INSERT INTO empleados_fts(rowid, search_text) VALUES (new.id, new.search_text); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS empleados_fts_ad AFTER DELETE ON empleados BEGIN "
+            "INSERT INTO empleados_fts(empleados_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS empleados_fts_au AFTER UPDATE ON empleados BEGIN "
+            "INSERT INTO empleados_fts(empleados_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); "
+            "INSERT INTO empleados_fts(rowid, search_text) VALUES (new.id, new.search_text); END"
+        )
+        if "empleados_fts" not in tables:
+            op.execute("INSERT INTO empleados_fts(empleados_fts) VALUES ('rebuild')")
+    elif conn.dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_empleados_search_text_trgm "
+            "ON empleados USING gin (lower(search_text) gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if conn.dialect.name == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            op.execute(f"DROP TRIGGER IF EXISTS empleados_fts_{suffix}")
+        op.execute("DROP TABLE IF EXISTS empleados_fts")
+    elif conn.dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_empleados_search_text_trgm")
+    with op.batch_alter_table("empleados") as batch_op:
+        batch_op.drop_column("search_text")
@@ -0,0 +1,67 @@
+"""add progress_counters table
+
+Revision ID: 20261018_progress_counters
+Revises: 20261018_cuest_fingerprint
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_progress_counters"
+down_revision = "20261018_cuest_fingerprint"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    if "progress_counters" in inspector.get_table_names():
+        return
+
+    op.create_table(
+        "progress_counters",
+        sa.Column("id", sa.Integer(), primary_key=True, nullable=False),
+        sa.Column("asignacion_id", sa.Integer(), sa.ForeignKey("asignaciones.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("empleado_id", sa.Integer(), sa.ForeignKey("empleados.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("pilar_id", sa.Integer(), sa.ForeignKey("pilares.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("respondidas", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("score_sum", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("score_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.UniqueConstraint("asignacion_id", "empleado_id", "pilar_id", name="uq_progress_asig_emp_pilar"),
+    )
+    op.create_index("ix_progress_counters_id", "progress_counters", ["id"], unique=False)
+    op.create_index("ix_progress_counters_asignacion_id", "progress_counters", ["asignacion_id"], unique=False)
+    op.create_index("ix_progress_counters_empleado_id", "progress_counters", ["empleado_id"], unique=False)
+    op.create_index("ix_progress_counters_pilar_id", "progress_counters", ["pilar_id"], unique=False)
+
+    # Carga inicial: misma normalización 0..1 que app.crud._progress_score_expr
+    op.execute(
+        """
+        INSERT INTO progress_counters (asignacion_id, empleado_id, pilar_id, respondidas, score_sum, score_count)
+        SELECT r.asignacion_id, r.empleado_id, p.pilar_id,
+               COUNT(r.id),
+               COALESCE(SUM(CASE
+                   WHEN p.tipo = 'LIKERT' AND r.score >= 1 AND r.score <= 5 THEN (r.score - 1.0) / 4.0
+                   WHEN p.tipo = 'LIKERT' AND r.score < 1 THEN r.score
+                   WHEN p.tipo = 'LIKERT' THEN r.score / 100.0
+                   ELSE r.score
+               END), 0.0),
+               COUNT(r.score)
+        FROM respuestas r
+        JOIN preguntas p ON p.id = r.pregunta_id
+        GROUP BY r.asignacion_id, r.empleado_id, p.pilar_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_progress_counters_pilar_id", table_name="progress_counters")
+    op.drop_index("ix_progress_counters_empleado_id", table_name="progress_counters")
+    op.drop_index("ix_progress_counters_asignacion_id", table_name="progress_counters")
+    op.drop_index("ix_progress_counters_id", table_name="progress_counters")
+    op.drop_table("progress_counters")
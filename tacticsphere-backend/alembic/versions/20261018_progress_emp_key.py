@@ -0,0 +1,96 @@
+"""add non-null empleado_key to progress_counters
+
+Revision ID: 20261018_progress_emp_key
+Revises: 20261018_rollup_alcance
+Create Date: 2026-10-18 00:00:00.000000
+
+submit_bulk_answers suma los deltas en la base (INSERT ... ON CONFLICT y
+UPDATE col = col + delta). La restricción única usaba empleado_id, que es NULL
+en respuestas anónimas y no dispara el conflicto; pasa a empleado_key
+(empleado_id al escribir, 0 si es anónima). Es una tabla derivada: se recrea y
+se recalcula desde las respuestas igual que app.crud.refresh_progress_counters.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_progress_emp_key"
+down_revision = "20261018_rollup_alcance"
+branch_labels = None
+depends_on = None
+
+TABLE = "progress_counters"
+
+
+def _create_table(with_key: bool) -> None:
+    columns = [
+        sa.Column("id", sa.Integer(), primary_key=True, nullable=False),
+        sa.Column("asignacion_id", sa.Integer(), sa.ForeignKey("asignaciones.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("empleado_id", sa.Integer(), sa.ForeignKey("empleados.id", ondelete="SET NULL"), nullable=True),
+    ]
+    if with_key:
+        columns.append(sa.Column("empleado_key", sa.Integer(), nullable=False, server_default="0"))
+    columns += [
+        sa.Column("pilar_id", sa.Integer(), sa.ForeignKey("pilares.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("respondidas", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("score_sum", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("score_count", sa.Integer(), nullable=False, server_default="0"),
+    ]
+    key = "empleado_key" if with_key else "empleado_id"
+    op.create_table(
+        TABLE,
+        *columns,
+        sa.UniqueConstraint("asignacion_id", key, "pilar_id", name="uq_progress_asig_emp_pilar"),
+    )
+    op.create_index("ix_progress_counters_id", TABLE, ["id"], unique=False)
+    op.create_index("ix_progress_counters_asignacion_id", TABLE, ["asignacion_id"], unique=False)
+    op.create_index("ix_progress_counters_empleado_id", TABLE, ["empleado_id"], unique=False)
+    op.create_index("ix_progress_counters_pilar_id", TABLE, ["pilar_id"], unique=False)
+
+
+def _rebuild(with_key: bool) -> None:
+    """Misma normalización 0..1 que app.crud._progress_score_expr."""
+    key_col = ", empleado_key" if with_key else ""
+    key_expr = ", COALESCE(r.empleado_id, 0)" if with_key else ""
+    op.execute(
+        f"""
+        INSERT INTO {TABLE} (asignacion_id, empleado_id{key_col}, pilar_id, respondidas, score_sum, score_count)
+        SELECT r.asignacion_id, r.empleado_id{key_expr}, p.pilar_id,
+               COUNT(r.id),
+               COALESCE(SUM(CASE
+                   WHEN p.tipo = 'LIKERT' AND r.score >= 1 AND r.score <= 5 THEN (r.score - 1.0) / 4.0
+                   WHEN p.tipo = 'LIKERT' AND r.score < 1 THEN r.score
+                   WHEN p.tipo = 'LIKERT' THEN r.score / 100.0
+                   ELSE r.score
+               END), 0.0),
+               COUNT(r.score)
+        FROM respuestas r
+        JOIN preguntas p ON p.id = r.pregunta_id
+        GROUP BY r.asignacion_id, r.empleado_id, p.pilar_id
+        """
+    )
+
+
+def _has_key(conn) -> bool:
+    return "empleado_key" in {col["name"] for col in inspect(conn).get_columns(TABLE)}
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if TABLE not in inspect(conn).get_table_names() or _has_key(conn):
+        return
+    op.drop_table(TABLE)
+    _create_table(with_key=True)
+    _rebuild(with_key=True)
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if TABLE not in inspect(conn).get_table_names() or not _has_key(conn):
+        return
+    op.drop_table(TABLE)
+    _create_table(with_key=False)
+    _rebuild(with_key=False)
@@ -0,0 +1,96 @@
+"""add respuestas.score numeric column
+
+Revision ID: 20261018_respuesta_score
+Revises: 20261018_analytics_rollup
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_respuesta_score"
+down_revision = "20261018_analytics_rollup"
+branch_labels = None
+depends_on = None
+
+CHUNK_SIZE = 1000
+
+# Mismos conjuntos que app.crud (_SI_NO_TRUE / _SI_NO_FALSE)
+SI_NO_TRUE = {"1", "si", "sÃ­", "true", "t", "yes", "y"}
+SI_NO_FALSE = {"0", "no", "false", "f", "not", "n"}
+
+
+def _score(tipo, valor):
+    """Copia de app.crud.respuesta_score (las migraciones no importan la app)."""
+    if valor is None:
+        return None
+    raw = str(valor).strip()
+    if not raw:
+        return None
+    if tipo == "LIKERT":
+        try:
+            num = float(raw.replace(",", "."))
+        except ValueError:
+            return None
+        # 1..5; se conservan valores heredados en escala 0..1 o 0..100
+        if 0 <= num <= 100:
+            return num
+        return None
+    if tipo == "SI_NO":
+        lowered = raw.lower()
+        if lowered in SI_NO_TRUE:
+            return 1.0
+        if lowered in SI_NO_FALSE:
+            return 0.0
+    return None
+
+
+def _backfill(conn) -> None:
+    """Completa score por bloques de ids para no cargar toda la tabla en memoria."""
+    select_chunk = sa.text(
+        """
+        SELECT r.id, r.valor, p.tipo
+        FROM respuestas r
+        JOIN preguntas p ON p.id = r.pregunta_id
+        WHERE r.id > :last_id AND r.valor IS NOT NULL
+        ORDER BY r.id
+        LIMIT :limit
+        """
+    )
+    update_stmt = sa.text("UPDATE respuestas SET score = :score WHERE id = :id")
+    last_id = 0
+    while True:
+        rows = conn.execute(select_chunk, {"last_id": last_id, "limit": CHUNK_SIZE}).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        payload = []
+        for row in rows:
+            score = _score(row.tipo, row.valor)
+            if score is not None:
+                payload.append({"id": row.id, "score": score})
+        if payload:
+            conn.execute(update_stmt, payload)
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    columns = {col["name"] for col in inspector.get_columns("respuestas")}
+    if "score" in columns:
+        return
+
+    op.add_column("respuestas", sa.Column("score", sa.Float(), nullable=True))
+    _backfill(conn)
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    columns = {col["name"] for col in inspector.get_columns("respuestas")}
+    if "score" in columns:
+        with op.batch_alter_table("respuestas") as batch_op:
+            batch_op.drop_column("score")
@@ -0,0 +1,127 @@
+"""add assignment-scope department to analytics_daily_rollup
+
+Revision ID: 20261018_rollup_alcance
+Revises: 20261018_empleado_search
+Create Date: 2026-10-18 00:00:00.000000
+
+El filtro por departamento del dashboard incluye, como antes del rollup, las
+respuestas a asignaciones con alcance DEPARTAMENTO aunque el empleado sea de
+otro departamento. El rollup guarda ese departamento en su propia columna
+(alcance_departamento_id, 0 si la asignación no es por departamento), que pasa
+a formar parte del grupo. Es una tabla derivada: se recrea y se recalcula desde
+las respuestas con la misma agrupación que app.crud.refresh_analytics_rollup.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_rollup_alcance"
+down_revision = "20261018_empleado_search"
+branch_labels = None
+depends_on = None
+
+TABLE = "analytics_daily_rollup"
+
+
+def _create_table(with_alcance: bool) -> None:
+    group = ["empresa_id", "dia", "pilar_id", "departamento_id", "empleado_id", "anonimo"]
+    columns = [
+        sa.Column("id", sa.Integer(), primary_key=True, nullable=False),
+        sa.Column("empresa_id", sa.Integer(), sa.ForeignKey("empresas.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("dia", sa.Date(), nullable=False),
+        sa.Column("pilar_id", sa.Integer(), sa.ForeignKey("pilares.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("departamento_id", sa.Integer(), nullable=True),
+    ]
+    if with_alcance:
+        columns.append(sa.Column("alcance_departamento_id", sa.Integer(), nullable=False, server_default="0"))
+        group.insert(4, "alcance_departamento_id")
+    columns += [
+        sa.Column("empleado_id", sa.Integer(), sa.ForeignKey("empleados.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("anonimo", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("value_sum", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("weight_sum", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("level_1", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("level_2", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("level_3", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("level_4", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("level_5", sa.Float(), nullable=False, server_default="0"),
+    ]
+    op.create_table(TABLE, *columns, sa.UniqueConstraint(*group, name="uq_rollup_grupo"))
+    op.create_index("ix_analytics_daily_rollup_id", TABLE, ["id"], unique=False)
+    op.create_index("ix_analytics_daily_rollup_empresa_id", TABLE, ["empresa_id"], unique=False)
+    op.create_index("ix_analytics_daily_rollup_pilar_id", TABLE, ["pilar_id"], unique=False)
+    op.create_index("ix_analytics_daily_rollup_departamento_id", TABLE, ["departamento_id"], unique=False)
+    if with_alcance:
+        op.create_index(
+            "ix_analytics_daily_rollup_alcance_departamento_id", TABLE, ["alcance_departamento_id"], unique=False
+        )
+    op.create_index("ix_analytics_daily_rollup_empleado_id", TABLE, ["empleado_id"], unique=False)
+    op.create_index("ix_rollup_empresa_dia", TABLE, ["empresa_id", "dia"], unique=False)
+
+
+def _rebuild(with_alcance: bool) -> None:
+    """Mismo cálculo que refresh_analytics_rollup (Respuesta.score, peso nulo o 0 cuenta como 1)."""
+    alcance_col = ", alcance_departamento_id" if with_alcance else ""
+    alcance_expr = (
+        ", CASE WHEN a.alcance_tipo = 'DEPARTAMENTO' THEN COALESCE(a.alcance_id, 0) ELSE 0 END "
+        "AS alcance_departamento_id"
+        if with_alcance
+        else ""
+    )
+    alcance_group = ", s.alcance_departamento_id" if with_alcance else ""
+    op.execute(
+        f"""
+        INSERT INTO {TABLE} (empresa_id, dia, pilar_id, departamento_id{alcance_col}, empleado_id, anonimo,
+                             value_sum, weight_sum, level_1, level_2, level_3, level_4, level_5)
+        SELECT s.empresa_id, s.dia, s.pilar_id, s.departamento_id{alcance_group}, s.empleado_id, s.anonimo,
+               SUM(s.score * s.weight), SUM(s.weight),
+               SUM(CASE WHEN s.score < 1.5 THEN s.weight ELSE 0 END),
+               SUM(CASE WHEN s.score >= 1.5 AND s.score <= 2.5 THEN s.weight ELSE 0 END),
+               SUM(CASE WHEN s.score > 2.5 AND s.score < 3.5 THEN s.weight ELSE 0 END),
+               SUM(CASE WHEN s.score >= 3.5 AND s.score <= 4.5 THEN s.weight ELSE 0 END),
+               SUM(CASE WHEN s.score > 4.5 THEN s.weight ELSE 0 END)
+        FROM (
+            SELECT a.empresa_id, DATE(r.fecha_respuesta) AS dia, p.pilar_id,
+                   CASE
+                       WHEN NOT a.anonimo AND e.departamento_id IS NOT NULL THEN e.departamento_id
+                       WHEN a.alcance_tipo = 'DEPARTAMENTO' THEN a.alcance_id
+                   END AS departamento_id{alcance_expr},
+                   r.empleado_id, a.anonimo, r.score,
+                   COALESCE(NULLIF(p.peso, 0), 1) * COALESCE(NULLIF(pi.peso, 0), 1) AS weight
+            FROM respuestas r
+            JOIN preguntas p ON p.id = r.pregunta_id
+            JOIN pilares pi ON pi.id = p.pilar_id
+            JOIN asignaciones a ON a.id = r.asignacion_id
+            LEFT JOIN empleados e ON e.id = r.empleado_id
+            WHERE p.tipo = 'LIKERT' AND r.fecha_respuesta IS NOT NULL AND r.score IS NOT NULL
+        ) s
+        WHERE s.score >= 1 AND s.score <= 5 AND s.weight > 0
+        GROUP BY s.empresa_id, s.dia, s.pilar_id, s.departamento_id{alcance_group}, s.empleado_id, s.anonimo
+        HAVING SUM(s.weight) > 1e-9
+        """
+    )
+
+
+def _has_alcance(conn) -> bool:
+    return "alcance_departamento_id" in {col["name"] for col in inspect(conn).get_columns(TABLE)}
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if TABLE not in inspect(conn).get_table_names() or _has_alcance(conn):
+        return
+    op.drop_table(TABLE)
+    _create_table(with_alcance=True)
+    _rebuild(with_alcance=True)
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if TABLE not in inspect(conn).get_table_names() or not _has_alcance(conn):
+        return
+    op.drop_table(TABLE)
+    _create_table(with_alcance=False)
+    _rebuild(with_alcance=False)
@@ -1,16 +1,185 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
 from functools import wraps
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 from fastapi import Request
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
+from .database import SessionLocal
 from .models import AuditActionEnum, AuditLog, Usuario
 
 logger = logging.getLogger("tacticsphere.audit")
 
+AUDIT_ASYNC_ENABLED = os.getenv("AUDIT_ASYNC_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_FLUSH_INTERVAL_SECONDS = float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", "1.0"))
+AUDIT_FLUSH_BATCH_SIZE = int(os.getenv("AUDIT_FLUSH_BATCH_SIZE", "500"))
+AUDIT_ENQUEUE_TIMEOUT_SECONDS = float(os.getenv("AUDIT_ENQUEUE_TIMEOUT_SECONDS", "0.5"))
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class AuditWriter:
+    """
+    Escritor de auditoría en segundo plano: los requests encolan registros en una
+    cola acotada y un hilo los inserta por lotes (INSERT multi-fila) cada
+    flush_interval segundos o al juntar batch_size registros.
+
+    Si la cola está llena, enqueue espera hasta enqueue_timeout (backpressure) y
+    devuelve False para que el llamador escriba de forma síncrona. En el hilo
+    del event loop (código de endpoints async dentro de run_sync) no espera:
+    bloquearía todos los requests. stop() drena lo pendiente antes de terminar.
+    """
+
+    def __init__(
+        self,
+        *,
+        maxsize: int = AUDIT_QUEUE_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL_SECONDS,
+        batch_size: int = AUDIT_FLUSH_BATCH_SIZE,
+        enqueue_timeout: float = AUDIT_ENQUEUE_TIMEOUT_SECONDS,
+    ):
+        self.flush_interval = max(float(flush_interval), 0.01)
+        self.batch_size = max(int(batch_size), 1)
+        self.enqueue_timeout = max(float(enqueue_timeout), 0.0)
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max(int(maxsize), 1))
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stopping.is_set()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        with self._lock:
+            thread = self._thread
+            self._stopping.set()
+            if thread is not None:
+                thread.join(timeout)
+            self._thread = None
+        # Si el hilo no alcanzó a drenar, lo que quede se escribe aquí
+        while True:
+            remaining = self._drain_nowait(self.batch_size)
+            if not remaining:
+                break
+            self._flush(remaining)
+
+    def enqueue(self, record: Dict[str, Any]) -> bool:
+        if not self.running:
+            return False
+        try:
+            if _on_event_loop():
+                self._queue.put_nowait(record)
+            else:
+                self._queue.put(record, timeout=self.enqueue_timeout)
+            return True
+        except queue.Full:
+            self.rejected += 1
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "maxsize": self._queue.maxsize,
+            "written": self.written,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+    def _drain_nowait(self, limit: int) -> List[Dict[str, Any]]:
+        batch: List[Dict[str, Any]] = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _collect(self) -> List[Dict[str, Any]]:
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopping.is_set():
+                batch.extend(self._drain_nowait(self.batch_size - len(batch)))
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        with SessionLocal() as session:
+            try:
+                session.execute(insert(AuditLog), batch)
+                session.commit()
+                self.written += len(batch)
+                return
+            except Exception:
+                session.rollback()
+                logger.exception("Falló el lote de auditoría (%s registros); se reintenta uno a uno", len(batch))
+            # Un registro inválido no debe descartar el resto del lote
+            for record in batch:
+                try:
+                    session.execute(insert(AuditLog), [record])
+                    session.commit()
+                    self.written += 1
+                except Exception:
+                    session.rollback()
+                    self.failed += 1
+                    logger.exception("No se pudo guardar el registro de auditoría")
+
+
+audit_writer = AuditWriter()
+
+
+def start_audit_writer() -> None:
+    if AUDIT_ASYNC_ENABLED:
+        audit_writer.start()
+
+
+def stop_audit_writer() -> None:
+    audit_writer.stop()
+
 
 def audit_log(
     db: Session,
@@ -26,14 +195,20 @@ def audit_log(
     extra: Optional[dict] = None,
     request: Optional[Request] = None,
 ) -> None:
-    """Guarda un registro de auditoría sin interrumpir el flujo principal."""
+    """
+    Guarda un registro de auditoría sin interrumpir el flujo principal.
+    Con el escritor en segundo plano activo solo se encola (sin commit en la
+    sesión del request); si no está activo o la cola sigue llena, se escribe
+    de forma síncrona como antes.
+    """
     try:
         ip = request.client.host if request and request.client else None
         user_agent = request.headers.get("user-agent") if request else None
         method = request.method if request else None
         path = request.url.path if request else None
 
-        log = AuditLog(
+        record = dict(
+            created_at=datetime.utcnow(),
             action=action,
             user_id=current_user.id if current_user else None,
             user_email=current_user.email if current_user else None,
@@ -50,7 +225,10 @@ def audit_log(
             diff_after=diff_after,
             extra=extra,
         )
-        db.add(log)
+        if audit_writer.enqueue(record):
+            return
+
+        db.add(AuditLog(**record))
         db.commit()
     except Exception:
         db.rollback()
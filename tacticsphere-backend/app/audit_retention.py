@@ -0,0 +1,264 @@
+"""
+Retención de auditoría por mes.
+
+- PostgreSQL: audit_logs es una tabla particionada por RANGE(created_at) con una
+  partición por mes (audit_logs_pYYYYMM) más una DEFAULT; ensure_audit_partitions
+  crea por adelantado las de los próximos meses.
+- SQLite (y tablas sin particionar): un mes es el rango [inicio, fin) de
+  created_at, servido por ix_audit_logs_created_at_id.
+
+run_audit_retention archiva cada mes anterior al corte en un CSV comprimido
+(audit_logs_YYYY_MM.csv.gz) y recién después lo elimina (DETACH + DROP de la
+partición, o DELETE del rango).
+"""
+import csv
+import gzip
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .database import BACKEND_ROOT, SessionLocal, engine
+from .models import AuditLog
+
+logger = logging.getLogger("tacticsphere.audit")
+
+AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", "0"))  # 0 = desactivado
+AUDIT_RETENTION_INTERVAL_HOURS = float(os.getenv("AUDIT_RETENTION_INTERVAL_HOURS", "24"))
+AUDIT_PARTITIONS_AHEAD = int(os.getenv("AUDIT_PARTITIONS_AHEAD", "2"))
+AUDIT_ARCHIVE_DIR = Path(os.getenv("AUDIT_ARCHIVE_DIR", str(BACKEND_ROOT / "audit_archive")))
+AUDIT_ARCHIVE_CHUNK_SIZE = 5000
+
+_ARCHIVE_COLUMNS = [col.name for col in AuditLog.__table__.columns]
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + (value.month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(start: datetime) -> str:
+    return f"audit_logs_p{start:%Y%m}"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(
+        conn.exec_driver_sql(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('audit_logs')"
+        ).scalar()
+    )
+
+
+def existing_partitions(conn: Connection) -> List[str]:
+    rows = conn.exec_driver_sql(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('audit_logs')"
+    )
+    return [row[0] for row in rows]
+
+
+def ensure_audit_partitions(
+    conn: Connection,
+    *,
+    months_ahead: int = AUDIT_PARTITIONS_AHEAD,
+    now: Optional[datetime] = None,
+) -> int:
+    """Crea las particiones mensuales faltantes desde el mes actual hasta months_ahead."""
+    if not is_partitioned(conn):
+        return 0
+    present = set(existing_partitions(conn))
+    current = month_start(now or datetime.utcnow())
+    created = 0
+    for offset in range(0, max(months_ahead, 0) + 1):
+        start = add_months(current, offset)
+        name = partition_name(start)
+        if name in present:
+            continue
+        # Filas de ese mes que hayan caído en la DEFAULT impedirían crear la partición
+        if conn.exec_driver_sql(
+            "SELECT 1 FROM audit_logs_default WHERE created_at >= %(start)s AND created_at < %(end)s LIMIT 1",
+            {"start": start, "end": add_months(start, 1)},
+        ).scalar():
+            logger.warning("Hay registros de %s en audit_logs_default; no se crea %s", f"{start:%Y-%m}", name)
+            continue
+        conn.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF audit_logs "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{add_months(start, 1):%Y-%m-%d}')"
+        )
+        created += 1
+    return created
+
+
+def _archive_path(archive_dir: Path, start: datetime) -> Path:
+    path = archive_dir / f"audit_logs_{start:%Y_%m}.csv.gz"
+    if path.exists():
+        path = archive_dir / f"audit_logs_{start:%Y_%m}-{datetime.utcnow():%Y%m%d%H%M%S}.csv.gz"
+    return path
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if hasattr(value, "value"):
+        return value.value
+    return value
+
+
+def archive_audit_month(db: Session, start: datetime, archive_dir: Path = AUDIT_ARCHIVE_DIR) -> Dict[str, object]:
+    """
+    Escribe el mes que empieza en `start` a un .csv.gz (columnas completas,
+    diffs como JSON) y luego lo elimina. El archivo se escribe a un .tmp y se
+    renombra antes de borrar, así un fallo nunca deja filas sin respaldo.
+    """
+    end = add_months(start, 1)
+    in_month = (AuditLog.created_at >= start, AuditLog.created_at < end)
+    stmt = (
+        select(*AuditLog.__table__.columns)
+        .where(*in_month)
+        .order_by(AuditLog.created_at, AuditLog.id)
+    )
+
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    target = _archive_path(archive_dir, start)
+    tmp = target.with_suffix(target.suffix + ".tmp")
+    count = 0
+    max_id: Optional[int] = None
+    last: Optional[Tuple[datetime, int]] = None
+    with gzip.open(tmp, "wt", encoding="utf-8", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(_ARCHIVE_COLUMNS)
+        while True:
+            page = stmt if last is None else stmt.where(tuple_(AuditLog.created_at, AuditLog.id) > tuple_(*last))
+            rows = db.execute(page.limit(AUDIT_ARCHIVE_CHUNK_SIZE)).mappings().all()
+            if not rows:
+                break
+            writer.writerows([_csv_value(row[col]) for col in _ARCHIVE_COLUMNS] for row in rows)
+            count += len(rows)
+            max_id = max(max_id or 0, max(row["id"] for row in rows))
+            last = (rows[-1]["created_at"], rows[-1]["id"])
+            if len(rows) < AUDIT_ARCHIVE_CHUNK_SIZE:
+                break
+
+    if count == 0:
+        tmp.unlink()
+    else:
+        os.replace(tmp, target)
+
+    conn = db.connection()
+    name = partition_name(start)
+    dropped = is_partitioned(conn) and name in existing_partitions(conn)
+    if dropped:
+        conn.exec_driver_sql(f"ALTER TABLE audit_logs DETACH PARTITION {name}")
+        conn.exec_driver_sql(f"DROP TABLE {name}")
+    if count:
+        # Sin particiones borra el rango; con particiones, lo que haya quedado en la DEFAULT
+        db.execute(delete(AuditLog).where(*in_month, AuditLog.id <= max_id))
+    db.commit()
+
+    if count:
+        logger.info("Auditoría %s archivada en %s (%s registros)", f"{start:%Y-%m}", target, count)
+    return {
+        "month": f"{start:%Y-%m}",
+        "archived": count,
+        "file": str(target) if count else None,
+        "partition": name if dropped else None,
+    }
+
+
+def run_audit_retention(
+    db: Session,
+    *,
+    retention_months: int = AUDIT_RETENTION_MONTHS,
+    archive_dir: Path = AUDIT_ARCHIVE_DIR,
+    now: Optional[datetime] = None,
+) -> List[Dict[str, object]]:
+    """Archiva y elimina los meses anteriores a (mes actual - retention_months)."""
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(month_start(now or datetime.utcnow()), -retention_months)
+    oldest = db.scalar(select(func.min(AuditLog.created_at)).where(AuditLog.created_at < cutoff))
+    months = []
+    start = month_start(oldest) if oldest else None
+    while start is not None and start < cutoff:
+        months.append(start)
+        start = add_months(start, 1)
+
+    conn = db.connection()
+    if is_partitioned(conn):
+        # Particiones vacías de meses viejos también se descartan
+        for name in existing_partitions(conn):
+            if name.startswith("audit_logs_p") and name[len("audit_logs_p"):].isdigit():
+                start = datetime.strptime(name[len("audit_logs_p"):], "%Y%m")
+                if start < cutoff and start not in months:
+                    months.append(start)
+        months.sort()
+
+    results = [archive_audit_month(db, start, archive_dir) for start in months]
+    return [r for r in results if r["archived"] or r["partition"]]
+
+
+class AuditRetentionJob:
+    """Hilo que cada interval_hours asegura particiones futuras y aplica la retención."""
+
+    def __init__(self, interval_hours: float = AUDIT_RETENTION_INTERVAL_HOURS):
+        self.interval_seconds = max(float(interval_hours), 0.01) * 3600
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def run_once(self) -> None:
+        try:
+            with engine.begin() as conn:
+                ensure_audit_partitions(conn)
+            if AUDIT_RETENTION_MONTHS > 0:
+                with SessionLocal() as db:
+                    run_audit_retention(db)
+        except Exception:
+            logger.exception("Falló la retención de auditoría")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval_seconds)
+
+
+audit_retention_job = AuditRetentionJob()
+
+
+def start_audit_retention() -> None:
+    # Sin particiones (SQLite) y sin retención configurada no hay nada que hacer
+    if AUDIT_RETENTION_MONTHS > 0 or engine.dialect.name == "postgresql":
+        audit_retention_job.start()
+
+
+def stop_audit_retention() -> None:
+    audit_retention_job.stop()
@@ -1,16 +1,25 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional, Tuple
 from jose import jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from .database import get_db
+from .cache import LRUCache
+from .database import get_async_db, get_db
 from .models import Usuario, RolEnum
 import os
 
+# Costo bcrypt configurable; los hashes con otro costo se rehashean al iniciar sesión
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
 # 🔧 OJO: aquí estaba el error, había un ']' de más
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 SECRET_KEY = os.getenv("JWT_SECRET", "change-me")
@@ -18,17 +27,98 @@ ALGORITHM = os.getenv("JWT_ALG", "HS256")
 EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES", "60"))
 MIN_PASSWORD_LENGTH = int(os.getenv("PASSWORD_MIN_LENGTH", "10"))
 
+# Caché corta de principales (id -> datos de autorización) para no leer Usuario en cada request.
+# update_usuario / delete_usuario / set_password la invalidan; el TTL acota cualquier otro cambio.
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+_principal_cache = LRUCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl_seconds=PRINCIPAL_CACHE_TTL_SECONDS)
+_PRINCIPAL_FIELDS = ("id", "nombre", "email", "rol", "empresa_id", "activo")
+
 def validate_password(password: str) -> None:
     if password is None:
         raise ValueError("La contraseña no puede estar vacía")
     if len(password.strip()) < MIN_PASSWORD_LENGTH:
         raise ValueError(f"La contraseña debe tener al menos {MIN_PASSWORD_LENGTH} caracteres.")
 
+# Pool dedicado para bcrypt: acota cuántos hashes corren a la vez para que una ráfaga
+# de logins no ocupe todo el threadpool de FastAPI y deje sin hilos a las encuestas.
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "64"))
+
+
+class HashingBusy(Exception):
+    """La cola de hashing está llena (solo para llamadas acotadas, p. ej. /auth/login)."""
+
+
+class HashingExecutor:
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING):
+        self.workers = max(int(workers), 1)
+        self.max_pending = max(int(max_pending), 1)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def submit(self, fn: Callable, *args, bounded: bool = True) -> Future:
+        with self._lock:
+            if bounded and self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HashingBusy()
+            self.pending += 1
+
+        def task():
+            with self._lock:
+                self.active += 1
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.pending -= 1
+                    self.completed += 1
+
+        return self._pool.submit(task)
+
+    def run(self, fn: Callable, *args):
+        # Llamadas síncronas internas (alta/cambio de contraseña): esperan turno, nunca se rechazan
+        return self.submit(fn, *args, bounded=False).result()
+
+    async def run_async(self, fn: Callable, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "active": self.active,
+                "queued": self.pending - self.active,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "bcrypt_rounds": BCRYPT_ROUNDS,
+            }
+
+
+hashing_executor = HashingExecutor()
+
 def hash_password(plain: str) -> str:
-    return pwd_context.hash(plain)
+    return hashing_executor.run(pwd_context.hash, plain)
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    return hashing_executor.run(pwd_context.verify, plain, hashed)
+
+async def verify_and_update_password(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica en el pool acotado (HashingBusy si está lleno). Si el hash usa un
+    costo distinto de BCRYPT_ROUNDS devuelve además el hash nuevo para guardarlo.
+    """
+    return await hashing_executor.run_async(pwd_context.verify_and_update, plain, hashed)
+
+def hashing_stats() -> dict:
+    return hashing_executor.stats()
 
 def create_access_token(data: dict, minutes: int = EXPIRE_MINUTES) -> str:
     # uso de UTC “moderno” para evitar warnings (seguro mantenerlo ya)
@@ -36,17 +126,80 @@ def create_access_token(data: dict, minutes: int = EXPIRE_MINUTES) -> str:
     to_encode.update({"exp": datetime.now(timezone.utc) + timedelta(minutes=minutes)})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> Usuario:
+def invalidate_principal(user_id: Optional[int] = None) -> None:
+    """Descarta el principal cacheado de un usuario (o todos si user_id es None)."""
+    if user_id is None:
+        _principal_cache.clear()
+    else:
+        _principal_cache.pop(user_id)
+
+def principal_cache_stats() -> dict:
+    return _principal_cache.stats()
+
+def _token_user_id(token: str) -> int:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = int(payload.get("sub"))
+        return int(payload.get("sub"))
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido")
-    user = db.get(Usuario, user_id)
+
+def _active_user(user: Optional[Usuario]) -> Usuario:
     if not user or not user.activo:
         raise HTTPException(status_code=401, detail="Usuario no encontrado o inactivo")
     return user
 
+def _principal_user(user_id: int, user: Optional[Usuario]) -> Usuario:
+    """Guarda en caché el principal recién leído (vacío si no existe) y arma el Usuario transitorio."""
+    principal = {field: getattr(user, field) for field in _PRINCIPAL_FIELDS} if user else {}
+    _principal_cache.set(user_id, principal)
+    return _cached_user(principal)
+
+def _cached_user(principal: dict) -> Usuario:
+    if not principal or not principal["activo"]:
+        raise HTTPException(status_code=401, detail="Usuario no encontrado o inactivo")
+    return Usuario(**principal)
+
+def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> Usuario:
+    """
+    Devuelve el usuario del token. Con la caché activa es un Usuario transitorio
+    (sin sesión ni password_hash) armado desde el principal cacheado: alcanza
+    para rol/empresa_id/activo y /me, pero quien necesite la contraseña o las
+    relaciones debe leer el Usuario desde la base.
+    """
+    user_id = _token_user_id(token)
+    if PRINCIPAL_CACHE_TTL_SECONDS <= 0:
+        return _active_user(db.get(Usuario, user_id))
+
+    principal = _principal_cache.get(user_id)
+    if principal is None:
+        return _principal_user(user_id, db.get(Usuario, user_id))
+    return _cached_user(principal)
+
+def _load_detached_user(db: Session, user_id: int) -> Optional[Usuario]:
+    # Fuera de la sesión: un commit del endpoint no lo expira ni dispara recargas en el event loop
+    user = db.get(Usuario, user_id)
+    if user is not None:
+        db.expunge(user)
+    return user
+
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(oauth2_scheme),
+) -> Usuario:
+    """
+    Igual que get_current_user para endpoints async: se resuelve en el event
+    loop y, si el principal no está en caché, lee el Usuario por la sesión async
+    (la misma que recibe el endpoint), sin pasar por el threadpool.
+    """
+    user_id = _token_user_id(token)
+    if PRINCIPAL_CACHE_TTL_SECONDS <= 0:
+        return _active_user(await db.run_sync(_load_detached_user, user_id))
+
+    principal = _principal_cache.get(user_id)
+    if principal is None:
+        return _principal_user(user_id, await db.run_sync(_load_detached_user, user_id))
+    return _cached_user(principal)
+
 def require_roles(*roles: RolEnum):
     def checker(user: Usuario = Depends(get_current_user)):
         if user.rol.value not in [r.value for r in roles]:
@@ -1,9 +1,25 @@
-from typing import List, Optional, Dict, Tuple, Iterable
+import hashlib
+import itertools
+import os
+import threading
+import time
+from typing import Any, List, NamedTuple, Optional, Dict, Tuple, Iterable, Iterator, Sequence
 from datetime import datetime, timedelta, timezone, date  # usamos naive UTC
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import select, func, and_, or_, delete
-
-from .auth import hash_password, validate_password
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import select, func, and_, or_, delete, insert, update, case, cast, Numeric, event, tuple_
+from sqlalchemy.engine import RowMapping
+
+from .auth import hash_password, invalidate_principal, principal_cache_stats, validate_password
+from .cache import LRUCache
+from .database import uses_replica
+from .search import (
+    audit_search_condition,
+    empleado_search_condition,
+    empleado_search_rank,
+    empleado_search_text,
+    normalize_search_query,
+    normalize_search_text,
+)
 from .models import (
     Usuario,
     Empresa,
@@ -22,9 +38,159 @@ from .models import (
     PasswordChangeRequest,
     AuditLog,
     AuditActionEnum,
+    AnalyticsDailyRollup,
+    ProgressCounter,
 )
 from .likert_levels import LIKERT_LEVELS
 
+# ======================================================
+# CACHÉS EN MEMORIA (se invalidan al confirmar la transacción)
+# ======================================================
+
+# Estructura de cuestionarios: clave (cuestionario_id, versión)
+QUESTIONNAIRE_CACHE_SIZE = int(os.getenv("QUESTIONNAIRE_CACHE_SIZE", "256"))
+_questionnaire_cache = LRUCache(maxsize=QUESTIONNAIRE_CACHE_SIZE)
+_questionnaire_versions = itertools.count(1)
+_questionnaire_version = 0
+
+# Resultados del dashboard: clave (filtros normalizados, generaciones)
+DASHBOARD_CACHE_SIZE = int(os.getenv("DASHBOARD_CACHE_SIZE", "256"))
+DASHBOARD_CACHE_TTL_SECONDS = float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "120"))
+_dashboard_cache = LRUCache(maxsize=DASHBOARD_CACHE_SIZE, ttl_seconds=DASHBOARD_CACHE_TTL_SECONDS)
+# Tras una invalidación, un cálculo leído de la réplica puede no ver aún el commit:
+# durante esta ventana (retraso tolerado de la réplica) no se guarda en la caché
+DASHBOARD_REPLICA_LAG_SECONDS = float(os.getenv("DASHBOARD_REPLICA_LAG_SECONDS", "10"))
+_ALL_EMPRESAS = "*"
+_analytics_generations: Dict[object, int] = {}
+_analytics_invalidated_at: Dict[object, float] = {}
+_analytics_generations_lock = threading.Lock()
+
+
+def invalidate_questionnaire_cache() -> None:
+    """Sube la versión: las estructuras cacheadas con la versión anterior dejan de leerse."""
+    global _questionnaire_version
+    _questionnaire_version = next(_questionnaire_versions)
+
+
+def invalidate_dashboard_cache(empresa_id: Optional[int] = None) -> None:
+    """
+    Sube la generación de la empresa (y la de la vista global, que la incluye).
+    Sin empresa_id invalida todas (p. ej. cambios en pilares/preguntas globales).
+    """
+    with _analytics_generations_lock:
+        now = time.monotonic()
+        key = _ALL_EMPRESAS if empresa_id is None else empresa_id
+        _analytics_generations[key] = _analytics_generations.get(key, 0) + 1
+        _analytics_invalidated_at[key] = now
+        if empresa_id is not None:
+            _analytics_generations[None] = _analytics_generations.get(None, 0) + 1
+            _analytics_invalidated_at[None] = now
+
+
+def _dashboard_generation(empresa_id: Optional[int]) -> Tuple[int, int]:
+    return (_analytics_generations.get(_ALL_EMPRESAS, 0), _analytics_generations.get(empresa_id, 0))
+
+
+def _dashboard_recently_invalidated(empresa_id: Optional[int]) -> bool:
+    """True si la generación que lee empresa_id subió dentro de DASHBOARD_REPLICA_LAG_SECONDS."""
+    last = max(
+        _analytics_invalidated_at.get(_ALL_EMPRESAS, float("-inf")),
+        _analytics_invalidated_at.get(empresa_id, float("-inf")),
+    )
+    return time.monotonic() - last < DASHBOARD_REPLICA_LAG_SECONDS
+
+
+def _mark_questionnaire_changed(db: Session) -> None:
+    """Marca la sesión para invalidar la caché recién cuando la transacción se confirme."""
+    db.info["questionnaire_changed"] = True
+
+
+def _mark_principal_changed(db: Session, user_id: Optional[int]) -> None:
+    """
+    Invalida el principal cacheado de get_current_user (None = todos). Se descarta
+    ya y otra vez tras el commit, por si un request lo recargó mientras tanto.
+    """
+    invalidate_principal(user_id)
+    db.info.setdefault("principal_ids", set()).add(user_id)
+
+
+def _mark_analytics_changed(db: Session, empresa_id: Optional[int]) -> None:
+    """Igual que _mark_questionnaire_changed, para el dashboard (empresa_id None = todas)."""
+    db.info.setdefault("analytics_empresas", set()).add(
+        _ALL_EMPRESAS if empresa_id is None else empresa_id
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_caches_after_commit(session: Session) -> None:
+    if session.info.pop("questionnaire_changed", False):
+        invalidate_questionnaire_cache()
+    for empresa_id in session.info.pop("analytics_empresas", ()):
+        invalidate_dashboard_cache(None if empresa_id == _ALL_EMPRESAS else empresa_id)
+    for user_id in session.info.pop("principal_ids", ()):
+        invalidate_principal(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_cache_marks(session: Session) -> None:
+    session.info.pop("questionnaire_changed", None)
+    session.info.pop("analytics_empresas", None)
+    session.info.pop("principal_ids", None)
+
+
+def cache_stats() -> Dict:
+    """Tamaño y aciertos de las cachés en memoria (para dimensionarlas)."""
+    return {
+        "questionnaire": {**_questionnaire_cache.stats(), "version": _questionnaire_version},
+        "dashboard": _dashboard_cache.stats(),
+        "principals": principal_cache_stats(),
+    }
+
+
+# ======================================================
+# PAGINACIÓN KEYSET / PROYECCIÓN DE CAMPOS
+# ======================================================
+
+class Page(NamedTuple):
+    items: List[Any]  # entidades ORM, o dicts con solo `fields` si se pidió proyección
+    next_key: Optional[Tuple[Any, ...]]  # clave de orden del último ítem si la página vino llena
+
+
+def paginate(
+    db: Session,
+    stmt,
+    keys: Sequence,
+    *,
+    model=None,
+    fields: Optional[Sequence[str]] = None,
+    after: Optional[Tuple[Any, ...]] = None,
+    limit: Optional[int] = None,
+) -> Page:
+    """
+    Ordena `stmt` por `keys` (ascendente, sin NULL; la última debe ser única)
+    y continúa después de `after`. Con `fields` selecciona solo esas columnas
+    de `model` en vez de la entidad completa.
+    """
+    labeled = [key.label(f"_k{i}") for i, key in enumerate(keys)]
+    if fields:
+        stmt = stmt.with_only_columns(*(getattr(model, name) for name in fields), *labeled)
+    else:
+        stmt = stmt.add_columns(*labeled)
+    if after is not None:
+        stmt = stmt.where(tuple_(*keys) > tuple_(*after))
+    stmt = stmt.order_by(None).order_by(*keys)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    rows = db.execute(stmt).all()
+    n = len(keys)
+    if fields:
+        items = [dict(zip(fields, row[:-n])) for row in rows]
+    else:
+        items = [row[0] for row in rows]
+    next_key = tuple(rows[-1][-n:]) if limit is not None and rows and len(rows) == limit else None
+    return Page(items, next_key)
+
+
 # ======================================================
 # USUARIOS
 # ======================================================
@@ -33,11 +199,25 @@ def get_user_by_email(db: Session, email: str):
     normalized = email.lower()
     return db.scalars(select(Usuario).where(func.lower(Usuario.email) == normalized)).first()
 
+def get_user_password_hash(db: Session, user_id: int) -> Optional[str]:
+    """El principal de get_current_user no trae password_hash; se lee aparte al re-verificar."""
+    return db.scalar(select(Usuario.password_hash).where(Usuario.id == user_id))
+
 def list_usuarios(db: Session, empresa_id: Optional[int] = None) -> List[Usuario]:
+    return page_usuarios(db, empresa_id).items
+
+def page_usuarios(
+    db: Session,
+    empresa_id: Optional[int] = None,
+    *,
+    fields: Optional[Sequence[str]] = None,
+    after: Optional[Tuple[int]] = None,
+    limit: Optional[int] = None,
+) -> Page:
     stmt = select(Usuario)
     if empresa_id is not None:
         stmt = stmt.where(Usuario.empresa_id == empresa_id)
-    return db.scalars(stmt).all()
+    return paginate(db, stmt, (Usuario.id,), model=Usuario, fields=fields, after=after, limit=limit)
 
 def create_usuario(db: Session, nombre: str, email: str, password: str, rol: RolEnum, empresa_id: Optional[int]):
     validate_password(password)
@@ -74,6 +254,7 @@ def update_usuario(
         u.empresa_id = empresa_id
     if activo is not None:
         u.activo = activo
+    _mark_principal_changed(db, user_id)
     db.commit()
     db.refresh(u)
     return u
@@ -83,6 +264,7 @@ def delete_usuario(db: Session, user_id: int) -> bool:
     if not u:
         return False
     db.delete(u)
+    _mark_principal_changed(db, user_id)
     db.commit()
     return True
 
@@ -92,10 +274,16 @@ def set_password(db: Session, user_id: int, new_password: str) -> Optional[Usuar
         return None
     validate_password(new_password)
     u.password_hash = hash_password(new_password)
+    _mark_principal_changed(db, user_id)
     db.commit()
     db.refresh(u)
     return u
 
+def update_password_hash(db: Session, user_id: int, password_hash: str) -> None:
+    """Guarda un hash recalculado de la misma contraseña (rehash al iniciar sesión)."""
+    db.execute(update(Usuario).where(Usuario.id == user_id).values(password_hash=password_hash))
+    db.commit()
+
 
 def create_password_change_request(db: Session, user: Usuario) -> PasswordChangeRequest:
     existing = db.scalars(
@@ -178,19 +366,30 @@ def clear_password_change_requests(db: Session) -> int:
 # ======================================================
 
 def list_empresas(db: Session) -> List[Empresa]:
+    return page_empresas(db).items
+
+def page_empresas(
+    db: Session,
+    *,
+    fields: Optional[Sequence[str]] = None,
+    after: Optional[Tuple[int]] = None,
+    limit: Optional[int] = None,
+) -> Page:
     """
-    Lista todas las empresas con sus departamentos.
-    Usa joinedload para cargar los departamentos de forma eficiente y asegurar
-    que cada empresa solo tenga sus propios departamentos (filtrados por empresa_id).
+    Lista las empresas con sus departamentos (una consulta IN adicional por
+    página con selectinload). Con `fields` no se cargan los departamentos.
     """
-    stmt = select(Empresa).options(joinedload(Empresa.departamentos))
-    empresas = list(db.scalars(stmt).unique().all())
-    # Validación adicional: asegurar que los departamentos están correctamente filtrados
-    # por empresa_id (SQLAlchemy debería hacer esto automáticamente vía Foreign Key,
-    # pero esta validación previene cualquier problema de datos corruptos)
-    for empresa in empresas:
-        empresa.departamentos = [d for d in empresa.departamentos if d.empresa_id == empresa.id]
-    return empresas
+    stmt = select(Empresa)
+    if not fields:
+        stmt = stmt.options(selectinload(Empresa.departamentos))
+    page = paginate(db, stmt, (Empresa.id,), model=Empresa, fields=fields, after=after, limit=limit)
+    if not fields:
+        # Validación adicional: asegurar que los departamentos están correctamente filtrados
+        # por empresa_id (SQLAlchemy debería hacer esto automáticamente vía Foreign Key,
+        # pero esta validación previene cualquier problema de datos corruptos)
+        for empresa in page.items:
+            empresa.departamentos = [d for d in empresa.departamentos if d.empresa_id == empresa.id]
+    return page
 
 def create_empresa(db: Session, nombre: str, rut: Optional[str], giro: Optional[str],
                    departamentos: Optional[List[str]] = None):
@@ -334,7 +533,10 @@ def update_empresa(
             if not existing:
                 db.add(Departamento(nombre=n, empresa_id=emp.id))
     
+    _mark_analytics_changed(db, emp.id)
     db.commit()
+    if departamentos is not None:
+        refresh_analytics_rollup(db, empresa_id=emp.id)
     # Refrescar la empresa y cargar los departamentos actualizados
     db.refresh(emp, ["departamentos"])
     # Validación final: asegurar que solo se devuelven departamentos de esta empresa
@@ -346,6 +548,9 @@ def delete_empresa(db: Session, empresa_id: int) -> bool:
     if not emp:
         return False
     db.delete(emp)
+    _mark_analytics_changed(db, empresa_id)
+    # Sus usuarios pueden quedar sin empresa o eliminados
+    _mark_principal_changed(db, None)
     db.commit()
     return True
 
@@ -383,6 +588,7 @@ def cleanup_orphan_departments(db: Session) -> int:
 def create_departamento(db: Session, empresa_id: int, nombre: str) -> Departamento:
     dep = Departamento(empresa_id=empresa_id, nombre=nombre)
     db.add(dep)
+    _mark_analytics_changed(db, empresa_id)
     db.commit()
     db.refresh(dep)
     return dep
@@ -391,8 +597,11 @@ def delete_departamento(db: Session, dep_id: int) -> bool:
     dep = db.get(Departamento, dep_id)
     if not dep:
         return False
+    empresa_id = dep.empresa_id
     db.delete(dep)
+    _mark_analytics_changed(db, empresa_id)
     db.commit()
+    refresh_analytics_rollup(db, empresa_id=empresa_id)
     return True
 
 # ======================================================
@@ -406,25 +615,42 @@ def list_empleados(
     search: Optional[str] = None,
     limit: Optional[int] = None,
 ) -> List[Empleado]:
+    return page_empleados(
+        db,
+        empresa_id=empresa_id,
+        departamento_id=departamento_id,
+        search=search,
+        limit=limit,
+    ).items
+
+def empleado_page_key_types(search: Optional[str]) -> Tuple[type, ...]:
+    """Tipos de la clave de orden de page_empleados (para decodificar el cursor)."""
+    base = (str, str, int)
+    return (int, *base) if search and normalize_search_query(search) else base
+
+def page_empleados(
+    db: Session,
+    empresa_id: Optional[int] = None,
+    departamento_id: Optional[int] = None,
+    search: Optional[str] = None,
+    *,
+    fields: Optional[Sequence[str]] = None,
+    after: Optional[Tuple] = None,
+    limit: Optional[int] = None,
+) -> Page:
     stmt = select(Empleado)
     if empresa_id is not None:
         stmt = stmt.where(Empleado.empresa_id == empresa_id)
     if departamento_id is not None:
         stmt = stmt.where(Empleado.departamento_id == departamento_id)
-    if search:
-        pattern = f"%{search.lower()}%"
-        stmt = stmt.where(
-            or_(
-                func.lower(Empleado.nombre).like(pattern),
-                func.lower(Empleado.apellidos).like(pattern),
-                func.lower(Empleado.email).like(pattern),
-                func.lower(Empleado.rut).like(pattern),
-            )
-        )
-    stmt = stmt.order_by(Empleado.nombre.asc(), Empleado.apellidos.asc())
-    if limit is not None:
-        stmt = stmt.limit(limit)
-    return db.scalars(stmt).all()
+    keys = [Empleado.nombre, func.coalesce(Empleado.apellidos, ""), Empleado.id]
+    term = normalize_search_query(search) if search else ""
+    if term:
+        # search_text indexado (FTS5 trigram / GIN pg_trgm), sin tildes y con RUT normalizado;
+        # primero los que empiezan por el término
+        stmt = stmt.where(empleado_search_condition(db, term))
+        keys.insert(0, empleado_search_rank(term))
+    return paginate(db, stmt, keys, model=Empleado, fields=fields, after=after, limit=limit)
 
 def create_empleado(
     db: Session,
@@ -444,8 +670,10 @@ def create_empleado(
         email=email,
         cargo=cargo,
         departamento_id=departamento_id,
+        search_text=empleado_search_text(nombre, apellidos, email, rut),
     )
     db.add(emp)
+    _mark_analytics_changed(db, empresa_id)
     db.commit()
     db.refresh(emp)
     return emp
@@ -463,6 +691,7 @@ def update_empleado(
     emp = db.get(Empleado, empleado_id)
     if not emp:
         return None
+    departamento_changed = departamento_id is not None and departamento_id != emp.departamento_id
     if nombre is not None:
         emp.nombre = nombre
     if apellidos is not None:
@@ -475,14 +704,61 @@ def update_empleado(
         emp.cargo = cargo
     if departamento_id is not None:
         emp.departamento_id = departamento_id
+    emp.search_text = empleado_search_text(emp.nombre, emp.apellidos, emp.email, emp.rut)
+    _mark_analytics_changed(db, emp.empresa_id)
     db.commit()
+    if departamento_changed:
+        refresh_analytics_rollup(db, empleado_id=empleado_id)
     db.refresh(emp)
     return emp
 
+def departamento_import_lookup(db: Session, empresa_id: int) -> Dict[str, int]:
+    """Nombre normalizado e id (como texto) -> id, para resolver departamentos de un CSV en una consulta."""
+    lookup: Dict[str, int] = {}
+    rows = db.execute(
+        select(Departamento.id, Departamento.nombre)
+        .where(Departamento.empresa_id == empresa_id)
+        .order_by(Departamento.id)
+    ).all()
+    for dep_id, nombre in rows:
+        lookup.setdefault(normalize_search_text(nombre), dep_id)
+        lookup[str(dep_id)] = dep_id
+    return lookup
+
+def bulk_create_empleados(db: Session, empresa_id: int, rows: Sequence[Dict[str, object]]) -> int:
+    """
+    Inserta empleados ya validados (csv_import.parse_empleado_row) con INSERT
+    multi-fila en una sola transacción. Devuelve cuántos se crearon.
+    """
+    if not rows:
+        return 0
+    payload = [
+        {
+            "empresa_id": empresa_id,
+            "nombre": row["nombre"],
+            "apellidos": row.get("apellidos"),
+            "rut": row.get("rut"),
+            "email": row.get("email"),
+            "cargo": row.get("cargo"),
+            "departamento_id": row.get("departamento_id"),
+            "search_text": empleado_search_text(row["nombre"], row.get("apellidos"), row.get("email"), row.get("rut")),
+        }
+        for row in rows
+    ]
+    db.execute(insert(Empleado), payload)
+    _mark_analytics_changed(db, empresa_id)
+    db.commit()
+    return len(payload)
+
 # ======================================================
 # PILARES / PREGUNTAS
 # ======================================================
 
+def _mark_pilar_analytics_changed(db: Session, pilar_id: int) -> None:
+    pilar = db.get(Pilar, pilar_id)
+    _mark_analytics_changed(db, pilar.empresa_id if pilar else None)
+
+
 def create_pilar(
     db: Session,
     empresa_id: Optional[int],
@@ -492,6 +768,7 @@ def create_pilar(
 ) -> Pilar:
     p = Pilar(empresa_id=empresa_id, nombre=nombre, descripcion=descripcion, peso=peso)
     db.add(p)
+    _mark_analytics_changed(db, empresa_id)
     db.commit()
     db.refresh(p)
     return p
@@ -515,13 +792,18 @@ def update_pilar(
     p = db.get(Pilar, pilar_id)
     if not p:
         return None
+    peso_changed = peso is not None and peso != p.peso
     if nombre is not None:
         p.nombre = nombre
     if descripcion is not None:
         p.descripcion = descripcion
     if peso is not None:
         p.peso = peso
+    _mark_questionnaire_changed(db)
+    _mark_analytics_changed(db, p.empresa_id)
     db.commit()
+    if peso_changed:
+        refresh_analytics_rollup(db, pilar_id=pilar_id)
     db.refresh(p)
     return p
 
@@ -534,6 +816,8 @@ def delete_pilar(db: Session, pilar_id: int, cascade: bool = False) -> Tuple[boo
         if existen:
             return False, "Pilar tiene preguntas asociadas"
     db.delete(p)
+    _mark_questionnaire_changed(db)
+    _mark_analytics_changed(db, p.empresa_id)
     db.commit()
     return True, None
 
@@ -602,6 +886,7 @@ def update_subpilar(
         sp.descripcion = descripcion
     if orden is not None:
         sp.orden = orden
+    _mark_questionnaire_changed(db)
     db.commit()
     db.refresh(sp)
     return sp
@@ -625,6 +910,7 @@ def delete_subpilar(db: Session, subpilar_id: int, cascade: bool = False) -> Tup
     
     # Si cascade=True, las preguntas se actualizan automáticamente a NULL por el ondelete="SET NULL"
     db.delete(sp)
+    _mark_questionnaire_changed(db)
     db.commit()
     return True, None
 
@@ -659,23 +945,80 @@ def create_pregunta(
         respuesta_esperada=sanitized_expected,
     )
     db.add(q)
+    _mark_questionnaire_changed(db)
+    _mark_pilar_analytics_changed(db, pilar_id)
     db.commit()
     db.refresh(q)
     sync_question_with_questionnaires(db, q)
     return q
 
+def bulk_create_preguntas(db: Session, items: Sequence[Dict[str, object]]) -> List[Pregunta]:
+    """
+    Crea varias preguntas (dicts con los campos de create_pregunta) en una sola
+    transacción y las agrega a los cuestionarios con un único INSERT ... SELECT.
+    Valida todos los subpilares antes de insertar; ValueError si alguno no
+    pertenece a su pilar.
+    """
+    if not items:
+        return []
+    subpilar_ids = {item["subpilar_id"] for item in items if item.get("subpilar_id") is not None}
+    subpilar_pilar = (
+        dict(db.execute(select(Subpilar.id, Subpilar.pilar_id).where(Subpilar.id.in_(subpilar_ids))).all())
+        if subpilar_ids
+        else {}
+    )
+    for item in items:
+        subpilar_id = item.get("subpilar_id")
+        if subpilar_id is not None and subpilar_pilar.get(subpilar_id) != item["pilar_id"]:
+            raise ValueError(f"El subpilar {subpilar_id} no pertenece al pilar {item['pilar_id']}")
+
+    preguntas = [
+        Pregunta(
+            pilar_id=item["pilar_id"],
+            subpilar_id=item.get("subpilar_id"),
+            enunciado=item["enunciado"],
+            tipo=item["tipo"],
+            es_obligatoria=item.get("es_obligatoria", True),
+            peso=item.get("peso", 1),
+            respuesta_esperada=(item.get("respuesta_esperada") or "").strip() or None,
+        )
+        for item in items
+    ]
+    db.add_all(preguntas)
+    db.flush()
+    ids = [q.id for q in preguntas]
+    sync_questions_with_questionnaires(db, ids)
+    _mark_questionnaire_changed(db)
+    for pilar_id in {item["pilar_id"] for item in items}:
+        _mark_pilar_analytics_changed(db, pilar_id)
+    db.commit()
+    # Una consulta para recargar todas (tras el commit quedan expiradas)
+    by_id = {q.id: q for q in db.scalars(select(Pregunta).where(Pregunta.id.in_(ids))).all()}
+    return [by_id[qid] for qid in ids]
+
 def list_preguntas(db: Session, pilar_id: int, subpilar_id: Optional[int] = None) -> List[Pregunta]:
     """
     Lista las preguntas de un pilar.
     Si se especifica subpilar_id, filtra solo las preguntas de ese subpilar.
     """
+    return page_preguntas(db, pilar_id, subpilar_id).items
+
+def page_preguntas(
+    db: Session,
+    pilar_id: int,
+    subpilar_id: Optional[int] = None,
+    *,
+    fields: Optional[Sequence[str]] = None,
+    after: Optional[Tuple[int]] = None,
+    limit: Optional[int] = None,
+) -> Page:
     stmt = select(Pregunta).where(Pregunta.pilar_id == pilar_id)
     if subpilar_id is not None:
         stmt = stmt.where(Pregunta.subpilar_id == subpilar_id)
     else:
         # Si no se especifica subpilar, incluye todas (con y sin subpilar)
         pass
-    return db.scalars(stmt.order_by(Pregunta.id)).all()
+    return paginate(db, stmt, (Pregunta.id,), model=Pregunta, fields=fields, after=after, limit=limit)
 
 
 def update_pregunta(
@@ -704,6 +1047,8 @@ def update_pregunta(
         if not subpilar or subpilar.pilar_id != q.pilar_id:
             raise ValueError(f"El subpilar {subpilar_id} no pertenece al pilar {q.pilar_id} de la pregunta")
     
+    tipo_changed = tipo is not None and tipo != q.tipo
+    scoring_changed = tipo_changed or (peso is not None and peso != q.peso)
     if enunciado is not None:
         q.enunciado = enunciado
     if tipo is not None:
@@ -720,7 +1065,14 @@ def update_pregunta(
     # Nota: esto funciona porque main.py construye kwargs dinámicamente solo con campos presentes.
     if respuesta_esperada is not None:
         q.respuesta_esperada = (respuesta_esperada or "").strip() or None
+    _mark_questionnaire_changed(db)
+    _mark_pilar_analytics_changed(db, q.pilar_id)
     db.commit()
+    if tipo_changed:
+        refresh_respuesta_scores(db, pregunta_id=q.id, commit=False)
+        refresh_progress_counters(db, pilar_id=q.pilar_id, commit=False)
+    if scoring_changed:
+        refresh_analytics_rollup(db, pilar_id=q.pilar_id)
     db.refresh(q)
     return q
 
@@ -729,8 +1081,13 @@ def delete_pregunta(db: Session, pregunta_id: int) -> bool:
     q = db.get(Pregunta, pregunta_id)
     if not q:
         return False
+    pilar_id = q.pilar_id
     db.delete(q)
+    _mark_questionnaire_changed(db)
+    _mark_pilar_analytics_changed(db, pilar_id)
     db.commit()
+    refresh_progress_counters(db, pilar_id=pilar_id, commit=False)
+    refresh_analytics_rollup(db, pilar_id=pilar_id)
     return True
 
 # ======================================================
@@ -746,6 +1103,7 @@ def create_cuestionario(db: Session, empresa_id: int, titulo: str, version: int,
     if preguntas_ids:
         for pid in preguntas_ids:
             db.add(CuestionarioPregunta(cuestionario_id=c.id, pregunta_id=pid))
+        _mark_questionnaire_changed(db)
     db.commit()
     db.refresh(c)
     return c
@@ -766,23 +1124,34 @@ def get_latest_published_cuestionario(db: Session, empresa_id: int) -> Optional[
 
 # --- MODO SIMPLE: helpers automÃ¡ticos ---
 
+def _question_set_fingerprint(pregunta_ids: Iterable[int]) -> str:
+    payload = ",".join(str(pid) for pid in sorted(pregunta_ids))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 def build_or_get_auto_cuestionario(db: Session, empresa_id: int) -> Cuestionario:
     """
     Devuelve un Cuestionario PUBLICADO para la empresa.
     Si no existe, crea uno con TODAS las preguntas existentes (de todos los pilares).
+    Si existe, solo se sincroniza cuando cambió la huella del conjunto de preguntas
+    (global + empresa); en el caso normal es una lectura sin escrituras.
     """
-    todas_pregs = db.scalars(
-        select(Pregunta)
+    pregunta_ids = db.scalars(
+        select(Pregunta.id)
         .join(Pilar, Pregunta.pilar_id == Pilar.id)
         .where(or_(Pilar.empresa_id == empresa_id, Pilar.empresa_id.is_(None)))
     ).all()
-    if not todas_pregs:
+    if not pregunta_ids:
         raise ValueError("No hay preguntas definidas en el sistema para crear un cuestionario.")
+    fingerprint = _question_set_fingerprint(pregunta_ids)
 
     existente = get_latest_published_cuestionario(db, empresa_id)
     if existente:
-        ensure_questionnaire_questions(db, existente, todas_pregs, purge_missing=True)
-        db.commit()
+        if existente.preguntas_fingerprint != fingerprint:
+            todas_pregs = db.scalars(select(Pregunta).where(Pregunta.id.in_(pregunta_ids))).all()
+            ensure_questionnaire_questions(db, existente, todas_pregs, purge_missing=True)
+            existente.preguntas_fingerprint = fingerprint
+            db.commit()
         return existente
 
     c = create_cuestionario(
@@ -791,8 +1160,10 @@ def build_or_get_auto_cuestionario(db: Session, empresa_id: int) -> Cuestionario
         titulo="Auto (todas las preguntas)",
         version=1,
         estado="PUBLICADO",
-        preguntas_ids=[p.id for p in todas_pregs],
+        preguntas_ids=list(pregunta_ids),
     )
+    c.preguntas_fingerprint = fingerprint
+    db.commit()
     return c
 
 # ======================================================
@@ -859,10 +1230,20 @@ def create_asignacion(
     return asg
 
 def list_asignaciones(db: Session, empresa_id: Optional[int] = None) -> List[Asignacion]:
+    return page_asignaciones(db, empresa_id).items
+
+def page_asignaciones(
+    db: Session,
+    empresa_id: Optional[int] = None,
+    *,
+    fields: Optional[Sequence[str]] = None,
+    after: Optional[Tuple[int]] = None,
+    limit: Optional[int] = None,
+) -> Page:
     stmt = select(Asignacion)
     if empresa_id is not None:
         stmt = stmt.where(Asignacion.empresa_id == empresa_id)
-    return db.scalars(stmt).all()
+    return paginate(db, stmt, (Asignacion.id,), model=Asignacion, fields=fields, after=after, limit=limit)
 
 def get_asignacion(db: Session, asignacion_id: int) -> Optional[Asignacion]:
     return db.get(Asignacion, asignacion_id)
@@ -928,6 +1309,8 @@ def get_or_create_active_asignacion(
 
 # --- MODO SIMPLE: garantiza asignaciÃ³n auto (vigencia amplia) ---
 
+AUTO_ASIGNACION_RENOVAR_ANTES = timedelta(days=365)
+
 def get_or_create_auto_asignacion(
     db: Session,
     empresa_id: int,
@@ -942,10 +1325,16 @@ def get_or_create_auto_asignacion(
 
     vigente = get_active_asignacion_for_empresa(db, empresa_id)
     if vigente:
+        # Solo se escribe si algo difiere; la vigencia se renueva cuando le queda menos de un año
+        cierre = vigente.fecha_cierre.replace(tzinfo=None) if vigente.fecha_cierre else None
+        renovar_vigencia = cierre is None or cierre - datetime.utcnow() < AUTO_ASIGNACION_RENOVAR_ANTES
+        if vigente.cuestionario_id == cuest.id and bool(vigente.anonimo) == bool(anonimo) and not renovar_vigencia:
+            return vigente
         now = datetime.now(timezone.utc)
         vigente.cuestionario_id = cuest.id
-        vigente.fecha_inicio = now - timedelta(hours=1)
-        vigente.fecha_cierre = now + timedelta(days=3650)
+        if renovar_vigencia:
+            vigente.fecha_inicio = now - timedelta(hours=1)
+            vigente.fecha_cierre = now + timedelta(days=3650)
         vigente.anonimo = anonimo
         db.commit()
         db.refresh(vigente)
@@ -970,31 +1359,100 @@ def get_or_create_auto_asignacion(
 # ENCUESTA (AsignaciÃ³n â†’ Pilares/Preguntas â†’ Respuestas & Progreso)
 # ======================================================
 
+# --- Estructura del cuestionario cacheada en memoria (ver CACHÉS EN MEMORIA) ---
+
+def get_questionnaire_structure(db: Session, cuestionario_id: int) -> Dict:
+    """
+    Estructura compacta (solo lectura) de un cuestionario:
+      - questions: {pregunta_id: {"pilar_id", "subpilar_id", "tipo", "peso"}}
+      - pilares: {pilar_id: {"nombre", "empresa_id", "question_ids" (orden de la encuesta), "total"}}
+        en orden de pilar_id
+      - subpilar_orden: {subpilar_id: orden}
+    Se cachea por (cuestionario_id, versión); ver invalidate_questionnaire_cache.
+    """
+    key = (cuestionario_id, _questionnaire_version)
+    cached = _questionnaire_cache.get(key)
+    if cached is not None:
+        return cached
+
+    rows = db.execute(
+        select(
+            Pregunta.id,
+            Pregunta.pilar_id,
+            Pregunta.subpilar_id,
+            Pregunta.tipo,
+            Pregunta.peso,
+            Subpilar.orden.label("subpilar_orden"),
+            Pilar.nombre.label("pilar_nombre"),
+            Pilar.empresa_id.label("pilar_empresa_id"),
+        )
+        .join(CuestionarioPregunta, CuestionarioPregunta.pregunta_id == Pregunta.id)
+        .join(Pilar, Pregunta.pilar_id == Pilar.id)
+        .outerjoin(Subpilar, Subpilar.id == Pregunta.subpilar_id)
+        .where(CuestionarioPregunta.cuestionario_id == cuestionario_id)
+        .order_by(
+            # Mismo orden que la encuesta: orden del subpilar (NULL al final), subpilar, pregunta
+            Subpilar.orden.asc().nulls_last(),
+            Pregunta.subpilar_id.asc().nulls_last(),
+            Pregunta.id.asc(),
+        )
+    ).all()
+
+    questions: Dict[int, Dict] = {}
+    pilares: Dict[int, Dict] = {}
+    subpilar_orden: Dict[int, Optional[int]] = {}
+    for row in rows:
+        questions[row.id] = {
+            "pilar_id": row.pilar_id,
+            "subpilar_id": row.subpilar_id,
+            "tipo": row.tipo,
+            "peso": row.peso,
+        }
+        pilar = pilares.setdefault(
+            row.pilar_id,
+            {"nombre": row.pilar_nombre, "empresa_id": row.pilar_empresa_id, "question_ids": []},
+        )
+        pilar["question_ids"].append(row.id)
+        if row.subpilar_id is not None:
+            subpilar_orden[row.subpilar_id] = row.subpilar_orden
+
+    structure = {
+        "cuestionario_id": cuestionario_id,
+        "questions": questions,
+        "pilares": {
+            pilar_id: {**data, "question_ids": tuple(data["question_ids"]), "total": len(data["question_ids"])}
+            for pilar_id, data in sorted(pilares.items())
+        },
+        "subpilar_orden": subpilar_orden,
+    }
+    _questionnaire_cache.set(key, structure)
+    return structure
+
+
+def _assignment_pilar_ids(structure: Dict, empresa_id: int) -> List[int]:
+    """Pilares del cuestionario visibles para la empresa de la asignación (globales o propios)."""
+    return [
+        pilar_id
+        for pilar_id, data in structure["pilares"].items()
+        if data["empresa_id"] is None or data["empresa_id"] == empresa_id
+    ]
+
+
 def list_pilares_por_asignacion(db: Session, asignacion_id: int) -> List[Pilar]:
     asg = get_asignacion(db, asignacion_id)
     if not asg:
         return []
-    stmt = (
-        select(Pilar)
-        .join(Pregunta, Pregunta.pilar_id == Pilar.id)
-        .join(CuestionarioPregunta, CuestionarioPregunta.pregunta_id == Pregunta.id)
-        .where(CuestionarioPregunta.cuestionario_id == asg.cuestionario_id)
-        .where(or_(Pilar.empresa_id == asg.empresa_id, Pilar.empresa_id.is_(None)))
-        .group_by(Pilar.id)
-        .order_by(Pilar.id)
-    )
+    pilar_ids = _assignment_pilar_ids(get_questionnaire_structure(db, asg.cuestionario_id), asg.empresa_id)
+    if not pilar_ids:
+        return []
+    stmt = select(Pilar).where(Pilar.id.in_(pilar_ids)).order_by(Pilar.id)
     return db.scalars(stmt).all()
 
 def ensure_question_belongs_to_assignment(db: Session, asignacion_id: int, pregunta_id: int) -> bool:
     asg = get_asignacion(db, asignacion_id)
     if not asg:
         return False
-    stmt = (
-        select(CuestionarioPregunta)
-        .where(CuestionarioPregunta.cuestionario_id == asg.cuestionario_id)
-        .where(CuestionarioPregunta.pregunta_id == pregunta_id)
-    )
-    return db.scalars(stmt).first() is not None
+    return pregunta_id in get_questionnaire_structure(db, asg.cuestionario_id)["questions"]
 
 def get_pilar_questions_with_answers(
     db: Session,
@@ -1016,30 +1474,36 @@ def get_pilar_questions_with_answers(
     if not pil:
         return [], {}
 
-    q_pregs = (
-        select(Pregunta)
-        .join(CuestionarioPregunta, CuestionarioPregunta.pregunta_id == Pregunta.id)
-        .outerjoin(Subpilar, Subpilar.id == Pregunta.subpilar_id)  # LEFT JOIN para incluir subpilares
-        .where(CuestionarioPregunta.cuestionario_id == asg.cuestionario_id)
-        .where(Pregunta.pilar_id == pilar_id)
-        .order_by(
-            # Primero ordenamos por orden del subpilar (NULL va al final)
-            Subpilar.orden.asc().nulls_last(),
-            # Luego por id de subpilar (para agrupar preguntas del mismo subpilar)
-            Pregunta.subpilar_id.asc().nulls_last(),
-            # Finalmente por id de pregunta
-            Pregunta.id.asc()
-        )
-    )
-    preguntas = db.scalars(q_pregs).all()
+    # El orden (subpilar.orden, subpilar_id, pregunta.id) viene de la estructura cacheada
+    structure = get_questionnaire_structure(db, asg.cuestionario_id)
+    ordered_ids = structure["pilares"].get(pilar_id, {}).get("question_ids", ())
+    if not ordered_ids:
+        return [], {}
+    by_id = {
+        p.id: p
+        for p in db.scalars(select(Pregunta).where(Pregunta.id.in_(set(ordered_ids)))).all()
+    }
+    preguntas = [by_id[pid] for pid in ordered_ids if pid in by_id]
     if not preguntas:
         return [], {}
 
-    preg_ids = [p.id for p in preguntas]
+    rmap = _current_answers(db, asg, [p.id for p in preguntas], empleado_id)
+    return preguntas, rmap
+
 
+def _current_answers(
+    db: Session,
+    asg: Asignacion,
+    pregunta_ids: Sequence[int],
+    empleado_id: Optional[int] = None,
+) -> Dict[int, Respuesta]:
+    """
+    Respuestas vigentes de la asignación por pregunta: las anónimas si la
+    asignación es anónima, las del empleado si se indica, ninguna en otro caso.
+    """
     resp_stmt = select(Respuesta).where(
-        Respuesta.asignacion_id == asignacion_id,
-        Respuesta.pregunta_id.in_(preg_ids),
+        Respuesta.asignacion_id == asg.id,
+        Respuesta.pregunta_id.in_(pregunta_ids),
     )
     if asg.anonimo:
         resp_stmt = resp_stmt.where(Respuesta.empleado_id.is_(None))
@@ -1049,9 +1513,74 @@ def get_pilar_questions_with_answers(
         else:
             resp_stmt = resp_stmt.where(Respuesta.empleado_id == -1)
 
-    respuestas = db.scalars(resp_stmt).all()
-    rmap: Dict[int, Respuesta] = {r.pregunta_id: r for r in respuestas}
-    return preguntas, rmap
+    return {r.pregunta_id: r for r in db.scalars(resp_stmt).all()}
+
+
+def get_assignment_survey(
+    db: Session,
+    asg: Asignacion,
+    empleado_id: Optional[int] = None,
+    include_expected: bool = False,
+) -> Dict:
+    """
+    Encuesta completa de una asignación en una sola pasada: pilares visibles
+    (en orden de pilar_id), sus subpilares y preguntas en el orden de la
+    encuesta, la respuesta actual de cada pregunta y el progreso.
+    Usa la estructura cacheada del cuestionario más una consulta de preguntas
+    (con pilar y subpilar) y una de respuestas; el progreso sale de los
+    contadores incrementales. Los niveles Likert van una sola vez.
+    """
+    structure = get_questionnaire_structure(db, asg.cuestionario_id)
+    pilar_ids = _assignment_pilar_ids(structure, asg.empresa_id)
+    ordered_ids = [pid for pilar_id in pilar_ids for pid in structure["pilares"][pilar_id]["question_ids"]]
+
+    rows = db.execute(
+        select(Pregunta, Pilar, Subpilar)
+        .join(Pilar, Pregunta.pilar_id == Pilar.id)
+        .outerjoin(Subpilar, Subpilar.id == Pregunta.subpilar_id)
+        .where(Pregunta.id.in_(ordered_ids))
+    ).all() if ordered_ids else []
+    by_id = {row.Pregunta.id: row for row in rows}
+    rmap = _current_answers(db, asg, list(by_id), empleado_id) if by_id else {}
+
+    pilares: Dict[int, Dict] = {}
+    for pid in ordered_ids:
+        row = by_id.get(pid)
+        if row is None:
+            continue
+        pregunta, pilar, subpilar = row
+        data = pilares.setdefault(pilar.id, {
+            "id": pilar.id,
+            "empresa_id": pilar.empresa_id,
+            "nombre": pilar.nombre,
+            "descripcion": pilar.descripcion,
+            "peso": pilar.peso,
+            "subpilares": {},
+            "preguntas": [],
+        })
+        if subpilar is not None and subpilar.id not in data["subpilares"]:
+            data["subpilares"][subpilar.id] = subpilar
+        data["preguntas"].append({
+            "id": pregunta.id,
+            "subpilar_id": pregunta.subpilar_id,
+            "enunciado": pregunta.enunciado,
+            "tipo": pregunta.tipo,
+            "es_obligatoria": pregunta.es_obligatoria,
+            "peso": pregunta.peso,
+            "respuesta_actual": (rmap[pid].valor if pid in rmap else None),
+            "respuesta_esperada": pregunta.respuesta_esperada if include_expected else None,
+        })
+
+    return {
+        "asignacion_id": asg.id,
+        "empleado_id": empleado_id,
+        "likert_levels": LIKERT_LEVELS,
+        "pilares": [
+            {**data, "subpilares": list(data["subpilares"].values())}
+            for data in pilares.values()
+        ],
+        "progreso": compute_assignment_progress(db, asg.id, empleado_id),
+    }
 
 
 def ensure_questionnaire_questions(
@@ -1078,6 +1607,7 @@ def ensure_questionnaire_questions(
                 )
             )
             existing_ids -= set(missing)
+            _mark_questionnaire_changed(db)
     orden = (
         db.scalar(
             select(func.max(CuestionarioPregunta.orden)).where(CuestionarioPregunta.cuestionario_id == cuestionario.id)
@@ -1099,27 +1629,228 @@ def ensure_questionnaire_questions(
         added += 1
     if added:
         db.flush()
+        _mark_questionnaire_changed(db)
+    return added
+
+
+def sync_questions_with_questionnaires(db: Session, pregunta_ids: Sequence[int]) -> int:
+    """
+    Agrega las preguntas a los cuestionarios que correspondan (todos si el pilar
+    es global, los de su empresa si no) con un solo INSERT ... SELECT de los
+    pares (cuestionario_id, pregunta_id) que falten. El orden continúa desde el
+    máximo de cada cuestionario, por id de pregunta. No hace commit.
+    """
+    if not pregunta_ids:
+        return 0
+    max_orden = (
+        select(func.coalesce(func.max(CuestionarioPregunta.orden), 0))
+        .where(CuestionarioPregunta.cuestionario_id == Cuestionario.id)
+        .scalar_subquery()
+    )
+    already_linked = (
+        select(CuestionarioPregunta.id)
+        .where(
+            CuestionarioPregunta.cuestionario_id == Cuestionario.id,
+            CuestionarioPregunta.pregunta_id == Pregunta.id,
+        )
+        .exists()
+    )
+    missing = (
+        select(
+            Cuestionario.id,
+            Pregunta.id,
+            max_orden + func.row_number().over(partition_by=Cuestionario.id, order_by=Pregunta.id),
+        )
+        .select_from(Cuestionario)
+        .join(Pilar, or_(Pilar.empresa_id.is_(None), Pilar.empresa_id == Cuestionario.empresa_id))
+        .join(Pregunta, Pregunta.pilar_id == Pilar.id)
+        .where(Pregunta.id.in_(list(pregunta_ids)), ~already_linked)
+    )
+    result = db.execute(
+        insert(CuestionarioPregunta).from_select(["cuestionario_id", "pregunta_id", "orden"], missing)
+    )
+    added = result.rowcount or 0
+    if added:
+        _mark_questionnaire_changed(db)
     return added
 
 
 def sync_question_with_questionnaires(db: Session, pregunta: Pregunta) -> None:
-    pilar = db.get(Pilar, pregunta.pilar_id)
-    if not pilar:
-        return
+    sync_questions_with_questionnaires(db, [pregunta.id])
+    db.commit()
+
+# ======================================================
+# RESPUESTAS: puntaje numérico (Respuesta.score)
+# ======================================================
+
+_SI_NO_TRUE = {"1", "si", "sÃ­", "true", "t", "yes", "y"}
+_SI_NO_FALSE = {"0", "no", "false", "f", "not", "n"}
+
+
+def respuesta_score(tipo: Optional[TipoPreguntaEnum], valor: Optional[str]) -> Optional[float]:
+    """
+    Puntaje numérico de una respuesta, calculado una sola vez al escribirla:
+      - LIKERT: 1..5 (valores heredados en escala 0..1 o 0..100 se guardan tal cual;
+        el dashboard solo considera 1..5 y el progreso los normaliza)
+      - SI_NO: 1 (sí) / 0 (no)
+      - ABIERTA o valores no interpretables: None
+    """
+    if valor is None:
+        return None
+    raw = str(valor).strip()
+    if not raw:
+        return None
+    if tipo == TipoPreguntaEnum.LIKERT:
+        try:
+            num = float(raw.replace(",", "."))
+        except ValueError:
+            return None
+        # 1..5; se conservan valores heredados en escala 0..1 o 0..100
+        if 0 <= num <= 100:
+            return num
+        return None
+    if tipo == TipoPreguntaEnum.SI_NO:
+        lowered = raw.lower()
+        if lowered in _SI_NO_TRUE:
+            return 1.0
+        if lowered in _SI_NO_FALSE:
+            return 0.0
+        return None
+    # Preguntas abiertas no aportan a puntaje
+    return None
+
+
+def refresh_respuesta_scores(
+    db: Session,
+    *,
+    pregunta_id: Optional[int] = None,
+    only_missing: bool = False,
+    chunk_size: int = 1000,
+    commit: bool = True,
+) -> int:
+    """
+    Recalcula Respuesta.score por bloques de ids (p. ej. al cambiar el tipo de una pregunta
+    o tras insertar respuestas directamente desde scripts). Retorna las filas modificadas.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        stmt = (
+            select(Respuesta.id, Respuesta.valor, Respuesta.score, Pregunta.tipo)
+            .join(Pregunta, Respuesta.pregunta_id == Pregunta.id)
+            .where(Respuesta.id > last_id)
+            .order_by(Respuesta.id)
+            .limit(chunk_size)
+        )
+        if pregunta_id is not None:
+            stmt = stmt.where(Respuesta.pregunta_id == pregunta_id)
+        if only_missing:
+            stmt = stmt.where(Respuesta.score.is_(None), Respuesta.valor.is_not(None))
+        rows = db.execute(stmt).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        changes = []
+        for row in rows:
+            score = respuesta_score(row.tipo, row.valor)
+            if score != row.score:
+                changes.append({"id": row.id, "score": score})
+        if changes:
+            db.execute(update(Respuesta), changes)
+            updated += len(changes)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+    return updated
+
 
-    if pilar.empresa_id is None:
-        target_cuestionarios = db.scalars(select(Cuestionario)).all()
+def _upsert_respuestas(db: Session, rows: List[Dict]) -> bool:
+    """
+    Inserta o actualiza respuestas con empleado en un solo statement, usando la
+    restricción única uq_resp_asig_preg_emp (asignacion_id, pregunta_id, empleado_id).
+    PostgreSQL/SQLite: INSERT ... ON CONFLICT DO UPDATE; MySQL: ON DUPLICATE KEY UPDATE.
+    Retorna False si el motor no soporta upsert (el llamador resuelve por separado).
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(Respuesta).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Respuesta.asignacion_id, Respuesta.pregunta_id, Respuesta.empleado_id],
+            set_={
+                "valor": stmt.excluded.valor,
+                "score": stmt.excluded.score,
+                "fecha_respuesta": stmt.excluded.fecha_respuesta,
+            },
+        )
+        db.execute(stmt)
+    elif dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        stmt = mysql_insert(Respuesta).values(rows)
+        stmt = stmt.on_duplicate_key_update(
+            valor=stmt.inserted.valor,
+            score=stmt.inserted.score,
+            fecha_respuesta=stmt.inserted.fecha_respuesta,
+        )
+        db.execute(stmt)
     else:
-        target_cuestionarios = db.scalars(
-            select(Cuestionario).where(Cuestionario.empresa_id == pilar.empresa_id)
-        ).all()
+        return False
+    return True
+
 
-    if not target_cuestionarios:
+def _upsert_increments(
+    db: Session,
+    model,
+    rows: List[Dict],
+    key_columns: Sequence[str],
+    increment_columns: Sequence[str],
+) -> None:
+    """
+    Inserta los grupos nuevos y suma en la base (col = col + valor) sobre los existentes,
+    usando la restricción única de `key_columns`. Sin leer-modificar-escribir en Python:
+    dos transacciones concurrentes no pierden sus incrementos, y la fila queda bloqueada
+    hasta el commit (sirve también para "reclamar" un grupo con incrementos en 0).
+    PostgreSQL/SQLite: INSERT ... ON CONFLICT DO UPDATE; MySQL: ON DUPLICATE KEY UPDATE;
+    otros motores: UPDATE con incremento y INSERT si no había fila.
+    """
+    if not rows:
         return
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(model).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c[name] for name in key_columns],
+            set_={name: table.c[name] + stmt.excluded[name] for name in increment_columns},
+        )
+        db.execute(stmt)
+    elif dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        stmt = mysql_insert(model).values(rows)
+        stmt = stmt.on_duplicate_key_update(
+            {name: table.c[name] + stmt.inserted[name] for name in increment_columns}
+        )
+        db.execute(stmt)
+    else:
+        for row in rows:
+            result = db.execute(
+                update(model)
+                .where(*(table.c[name] == row[name] for name in key_columns))
+                .values({name: table.c[name] + row[name] for name in increment_columns})
+            )
+            if not result.rowcount:
+                db.execute(insert(model).values(row))
 
-    for cuest in target_cuestionarios:
-        ensure_questionnaire_questions(db, cuest, [pregunta])
-    db.commit()
 
 def submit_bulk_answers(
     db: Session,
@@ -1127,70 +1858,141 @@ def submit_bulk_answers(
     items: List[Dict],
     empleado_id: Optional[int] = None
 ) -> Dict[str, int]:
+    """
+    Guarda un lote de respuestas con operaciones por conjunto:
+    una consulta de pertenencia al cuestionario, una lectura de las respuestas
+    existentes y un upsert masivo (en vez de 2-3 consultas por pregunta).
+    """
     asg = get_asignacion(db, asignacion_id)
     if not asg:
         return {"creadas": 0, "actualizadas": 0}
+    if not asg.anonimo and empleado_id is None:
+        return {"creadas": 0, "actualizadas": 0}
+    respuesta_empleado_id = None if asg.anonimo else empleado_id
 
-    creadas = 0
-    actualizadas = 0
-
+    # Último valor por pregunta (si una pregunta viene repetida en el lote, gana la última)
+    valores: Dict[int, str] = {}
     for it in items:
-        pid = it["pregunta_id"]
-        if not ensure_question_belongs_to_assignment(db, asignacion_id, pid):
-            continue
+        valores[it["pregunta_id"]] = str(it.get("valor") if it.get("valor") is not None else "")
+    if not valores:
+        return {"creadas": 0, "actualizadas": 0}
 
-        valor = str(it.get("valor") if it.get("valor") is not None else "")
+    # Pertenencia al cuestionario de la asignación (estructura cacheada)
+    valid_ids = get_questionnaire_structure(db, asg.cuestionario_id)["questions"]
+    valores = {pid: valor for pid, valor in valores.items() if pid in valid_ids}
+    if not valores:
+        return {"creadas": 0, "actualizadas": 0}
 
-        stmt = select(Respuesta).where(
-            Respuesta.asignacion_id == asignacion_id,
-            Respuesta.pregunta_id == pid,
+    # Metadatos de las preguntas (peso, pilar) y departamento del empleado para el rollup diario
+    meta_rows = db.execute(
+        select(
+            Pregunta.id,
+            Pregunta.tipo,
+            Pregunta.peso,
+            Pregunta.pilar_id,
+            Pilar.peso.label("pilar_peso"),
         )
+        .join(Pilar, Pregunta.pilar_id == Pilar.id)
+        .where(Pregunta.id.in_(valores.keys()))
+    ).all()
+    meta_map = {row.id: row for row in meta_rows}
+    empleado_departamento_id = None
+    if respuesta_empleado_id is not None:
+        emp = db.get(Empleado, respuesta_empleado_id)
+        empleado_departamento_id = emp.departamento_id if emp else None
+
+    # Contadores del lote reclamados (y bloqueados) antes de leer las respuestas previas
+    _claim_progress_counters(db, asignacion_id, respuesta_empleado_id, [row.pilar_id for row in meta_rows])
+
+    # Respuestas previas del lote (para contar actualizadas y descontar su aporte al rollup)
+    existing_stmt = select(
+        Respuesta.id,
+        Respuesta.pregunta_id,
+        Respuesta.score,
+        Respuesta.fecha_respuesta,
+    ).where(
+        Respuesta.asignacion_id == asignacion_id,
+        Respuesta.pregunta_id.in_(valores.keys()),
+    )
+    if respuesta_empleado_id is None:
+        existing_stmt = existing_stmt.where(Respuesta.empleado_id.is_(None))
+    else:
+        existing_stmt = existing_stmt.where(Respuesta.empleado_id == respuesta_empleado_id)
+    existing_map = {}
+    for row in db.execute(existing_stmt.with_for_update()):
+        existing_map.setdefault(row.pregunta_id, row)
+
+    now_utc = datetime.utcnow()  # naive UTC para timestamp
+    rollup_deltas: Dict[tuple, List[float]] = {}
+    progress_deltas: Dict[tuple, List[float]] = {}
+    rows: List[Dict] = []
+    for pid, valor in valores.items():
+        meta = meta_map.get(pid)
+        score = respuesta_score(meta.tipo, valor) if meta is not None else None
+        existing = existing_map.get(pid)
+        if existing is not None:
+            _collect_rollup_delta(
+                rollup_deltas, asg, meta, respuesta_empleado_id, empleado_departamento_id,
+                existing.score, existing.fecha_respuesta, -1.0,
+            )
+            _collect_progress_delta(progress_deltas, asignacion_id, respuesta_empleado_id, meta, existing.score, -1)
+        _collect_progress_delta(progress_deltas, asignacion_id, respuesta_empleado_id, meta, score, 1)
+        _collect_rollup_delta(
+            rollup_deltas, asg, meta, respuesta_empleado_id, empleado_departamento_id, score, now_utc, 1.0,
+        )
+        rows.append({
+            "id": existing.id if existing is not None else None,
+            "asignacion_id": asignacion_id,
+            "pregunta_id": pid,
+            "empleado_id": respuesta_empleado_id,
+            "valor": valor,
+            "score": score,
+            "fecha_respuesta": now_utc,
+        })
 
-        now_utc = datetime.utcnow()  # naive UTC para timestamp
-
-        if asg.anonimo:
-            stmt = stmt.where(Respuesta.empleado_id.is_(None))
-            existing = db.scalars(stmt).first()
-            if existing:
-                existing.valor = valor
-                existing.fecha_respuesta = now_utc
-                actualizadas += 1
-            else:
-                db.add(Respuesta(
-                    asignacion_id=asignacion_id,
-                    pregunta_id=pid,
-                    empleado_id=None,
-                    valor=valor,
-                    fecha_respuesta=now_utc,
-                ))
-                creadas += 1
-        else:
-            if empleado_id is None:
-                continue
-            stmt = stmt.where(Respuesta.empleado_id == empleado_id)
-            existing = db.scalars(stmt).first()
-            if existing:
-                existing.valor = valor
-                existing.fecha_respuesta = now_utc
-                actualizadas += 1
-            else:
-                db.add(Respuesta(
-                    asignacion_id=asignacion_id,
-                    pregunta_id=pid,
-                    empleado_id=empleado_id,
-                    valor=valor,
-                    fecha_respuesta=now_utc,
-                ))
-                creadas += 1
+    actualizadas = sum(1 for row in rows if row["id"] is not None)
+    creadas = len(rows) - actualizadas
 
+    upserted = False
+    if respuesta_empleado_id is not None:
+        upserted = _upsert_respuestas(
+            db,
+            [{key: value for key, value in row.items() if key != "id"} for row in rows],
+        )
+    if not upserted:
+        # Anónimas (empleado_id NULL no activa la restricción única) u otros motores:
+        # INSERT masivo de las nuevas y UPDATE masivo por id de las existentes
+        nuevas = [
+            {key: value for key, value in row.items() if key != "id"}
+            for row in rows
+            if row["id"] is None
+        ]
+        cambios = [
+            {
+                "id": row["id"],
+                "valor": row["valor"],
+                "score": row["score"],
+                "fecha_respuesta": row["fecha_respuesta"],
+            }
+            for row in rows
+            if row["id"] is not None
+        ]
+        if nuevas:
+            db.execute(insert(Respuesta), nuevas)
+        if cambios:
+            db.execute(update(Respuesta), cambios)
+
+    _apply_rollup_deltas(db, rollup_deltas)
+    _apply_progress_deltas(db, progress_deltas)
+    _mark_analytics_changed(db, asg.empresa_id)
     db.commit()
     return {"creadas": creadas, "actualizadas": actualizadas}
 
-
 # ======================================================
 # AUDITORÃA
 # ======================================================
 def _build_audit_query(
+    db: Session,
     *,
     date_from: Optional[datetime] = None,
     date_to: Optional[datetime] = None,
@@ -1224,16 +2026,16 @@ def _build_audit_query(
     if date_to:
         stmt = stmt.where(AuditLog.created_at <= date_to)
     if search:
-        pattern = f"%{search.lower()}%"
-        stmt = stmt.where(
-            or_(
-                func.lower(AuditLog.notes).like(pattern),
-                func.lower(AuditLog.user_email).like(pattern),
-                func.lower(AuditLog.entity_type).like(pattern),
-                func.lower(AuditLog.path).like(pattern),
-            )
-        )
-    return stmt.order_by(AuditLog.created_at.desc())
+        # FTS5 trigram en SQLite / GIN pg_trgm en PostgreSQL (ver app/search.py)
+        stmt = stmt.where(audit_search_condition(db, search))
+    # id como desempate: orden total y estable para OFFSET y para keyset
+    return stmt.order_by(AuditLog.created_at.desc(), AuditLog.id.desc())
+
+
+def _audit_keyset_before(created_at: datetime, log_id: int):
+    """Condición keyset para continuar después de (created_at, id) en orden descendente."""
+    # Comparación de tuplas: recorre ix_audit_logs_created_at_id como un solo rango
+    return tuple_(AuditLog.created_at, AuditLog.id) < tuple_(created_at, log_id)
 
 
 def list_audit_logs(
@@ -1251,8 +2053,15 @@ def list_audit_logs(
     scope_empresa_id: Optional[int] = None,
     limit: int = 200,
     offset: int = 0,
+    after: Optional[Tuple[datetime, int]] = None,
 ) -> List[AuditLog]:
+    """
+    Lista la auditoría filtrada. Con `after` = (created_at, id) del último
+    registro de la página anterior pagina por keyset (índice
+    ix_audit_logs_created_at_id) en lugar de OFFSET.
+    """
     stmt = _build_audit_query(
+        db,
         date_from=date_from,
         date_to=date_to,
         empresa_id=empresa_id,
@@ -1264,11 +2073,34 @@ def list_audit_logs(
         search=search,
         scope_empresa_id=scope_empresa_id,
     )
+    if after is not None:
+        stmt = stmt.where(_audit_keyset_before(*after))
     stmt = stmt.offset(offset).limit(limit)
     return db.scalars(stmt).all()
 
 
-def export_audit_logs(
+AUDIT_EXPORT_CHUNK_SIZE = int(os.getenv("AUDIT_EXPORT_CHUNK_SIZE", "1000"))
+
+# Columnas planas para exportar/respaldar sin cargar diffs JSON ni objetos ORM
+_AUDIT_EXPORT_COLUMNS = (
+    AuditLog.id,
+    AuditLog.created_at,
+    AuditLog.user_id,
+    AuditLog.user_email,
+    AuditLog.user_role,
+    AuditLog.empresa_id,
+    AuditLog.action,
+    AuditLog.entity_type,
+    AuditLog.entity_id,
+    AuditLog.notes,
+    AuditLog.ip,
+    AuditLog.user_agent,
+    AuditLog.method,
+    AuditLog.path,
+)
+
+
+def audit_export_snapshot(
     db: Session,
     *,
     date_from: Optional[datetime] = None,
@@ -1281,8 +2113,14 @@ def export_audit_logs(
     entity_type: Optional[str] = None,
     search: Optional[str] = None,
     scope_empresa_id: Optional[int] = None,
-) -> List[AuditLog]:
-    stmt = _build_audit_query(
+) -> Tuple[int, Optional[int]]:
+    """
+    Cantidad de registros que coinciden con los filtros y el id máximo actual.
+    El id sirve de tope (until_id) para que un export no incluya registros
+    creados mientras se transmite (p. ej. su propio AUDIT_EXPORT).
+    """
+    filtered = _build_audit_query(
+        db,
         date_from=date_from,
         date_to=date_to,
         empresa_id=empresa_id,
@@ -1293,8 +2131,75 @@ def export_audit_logs(
         entity_type=entity_type,
         search=search,
         scope_empresa_id=scope_empresa_id,
+    ).order_by(None)
+    total, max_id = db.execute(
+        filtered.with_only_columns(func.count(AuditLog.id), func.max(AuditLog.id))
+    ).one()
+    return int(total or 0), max_id
+
+
+def iter_audit_log_chunks(
+    db: Session,
+    *,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    empresa_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    user_email: Optional[str] = None,
+    user_role: Optional[str] = None,
+    action: Optional[AuditActionEnum] = None,
+    entity_type: Optional[str] = None,
+    search: Optional[str] = None,
+    scope_empresa_id: Optional[int] = None,
+    until_id: Optional[int] = None,
+    chunk_size: int = AUDIT_EXPORT_CHUNK_SIZE,
+) -> Iterator[Sequence[RowMapping]]:
+    """
+    Recorre la auditoría filtrada en bloques ordenados por (created_at, id) desc.
+    Cada bloque es una consulta keyset independiente (sin OFFSET), por lo que la
+    memoria queda acotada a chunk_size filas y el llamador puede borrar o
+    confirmar entre bloques sin perder la posición.
+    """
+    chunk_size = max(int(chunk_size), 1)
+    stmt = (
+        _build_audit_query(
+            db,
+            date_from=date_from,
+            date_to=date_to,
+            empresa_id=empresa_id,
+            user_id=user_id,
+            user_email=user_email,
+            user_role=user_role,
+            action=action,
+            entity_type=entity_type,
+            search=search,
+            scope_empresa_id=scope_empresa_id,
+        )
+        .with_only_columns(*_AUDIT_EXPORT_COLUMNS)
     )
-    return db.scalars(stmt).all()
+    if until_id is not None:
+        stmt = stmt.where(AuditLog.id <= until_id)
+
+    last: Optional[Tuple[datetime, int]] = None
+    while True:
+        page = stmt if last is None else stmt.where(_audit_keyset_before(*last))
+        rows = db.execute(page.limit(chunk_size)).mappings().all()
+        if not rows:
+            return
+        last = (rows[-1]["created_at"], rows[-1]["id"])
+        yield rows
+        if len(rows) < chunk_size:
+            return
+
+
+def delete_audit_logs_by_ids(db: Session, log_ids: Iterable[int]) -> int:
+    """Elimina exactamente los registros indicados (p. ej. un bloque ya respaldado)."""
+    ids = list(log_ids)
+    if not ids:
+        return 0
+    result = db.execute(delete(AuditLog).where(AuditLog.id.in_(ids)))
+    db.commit()
+    return result.rowcount
 
 
 def delete_audit_log(db: Session, log_id: int) -> bool:
@@ -1319,6 +2224,153 @@ def clear_all_audit_logs(db: Session, scope_empresa_id: Optional[int] = None) ->
     db.commit()
     return result.rowcount
 
+# --- Contadores de progreso (ProgressCounter) ---
+
+def _progress_score_expr(tipo_column, score_column):
+    """Puntaje normalizado 0..1 en SQL: LIKERT 1..5 -> (score - 1) / 4 (fallback 0..1 o 0..100)."""
+    is_likert = tipo_column == TipoPreguntaEnum.LIKERT
+    return case(
+        (and_(is_likert, score_column >= 1, score_column <= 5), (score_column - 1.0) / 4.0),
+        (and_(is_likert, score_column < 1), score_column),
+        (is_likert, score_column / 100.0),
+        else_=score_column,
+    )
+
+
+def _progress_score(tipo: Optional[TipoPreguntaEnum], score: Optional[float]) -> Optional[float]:
+    """Equivalente en Python de _progress_score_expr (SI_NO ya viene en 0..1)."""
+    if score is None:
+        return None
+    if tipo == TipoPreguntaEnum.LIKERT:
+        if 1 <= score <= 5:
+            return (score - 1.0) / 4.0
+        if score < 1:
+            return score
+        return score / 100.0
+    return score
+
+
+def _collect_progress_delta(
+    groups: Dict[tuple, List[float]],
+    asignacion_id: int,
+    empleado_id: Optional[int],
+    meta,
+    score: Optional[float],
+    sign: int,
+) -> None:
+    """Acumula el aporte (+1) o retiro (-1) de una respuesta en su contador de progreso."""
+    if meta is None:
+        return
+    entry = groups.setdefault((asignacion_id, empleado_id, meta.pilar_id), [0, 0.0, 0])
+    entry[0] += sign
+    normalized = _progress_score(meta.tipo, score)
+    if normalized is not None:
+        entry[1] += sign * normalized
+        entry[2] += sign
+
+
+def _claim_progress_counters(
+    db: Session,
+    asignacion_id: int,
+    empleado_id: Optional[int],
+    pilar_ids: Iterable[int],
+) -> None:
+    """
+    Crea en 0 (si faltan) y bloquea hasta el commit los contadores que tocará el lote,
+    en orden de pilar. Va antes de leer las respuestas previas: otro envío del mismo
+    empleado (o anónimo) a la misma asignación espera aquí y después ve las respuestas
+    ya confirmadas, así ningún aporte se cuenta dos veces.
+    """
+    _upsert_increments(
+        db,
+        ProgressCounter,
+        [
+            {
+                "asignacion_id": asignacion_id,
+                "empleado_id": empleado_id,
+                "empleado_key": empleado_id or 0,
+                "pilar_id": pilar_id,
+                "respondidas": 0,
+                "score_sum": 0.0,
+                "score_count": 0,
+            }
+            for pilar_id in sorted(set(pilar_ids))
+        ],
+        key_columns=("asignacion_id", "empleado_key", "pilar_id"),
+        increment_columns=("respondidas", "score_sum", "score_count"),
+    )
+
+
+def _apply_progress_deltas(db: Session, groups: Dict[tuple, List[float]]) -> None:
+    """
+    Suma los deltas en la base (col = col + delta) dentro de la transacción actual (sin commit).
+    Los grupos ya existen: submit_bulk_answers los reclama con _claim_progress_counters.
+    """
+    for (asignacion_id, empleado_id, pilar_id), delta in groups.items():
+        if not delta[0] and not delta[2] and abs(delta[1]) < _ROLLUP_EPSILON:
+            continue
+        db.execute(
+            update(ProgressCounter)
+            .where(
+                ProgressCounter.asignacion_id == asignacion_id,
+                ProgressCounter.empleado_key == (empleado_id or 0),
+                ProgressCounter.pilar_id == pilar_id,
+            )
+            .values(
+                respondidas=ProgressCounter.respondidas + delta[0],
+                score_sum=ProgressCounter.score_sum + delta[1],
+                score_count=ProgressCounter.score_count + delta[2],
+            )
+        )
+
+
+def refresh_progress_counters(
+    db: Session,
+    *,
+    asignacion_id: Optional[int] = None,
+    pilar_id: Optional[int] = None,
+    commit: bool = True,
+) -> int:
+    """
+    Recalcula los contadores de progreso desde las respuestas (INSERT ... SELECT ... GROUP BY).
+    Sin filtros reconstruye todo; con filtros solo la asignación o el pilar afectado.
+    Retorna la cantidad de contadores escritos.
+    """
+    delete_stmt = delete(ProgressCounter)
+    grouped = (
+        select(
+            Respuesta.asignacion_id,
+            Respuesta.empleado_id,
+            func.coalesce(Respuesta.empleado_id, 0),
+            Pregunta.pilar_id,
+            func.count(Respuesta.id),
+            func.coalesce(func.sum(_progress_score_expr(Pregunta.tipo, Respuesta.score)), 0.0),
+            func.count(Respuesta.score),
+        )
+        .join(Pregunta, Respuesta.pregunta_id == Pregunta.id)
+        .group_by(Respuesta.asignacion_id, Respuesta.empleado_id, Pregunta.pilar_id)
+    )
+    if asignacion_id is not None:
+        delete_stmt = delete_stmt.where(ProgressCounter.asignacion_id == asignacion_id)
+        grouped = grouped.where(Respuesta.asignacion_id == asignacion_id)
+    if pilar_id is not None:
+        delete_stmt = delete_stmt.where(ProgressCounter.pilar_id == pilar_id)
+        grouped = grouped.where(Pregunta.pilar_id == pilar_id)
+
+    db.execute(delete_stmt)
+    result = db.execute(
+        insert(ProgressCounter).from_select(
+            ["asignacion_id", "empleado_id", "empleado_key", "pilar_id", "respondidas", "score_sum", "score_count"],
+            grouped,
+        )
+    )
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+    return max(result.rowcount or 0, 0)
+
+
 def compute_assignment_progress(
     db: Session,
     asignacion_id: int,
@@ -1339,123 +2391,56 @@ def compute_assignment_progress(
             "por_pilar": [],
         }
 
-    def normalize_answer(tipo: TipoPreguntaEnum, value: Optional[str]) -> Optional[float]:
-        if value is None:
-            return None
-        raw = value.strip()
-        if not raw:
-            return None
-        if tipo == TipoPreguntaEnum.LIKERT:
-            try:
-                num = float(raw.replace(",", "."))
-            except ValueError:
-                return None
-            if 1 <= num <= 5:
-                return (num - 1.0) / 4.0
-            # fallback: si viene 0..1 o 0..100
-            if 0 <= num <= 1:
-                return num
-            if 0 <= num <= 100:
-                return num / 100.0
-            return None
-        if tipo == TipoPreguntaEnum.SI_NO:
-            lowered = raw.lower()
-            if lowered in {"1", "si", "sÃ­", "true", "t", "yes", "y"}:
-                return 1.0
-            if lowered in {"0", "no", "false", "f", "not", "n"}:
-                return 0.0
-            return None
-        # Preguntas abiertas no aportan a puntaje
-        return None
-
-    totales_stmt = (
-        select(
-            Pilar.id.label("pilar_id"),
-            Pilar.nombre.label("pilar_nombre"),
-            func.count(Pregunta.id).label("total"),
-        )
-        .join(Pregunta, Pregunta.pilar_id == Pilar.id)
-        .join(CuestionarioPregunta, CuestionarioPregunta.pregunta_id == Pregunta.id)
-        .where(CuestionarioPregunta.cuestionario_id == asg.cuestionario_id)
-        .where(or_(Pilar.empresa_id == asg.empresa_id, Pilar.empresa_id.is_(None)))
-        .group_by(Pilar.id)
-        .order_by(Pilar.id)
-    )
-    totales_rows = db.execute(totales_stmt).all()
+    # Totales por pilar desde la estructura cacheada del cuestionario
+    structure = get_questionnaire_structure(db, asg.cuestionario_id)
+    totales_rows = [
+        (pilar_id, structure["pilares"][pilar_id]["nombre"], structure["pilares"][pilar_id]["total"])
+        for pilar_id in _assignment_pilar_ids(structure, asg.empresa_id)
+    ]
 
+    # Respondidas y puntaje por pilar desde los contadores incrementales
     resp_stmt = (
         select(
-            Pilar.id.label("pilar_id"),
-            func.count(Respuesta.id).label("respondidas"),
-        )
-        .join(Pregunta, Pregunta.pilar_id == Pilar.id)
-        .join(
-            Respuesta,
-            and_(
-                Respuesta.pregunta_id == Pregunta.id,
-                Respuesta.asignacion_id == asignacion_id,
-            ),
-        )
-        .where(or_(Pilar.empresa_id == asg.empresa_id, Pilar.empresa_id.is_(None)))
-        .group_by(Pilar.id)
-    )
-    detalle_stmt = (
-        select(
-            Pilar.id.label("pilar_id"),
-            Pregunta.tipo.label("tipo"),
-            Respuesta.valor.label("valor"),
-        )
-        .join(Pregunta, Pregunta.pilar_id == Pilar.id)
-        .join(
-            Respuesta,
-            and_(
-                Respuesta.pregunta_id == Pregunta.id,
-                Respuesta.asignacion_id == asignacion_id,
-            ),
+            ProgressCounter.pilar_id,
+            func.sum(ProgressCounter.respondidas).label("respondidas"),
+            func.sum(ProgressCounter.score_sum).label("score_sum"),
+            func.sum(ProgressCounter.score_count).label("score_count"),
         )
-        .where(or_(Pilar.empresa_id == asg.empresa_id, Pilar.empresa_id.is_(None)))
+        .where(ProgressCounter.asignacion_id == asignacion_id)
+        .group_by(ProgressCounter.pilar_id)
     )
 
     if asg.anonimo:
-        resp_stmt = resp_stmt.where(Respuesta.empleado_id.is_(None))
-        detalle_stmt = detalle_stmt.where(Respuesta.empleado_id.is_(None))
+        resp_stmt = resp_stmt.where(ProgressCounter.empleado_id.is_(None))
     else:
         if empleado_id is not None:
-            resp_stmt = resp_stmt.where(Respuesta.empleado_id == empleado_id)
-            detalle_stmt = detalle_stmt.where(Respuesta.empleado_id == empleado_id)
+            resp_stmt = resp_stmt.where(ProgressCounter.empleado_id == empleado_id)
         else:
             # Agregamos todas las respuestas (todos los empleados asignados)
-            resp_stmt = resp_stmt.where(Respuesta.empleado_id.isnot(None))
-            detalle_stmt = detalle_stmt.where(Respuesta.empleado_id.isnot(None))
+            resp_stmt = resp_stmt.where(ProgressCounter.empleado_id.isnot(None))
 
     resp_rows = db.execute(resp_stmt).all()
-    detalle_rows = db.execute(detalle_stmt).all()
 
     resp_map = {row.pilar_id: int(row.respondidas or 0) for row in resp_rows}
 
     score_map: Dict[int, Dict[str, float]] = {}
     global_score_sum = 0.0
     global_score_count = 0
-    for row in detalle_rows:
-        normalized = normalize_answer(row.tipo, row.valor)
-        if normalized is None:
+    for row in resp_rows:
+        count = int(row.score_count or 0)
+        if not count:
             continue
-        agg = score_map.setdefault(
-            row.pilar_id,
-            {"sum": 0.0, "count": 0.0},
-        )
-        agg["sum"] += normalized
-        agg["count"] += 1
-        global_score_sum += normalized
-        global_score_count += 1
+        score_map[row.pilar_id] = {"sum": float(row.score_sum or 0.0), "count": float(count)}
+        global_score_sum += float(row.score_sum or 0.0)
+        global_score_count += count
 
     por_pilar = []
     total_global = 0
     respondidas_global = 0
-    for row in totales_rows:
-        total_preguntas = int(row.total or 0)
-        respondidas = resp_map.get(row.pilar_id, 0)
-        score_info = score_map.get(row.pilar_id, {"sum": 0.0, "count": 0.0})
+    for pilar_id, pilar_nombre, total in totales_rows:
+        total_preguntas = int(total or 0)
+        respondidas = resp_map.get(pilar_id, 0)
+        score_info = score_map.get(pilar_id, {"sum": 0.0, "count": 0.0})
         promedio = (
             (score_info["sum"] / score_info["count"]) if score_info["count"] else 0.0
         )
@@ -1464,8 +2449,8 @@ def compute_assignment_progress(
             completion = 1.0
 
         por_pilar.append({
-            "pilar_id": row.pilar_id,
-            "pilar_nombre": row.pilar_nombre,
+            "pilar_id": pilar_id,
+            "pilar_nombre": pilar_nombre,
             "total": total_preguntas,
             "respondidas": respondidas,
             "progreso": promedio,
@@ -1490,6 +2475,359 @@ def compute_assignment_progress(
         "por_pilar": por_pilar,
     }
 
+def compute_assignment_progress_batch(
+    db: Session,
+    asignacion_id: int,
+    empleado_ids: Optional[List[int]] = None,
+    departamento_id: Optional[int] = None,
+) -> Dict:
+    """
+    Progreso de muchos empleados de una asignación con una sola consulta agrupada
+    sobre los contadores. Mismas métricas que compute_assignment_progress, en forma
+    de matriz: cada empleado trae listas alineadas con "pilares".
+    Sin empleado_ids ni departamento_id se usa el alcance de la asignación.
+    """
+    asg = get_asignacion(db, asignacion_id)
+    if not asg:
+        raise ValueError("Asignación no encontrada")
+    if asg.anonimo:
+        raise ValueError("La asignación es anónima: no hay progreso por empleado")
+
+    structure = get_questionnaire_structure(db, asg.cuestionario_id)
+    pilar_ids = _assignment_pilar_ids(structure, asg.empresa_id)
+    pilares = [
+        {
+            "pilar_id": pilar_id,
+            "pilar_nombre": structure["pilares"][pilar_id]["nombre"],
+            "total": structure["pilares"][pilar_id]["total"],
+        }
+        for pilar_id in pilar_ids
+    ]
+    total_global = sum(p["total"] for p in pilares)
+
+    emp_stmt = select(Empleado.id, Empleado.nombre, Empleado.apellidos, Empleado.departamento_id).where(
+        Empleado.empresa_id == asg.empresa_id
+    )
+    if empleado_ids:
+        emp_stmt = emp_stmt.where(Empleado.id.in_({int(x) for x in empleado_ids}))
+    if departamento_id is not None:
+        emp_stmt = emp_stmt.where(Empleado.departamento_id == departamento_id)
+    if not empleado_ids and departamento_id is None:
+        if asg.alcance_tipo == "DEPARTAMENTO":
+            emp_stmt = emp_stmt.where(Empleado.departamento_id == asg.alcance_id)
+        elif asg.alcance_tipo == "EMPLEADO":
+            emp_stmt = emp_stmt.where(Empleado.id == asg.alcance_id)
+    empleados = db.execute(emp_stmt.order_by(Empleado.id)).all()
+    if not empleados:
+        return {"asignacion_id": asignacion_id, "total": total_global, "pilares": pilares, "empleados": []}
+
+    # Una sola consulta agrupada (empleado, pilar) para respondidas y puntaje
+    counters: Dict[int, Dict[int, tuple]] = {}
+    counter_stmt = (
+        select(
+            ProgressCounter.empleado_id,
+            ProgressCounter.pilar_id,
+            func.sum(ProgressCounter.respondidas).label("respondidas"),
+            func.sum(ProgressCounter.score_sum).label("score_sum"),
+            func.sum(ProgressCounter.score_count).label("score_count"),
+        )
+        .where(
+            ProgressCounter.asignacion_id == asignacion_id,
+            ProgressCounter.empleado_id.in_([row.id for row in empleados]),
+        )
+        .group_by(ProgressCounter.empleado_id, ProgressCounter.pilar_id)
+    )
+    for row in db.execute(counter_stmt):
+        counters.setdefault(row.empleado_id, {})[row.pilar_id] = (
+            int(row.respondidas or 0),
+            float(row.score_sum or 0.0),
+            int(row.score_count or 0),
+        )
+
+    filas = []
+    for emp in empleados:
+        por_pilar = counters.get(emp.id, {})
+        respondidas_por_pilar = []
+        progreso_por_pilar = []
+        for pilar in pilares:
+            respondidas, score_sum, score_count = por_pilar.get(pilar["pilar_id"], (0, 0.0, 0))
+            respondidas_por_pilar.append(respondidas)
+            progreso_por_pilar.append((score_sum / score_count) if score_count else 0.0)
+        # Igual que compute_assignment_progress: el puntaje global considera todos los pilares respondidos
+        score_sum_global = sum(values[1] for values in por_pilar.values())
+        score_count_global = sum(values[2] for values in por_pilar.values())
+        respondidas_global = sum(respondidas_por_pilar)
+        completion = (respondidas_global / total_global) if total_global else 0.0
+        filas.append({
+            "empleado_id": emp.id,
+            "nombre": " ".join(part for part in (emp.nombre, emp.apellidos) if part),
+            "departamento_id": emp.departamento_id,
+            "respondidas": respondidas_global,
+            "progreso": (score_sum_global / score_count_global) if score_count_global else 0.0,
+            "completion": min(completion, 1.0),
+            "respondidas_por_pilar": respondidas_por_pilar,
+            "progreso_por_pilar": progreso_por_pilar,
+        })
+
+    return {"asignacion_id": asignacion_id, "total": total_global, "pilares": pilares, "empleados": filas}
+
+# ======================================================
+# ANALYTICS: rollup diario (AnalyticsDailyRollup)
+# ======================================================
+
+_ROLLUP_EPSILON = 1e-9
+
+
+def _effective_departamento_id(
+    asg_alcance_tipo: Optional[str],
+    asg_alcance_id: Optional[int],
+    empleado_departamento_id: Optional[int],
+) -> Optional[int]:
+    if empleado_departamento_id is not None:
+        return empleado_departamento_id
+    if asg_alcance_tipo == "DEPARTAMENTO" and asg_alcance_id is not None:
+        return asg_alcance_id
+    return None
+
+
+def _alcance_departamento_id(asg_alcance_tipo: Optional[str], asg_alcance_id: Optional[int]) -> int:
+    """Departamento del alcance de la asignación; 0 si no es una asignación por DEPARTAMENTO."""
+    if asg_alcance_tipo == "DEPARTAMENTO" and asg_alcance_id is not None:
+        return asg_alcance_id
+    return 0
+
+
+def _add_rollup_value(groups: Dict[tuple, List[float]], key: tuple, value: float, weight: float, sign: float) -> None:
+    level_idx = int(round(value))
+    if level_idx < 1:
+        level_idx = 1
+    if level_idx > 5:
+        level_idx = 5
+    entry = groups.setdefault(key, [0.0] * 7)  # value_sum, weight_sum, level_1..level_5
+    entry[0] += sign * value * weight
+    entry[1] += sign * weight
+    entry[1 + level_idx] += sign * weight
+
+
+def _collect_rollup_delta(
+    groups: Dict[tuple, List[float]],
+    asg: Asignacion,
+    meta,
+    empleado_id: Optional[int],
+    empleado_departamento_id: Optional[int],
+    score: Optional[float],
+    fecha: datetime,
+    sign: float,
+) -> None:
+    """Acumula el aporte (+1) o retiro (-1) de una respuesta en su grupo del rollup."""
+    if meta is None or meta.tipo != TipoPreguntaEnum.LIKERT or fecha is None or score is None:
+        return
+    value = float(score)
+    if value < 1 or value > 5:
+        return
+    weight = float(meta.peso or 1) * float(meta.pilar_peso or 1)
+    if weight <= 0:
+        return
+    key = (
+        asg.empresa_id,
+        fecha.date(),
+        meta.pilar_id,
+        _effective_departamento_id(asg.alcance_tipo, asg.alcance_id, empleado_departamento_id),
+        _alcance_departamento_id(asg.alcance_tipo, asg.alcance_id),
+        empleado_id,
+        bool(asg.anonimo),
+    )
+    _add_rollup_value(groups, key, value, weight, sign)
+
+
+_ROLLUP_INCREMENT_COLUMNS = (
+    "value_sum", "weight_sum", "level_1", "level_2", "level_3", "level_4", "level_5",
+)
+
+
+def _apply_rollup_deltas(db: Session, groups: Dict[tuple, List[float]]) -> None:
+    """
+    Suma los deltas en la base (INSERT ... ON CONFLICT con col = col + delta) dentro de la
+    transacción actual (sin commit) y después borra, en un DELETE aparte, los grupos tocados
+    que quedaron sin peso.
+    """
+    rows: Dict[tuple, Dict] = {}
+    for key, delta in groups.items():
+        if all(abs(x) < _ROLLUP_EPSILON for x in delta):
+            continue
+        empresa_id, dia, pilar_id, departamento_id, alcance_departamento_id, empleado_id, anonimo = key
+        unique_key = (empresa_id, dia, pilar_id, alcance_departamento_id, empleado_id or 0, anonimo)
+        row = rows.get(unique_key)
+        if row is None:
+            row = rows[unique_key] = {
+                "empresa_id": empresa_id,
+                "dia": dia,
+                "pilar_id": pilar_id,
+                "departamento_id": departamento_id,
+                "alcance_departamento_id": alcance_departamento_id,
+                "empleado_id": empleado_id,
+                "empleado_key": empleado_id or 0,
+                "anonimo": anonimo,
+                **{name: 0.0 for name in _ROLLUP_INCREMENT_COLUMNS},
+            }
+        for name, value in zip(_ROLLUP_INCREMENT_COLUMNS, delta):
+            row[name] += value
+    if not rows:
+        return
+    # Orden estable de la clave única: transacciones concurrentes bloquean los grupos en el mismo orden
+    _upsert_increments(
+        db,
+        AnalyticsDailyRollup,
+        [rows[unique_key] for unique_key in sorted(rows)],
+        key_columns=("empresa_id", "dia", "pilar_id", "alcance_departamento_id", "empleado_key", "anonimo"),
+        increment_columns=_ROLLUP_INCREMENT_COLUMNS,
+    )
+    db.execute(
+        delete(AnalyticsDailyRollup).where(
+            AnalyticsDailyRollup.empresa_id.in_(sorted({unique_key[0] for unique_key in rows})),
+            AnalyticsDailyRollup.dia.in_(sorted({unique_key[1] for unique_key in rows})),
+            AnalyticsDailyRollup.weight_sum <= _ROLLUP_EPSILON,
+        )
+    )
+
+
+def _likert_level_expr(score, level: int):
+    """Condición SQL del nivel 1..5 con el mismo redondeo que round() de Python (half-even)."""
+    if level == 1:
+        return score < 1.5
+    if level == 2:
+        return and_(score >= 1.5, score <= 2.5)
+    if level == 3:
+        return and_(score > 2.5, score < 3.5)
+    if level == 4:
+        return and_(score >= 3.5, score <= 4.5)
+    return score > 4.5
+
+
+def refresh_analytics_rollup(
+    db: Session,
+    *,
+    empresa_id: Optional[int] = None,
+    pilar_id: Optional[int] = None,
+    empleado_id: Optional[int] = None,
+    commit: bool = True,
+) -> int:
+    """
+    Recalcula el rollup diario desde las respuestas.
+    Sin filtros reconstruye todo; con filtros solo el subconjunto afectado
+    (p. ej. al cambiar el peso de un pilar o el departamento de un empleado).
+    La agregación completa corre en la base (INSERT ... SELECT ... GROUP BY) sobre Respuesta.score.
+    Retorna la cantidad de grupos escritos.
+    """
+    delete_stmt = delete(AnalyticsDailyRollup)
+    departamento_expr = case(
+        (
+            and_(Asignacion.anonimo.is_(False), Empleado.departamento_id.is_not(None)),
+            Empleado.departamento_id,
+        ),
+        (Asignacion.alcance_tipo == "DEPARTAMENTO", Asignacion.alcance_id),
+        else_=None,
+    )
+    alcance_expr = case(
+        (Asignacion.alcance_tipo == "DEPARTAMENTO", func.coalesce(Asignacion.alcance_id, 0)),
+        else_=0,
+    )
+    # "peso or 1": un peso nulo o 0 cuenta como 1, igual que en submit_bulk_answers
+    weight_expr = func.coalesce(func.nullif(Pregunta.peso, 0), 1) * func.coalesce(func.nullif(Pilar.peso, 0), 1)
+    answers = (
+        select(
+            Asignacion.empresa_id.label("empresa_id"),
+            func.date(Respuesta.fecha_respuesta).label("dia"),
+            Pregunta.pilar_id.label("pilar_id"),
+            departamento_expr.label("departamento_id"),
+            alcance_expr.label("alcance_departamento_id"),
+            Respuesta.empleado_id.label("empleado_id"),
+            func.coalesce(Respuesta.empleado_id, 0).label("empleado_key"),
+            Asignacion.anonimo.label("anonimo"),
+            Respuesta.score.label("score"),
+            cast(weight_expr, Numeric(12, 6)).label("weight"),
+        )
+        .join(Pregunta, Respuesta.pregunta_id == Pregunta.id)
+        .join(Pilar, Pregunta.pilar_id == Pilar.id)
+        .join(Asignacion, Respuesta.asignacion_id == Asignacion.id)
+        .outerjoin(Empleado, Respuesta.empleado_id == Empleado.id)
+        .where(
+            Pregunta.tipo == TipoPreguntaEnum.LIKERT,
+            Respuesta.fecha_respuesta.is_not(None),
+            Respuesta.score.is_not(None),
+        )
+    )
+    if empresa_id is not None:
+        delete_stmt = delete_stmt.where(AnalyticsDailyRollup.empresa_id == empresa_id)
+        answers = answers.where(Asignacion.empresa_id == empresa_id)
+    if pilar_id is not None:
+        delete_stmt = delete_stmt.where(AnalyticsDailyRollup.pilar_id == pilar_id)
+        answers = answers.where(Pregunta.pilar_id == pilar_id)
+    if empleado_id is not None:
+        delete_stmt = delete_stmt.where(AnalyticsDailyRollup.empleado_id == empleado_id)
+        answers = answers.where(Respuesta.empleado_id == empleado_id)
+
+    scored = answers.subquery("scored")
+    group_columns = (
+        scored.c.empresa_id,
+        scored.c.dia,
+        scored.c.pilar_id,
+        scored.c.departamento_id,
+        scored.c.alcance_departamento_id,
+        scored.c.empleado_id,
+        scored.c.empleado_key,
+        scored.c.anonimo,
+    )
+    grouped = (
+        select(
+            *group_columns,
+            func.sum(scored.c.score * scored.c.weight),
+            func.sum(scored.c.weight),
+            *(
+                func.sum(case((_likert_level_expr(scored.c.score, level), scored.c.weight), else_=0.0))
+                for level in range(1, 6)
+            ),
+        )
+        .where(
+            scored.c.score >= 1,
+            scored.c.score <= 5,
+            scored.c.weight > 0,
+        )
+        .group_by(*group_columns)
+        .having(func.sum(scored.c.weight) > _ROLLUP_EPSILON)
+    )
+
+    db.execute(delete_stmt)
+    _mark_analytics_changed(db, empresa_id)
+    result = db.execute(
+        insert(AnalyticsDailyRollup).from_select(
+            [
+                "empresa_id",
+                "dia",
+                "pilar_id",
+                "departamento_id",
+                "alcance_departamento_id",
+                "empleado_id",
+                "empleado_key",
+                "anonimo",
+                "value_sum",
+                "weight_sum",
+                "level_1",
+                "level_2",
+                "level_3",
+                "level_4",
+                "level_5",
+            ],
+            grouped,
+        )
+    )
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+    return max(result.rowcount or 0, 0)
+
+
 def compute_dashboard_analytics(
     db: Session,
     empresa_id: Optional[int],
@@ -1502,6 +2840,7 @@ def compute_dashboard_analytics(
 ) -> Dict:
     """
     Calcula todas las métricas del dashboard basadas en Likert.
+    Lee los grupos pre-agregados de AnalyticsDailyRollup (mantenido por submit_bulk_answers).
     
     MODO GLOBAL (empresa_id = None):
     - Agrupa respuestas de TODAS las empresas sin filtrar por empresa_id
@@ -1555,166 +2894,160 @@ def compute_dashboard_analytics(
     employee_universe = set(employee_lookup.keys())
     coverage_total = len(emp_filter) if emp_filter else len(employee_universe)
 
-    start_dt = datetime.combine(fecha_desde, datetime.min.time()) if fecha_desde else None
-    end_dt = (
-        datetime.combine(fecha_hasta + timedelta(days=1), datetime.min.time())
-        if fecha_hasta
-        else None
-    )
+    # Lectura desde el rollup diario: cada nivel del dashboard se agrega con su propio
+    # GROUP BY en la base, de modo que a Python solo llegan los grupos ya sumados.
+    def _rollup_scope(stmt):
+        if empresa_id is not None:
+            stmt = stmt.where(AnalyticsDailyRollup.empresa_id == empresa_id)
+        if fecha_desde:
+            stmt = stmt.where(AnalyticsDailyRollup.dia >= fecha_desde)
+        if fecha_hasta:
+            stmt = stmt.where(AnalyticsDailyRollup.dia <= fecha_hasta)
+        if pillar_filter:
+            stmt = stmt.where(AnalyticsDailyRollup.pilar_id.in_(pillar_filter))
+        if emp_filter:
+            stmt = stmt.where(AnalyticsDailyRollup.empleado_id.in_(emp_filter))
+        if dept_filter:
+            # Igual que antes del rollup: departamento del empleado o alcance DEPARTAMENTO de la asignación
+            stmt = stmt.where(
+                or_(
+                    AnalyticsDailyRollup.departamento_id.in_(dept_filter),
+                    AnalyticsDailyRollup.alcance_departamento_id.in_(dept_filter),
+                )
+            )
+        return stmt
 
-    stmt = (
-        select(
-            Respuesta.valor,
-            Respuesta.fecha_respuesta,
-            Respuesta.empleado_id,
-            Pregunta.peso.label("pregunta_peso"),
-            Pilar.id.label("pilar_id"),
-            Pilar.nombre.label("pilar_nombre"),
-            Pilar.peso.label("pilar_peso"),
-            Empleado.departamento_id,
-            Departamento.nombre.label("departamento_nombre"),
-            Asignacion.alcance_tipo,
-            Asignacion.alcance_id,
-            Asignacion.anonimo,
-        )
-        .join(Pregunta, Respuesta.pregunta_id == Pregunta.id)
-        .join(Pilar, Pregunta.pilar_id == Pilar.id)
-        .join(Asignacion, Respuesta.asignacion_id == Asignacion.id)
-        .outerjoin(Empleado, Respuesta.empleado_id == Empleado.id)
-        .outerjoin(Departamento, Empleado.departamento_id == Departamento.id)
-        .where(
-            Pregunta.tipo == TipoPreguntaEnum.LIKERT,
-        )
+    weight_total = func.sum(AnalyticsDailyRollup.weight_sum)
+    sum_columns = (
+        func.sum(AnalyticsDailyRollup.value_sum).label("value_sum"),
+        weight_total.label("weight_sum"),
     )
-    if empresa_id is not None:
-        stmt = stmt.where(Asignacion.empresa_id == empresa_id)
-    if start_dt:
-        stmt = stmt.where(Respuesta.fecha_respuesta >= start_dt)
-    if end_dt:
-        stmt = stmt.where(Respuesta.fecha_respuesta < end_dt)
-    if pillar_filter:
-        stmt = stmt.where(Pilar.id.in_(pillar_filter))
-    if emp_filter:
-        stmt = stmt.where(Respuesta.empleado_id.in_(emp_filter))
-    if dept_filter:
-        stmt = stmt.where(
-            or_(
-                Empleado.departamento_id.in_(dept_filter),
-                and_(
-                    Asignacion.alcance_tipo == "DEPARTAMENTO",
-                    Asignacion.alcance_id.in_(dept_filter),
-                ),
-            )
+    level_columns = (
+        func.sum(AnalyticsDailyRollup.level_1).label("level_1"),
+        func.sum(AnalyticsDailyRollup.level_2).label("level_2"),
+        func.sum(AnalyticsDailyRollup.level_3).label("level_3"),
+        func.sum(AnalyticsDailyRollup.level_4).label("level_4"),
+        func.sum(AnalyticsDailyRollup.level_5).label("level_5"),
+    )
+    non_anonymous = AnalyticsDailyRollup.anonimo.is_(False)
+
+    def _levels(row) -> List[float]:
+        return [
+            float(row.level_1 or 0.0),
+            float(row.level_2 or 0.0),
+            float(row.level_3 or 0.0),
+            float(row.level_4 or 0.0),
+            float(row.level_5 or 0.0),
+        ]
+
+    # Nivel pilar (el global es la suma de los pilares)
+    pillar_rows = db.execute(
+        _rollup_scope(
+            select(AnalyticsDailyRollup.pilar_id, Pilar.nombre.label("pilar_nombre"), *sum_columns, *level_columns)
+            .join(Pilar, AnalyticsDailyRollup.pilar_id == Pilar.id)
+            .group_by(AnalyticsDailyRollup.pilar_id, Pilar.nombre)
+            .having(weight_total > _ROLLUP_EPSILON)
         )
-
-    rows = db.execute(stmt).all()
+    ).all()
 
     pillar_map: Dict[int, Dict[str, object]] = {}
-    dept_map: Dict[Optional[int], Dict[str, object]] = {}
-    timeline_map: Optional[Dict[date, Dict[str, object]]] = {} if include_timeline else None
-    employee_map: Dict[int, Dict[str, object]] = {}
-    respondent_employees: set[int] = set()
     global_stats = {"value_sum": 0.0, "weight_sum": 0.0, "levels": [0.0] * 5}
+    for row in pillar_rows:
+        levels = _levels(row)
+        pillar_map[row.pilar_id] = {
+            "name": row.pilar_nombre or f"Pilar #{row.pilar_id}",
+            "value_sum": float(row.value_sum or 0.0),
+            "weight_sum": float(row.weight_sum or 0.0),
+            "levels": levels,
+        }
+        global_stats["value_sum"] += float(row.value_sum or 0.0)
+        global_stats["weight_sum"] += float(row.weight_sum or 0.0)
+        for pos, amount in enumerate(levels):
+            global_stats["levels"][pos] += amount
+
+    # Nivel departamento x pilar (solo respuestas no anónimas)
+    dept_rows = db.execute(
+        _rollup_scope(
+            select(AnalyticsDailyRollup.departamento_id, AnalyticsDailyRollup.pilar_id, *sum_columns, *level_columns)
+            .where(non_anonymous, AnalyticsDailyRollup.departamento_id.is_not(None))
+            .group_by(AnalyticsDailyRollup.departamento_id, AnalyticsDailyRollup.pilar_id)
+            .having(weight_total > _ROLLUP_EPSILON)
+        )
+    ).all()
 
-    for row in rows:
-        raw = row.valor
-        if raw is None:
-            continue
-        try:
-            value = float(str(raw).replace(",", "."))
-        except ValueError:
-            continue
-        if value < 1 or value > 5:
-            continue
-        question_weight = float(row.pregunta_peso or 1)
-        pillar_weight = float(row.pilar_peso or 1)
-        weight = question_weight * pillar_weight
-        if weight <= 0:
-            continue
-
-        level_idx = int(round(value))
-        if level_idx < 1:
-            level_idx = 1
-        if level_idx > 5:
-            level_idx = 5
-        level_pos = level_idx - 1
-        weighted_value = value * weight
-
-        global_stats["value_sum"] += weighted_value
-        global_stats["weight_sum"] += weight
-        global_stats["levels"][level_pos] += weight
-
-        pillar_entry = pillar_map.setdefault(
-            row.pilar_id,
+    dept_map: Dict[Optional[int], Dict[str, object]] = {}
+    for row in dept_rows:
+        dept_id = row.departamento_id
+        dept_entry = dept_map.setdefault(
+            dept_id,
             {
-                "name": row.pilar_nombre or f"Pilar #{row.pilar_id}",
+                "name": dept_lookup.get(dept_id) or f"Departamento #{dept_id}",
                 "value_sum": 0.0,
                 "weight_sum": 0.0,
-                "levels": [0.0] * 5,
+                "pillars": {},
             },
         )
-        pillar_entry["value_sum"] += weighted_value
-        pillar_entry["weight_sum"] += weight
-        pillar_entry["levels"][level_pos] += weight
+        dept_entry["value_sum"] += float(row.value_sum or 0.0)
+        dept_entry["weight_sum"] += float(row.weight_sum or 0.0)
+        dept_entry["pillars"][row.pilar_id] = {
+            "name": pillar_map.get(row.pilar_id, {}).get("name") or f"Pilar #{row.pilar_id}",
+            "value_sum": float(row.value_sum or 0.0),
+            "weight_sum": float(row.weight_sum or 0.0),
+            "levels": _levels(row),
+        }
 
-        if timeline_map is not None:
-            day = row.fecha_respuesta.date()
+    # Nivel día x pilar
+    timeline_map: Optional[Dict[date, Dict[str, object]]] = None
+    if include_timeline:
+        timeline_map = {}
+        timeline_rows = db.execute(
+            _rollup_scope(
+                select(AnalyticsDailyRollup.dia, AnalyticsDailyRollup.pilar_id, *sum_columns)
+                .group_by(AnalyticsDailyRollup.dia, AnalyticsDailyRollup.pilar_id)
+                .having(weight_total > _ROLLUP_EPSILON)
+            )
+        ).all()
+        for row in timeline_rows:
             timeline_entry = timeline_map.setdefault(
-                day,
+                row.dia,
                 {"value_sum": 0.0, "weight_sum": 0.0, "pillars": {}},
             )
-            timeline_entry["value_sum"] += weighted_value
-            timeline_entry["weight_sum"] += weight
-            day_pillar = timeline_entry["pillars"].setdefault(
-                row.pilar_id,
-                {"value_sum": 0.0, "weight_sum": 0.0},
+            timeline_entry["value_sum"] += float(row.value_sum or 0.0)
+            timeline_entry["weight_sum"] += float(row.weight_sum or 0.0)
+            timeline_entry["pillars"][row.pilar_id] = {
+                "value_sum": float(row.value_sum or 0.0),
+                "weight_sum": float(row.weight_sum or 0.0),
+            }
+
+    # Nivel empleado (solo respuestas no anónimas)
+    employee_rows = db.execute(
+        _rollup_scope(
+            select(AnalyticsDailyRollup.empleado_id, *sum_columns)
+            .where(non_anonymous, AnalyticsDailyRollup.empleado_id.is_not(None))
+            .group_by(AnalyticsDailyRollup.empleado_id)
+            .having(weight_total > _ROLLUP_EPSILON)
+        )
+    ).all()
+
+    employee_map: Dict[int, Dict[str, object]] = {}
+    for row in employee_rows:
+        emp_info = employee_lookup.get(row.empleado_id)
+        employee_map[row.empleado_id] = {
+            "name": (emp_info or {}).get("name") or f"Empleado #{row.empleado_id}",
+            "value_sum": float(row.value_sum or 0.0),
+            "weight_sum": float(row.weight_sum or 0.0),
+        }
+
+    respondent_employees: set[int] = set(
+        db.scalars(
+            _rollup_scope(
+                select(AnalyticsDailyRollup.empleado_id)
+                .where(AnalyticsDailyRollup.empleado_id.is_not(None))
+                .group_by(AnalyticsDailyRollup.empleado_id)
+                .having(weight_total > _ROLLUP_EPSILON)
             )
-            day_pillar["value_sum"] += weighted_value
-            day_pillar["weight_sum"] += weight
-
-        if row.empleado_id is not None:
-            respondent_employees.add(row.empleado_id)
-
-        if not row.anonimo:
-            dept_id = row.departamento_id
-            dept_name = row.departamento_nombre
-            if dept_id is None and row.alcance_tipo == "DEPARTAMENTO" and row.alcance_id is not None:
-                dept_id = row.alcance_id
-                dept_name = dept_lookup.get(dept_id, f"Departamento #{dept_id}")
-            if dept_id is not None:
-                dept_entry = dept_map.setdefault(
-                    dept_id,
-                    {
-                        "name": dept_name or dept_lookup.get(dept_id, f"Departamento #{dept_id}") or f"Departamento #{dept_id}",
-                        "value_sum": 0.0,
-                        "weight_sum": 0.0,
-                        "pillars": {},
-                    },
-                )
-                dept_entry["value_sum"] += weighted_value
-                dept_entry["weight_sum"] += weight
-                dept_pillar = dept_entry["pillars"].setdefault(
-                    row.pilar_id,
-                    {
-                        "name": pillar_entry["name"],
-                        "value_sum": 0.0,
-                        "weight_sum": 0.0,
-                        "levels": [0.0] * 5,
-                    },
-                )
-                dept_pillar["value_sum"] += weighted_value
-                dept_pillar["weight_sum"] += weight
-                dept_pillar["levels"][level_pos] += weight
-
-            if row.empleado_id is not None:
-                emp_info = employee_lookup.get(row.empleado_id)
-                emp_name = (emp_info or {}).get("name") or f"Empleado #{row.empleado_id}"
-                employee_entry = employee_map.setdefault(
-                    row.empleado_id,
-                    {"name": emp_name, "value_sum": 0.0, "weight_sum": 0.0},
-                )
-                employee_entry["value_sum"] += weighted_value
-                employee_entry["weight_sum"] += weight
+        ).all()
+    )
 
     coverage_base = set(emp_filter) if emp_filter else employee_universe
     if coverage_base:
@@ -1976,16 +3309,80 @@ def compute_dashboard_analytics(
     }
 
 
-def list_responses_for_export(
+def get_dashboard_analytics(
     db: Session,
+    empresa_id: Optional[int],
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    departamento_ids: Optional[List[int]] = None,
+    empleado_ids: Optional[List[int]] = None,
+    pilar_ids: Optional[List[int]] = None,
+    include_timeline: bool = True,
+) -> Dict:
+    """
+    compute_dashboard_analytics con caché de resultados por filtros normalizados.
+    Una entrada se descarta por TTL o cuando sube la generación de su empresa
+    (respuestas, empleados, departamentos, pilares o preguntas modificados).
+    Si la sesión lee de una réplica y la generación acaba de subir, el resultado
+    se devuelve sin cachear: la réplica podría no tener aún ese commit.
+    """
+    key = (
+        empresa_id,
+        fecha_desde,
+        fecha_hasta,
+        tuple(sorted({int(x) for x in (departamento_ids or []) if x is not None})),
+        tuple(sorted({int(x) for x in (empleado_ids or []) if x is not None})),
+        tuple(sorted({int(x) for x in (pilar_ids or []) if x is not None})),
+        bool(include_timeline),
+        _dashboard_generation(empresa_id),
+    )
+    cached = _dashboard_cache.get(key)
+    if cached is not None:
+        return cached
+    cacheable = not (uses_replica(db) and _dashboard_recently_invalidated(empresa_id))
+    data = compute_dashboard_analytics(
+        db,
+        empresa_id,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+        departamento_ids=list(key[3]),
+        empleado_ids=list(key[4]),
+        pilar_ids=list(key[5]),
+        include_timeline=include_timeline,
+    )
+    if cacheable:
+        _dashboard_cache.set(key, data)
+    return data
+
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+_EXPORT_COLUMNS = (
+    "respuesta_id",
+    "fecha_respuesta",
+    "asignacion_id",
+    "alcance_tipo",
+    "alcance_id",
+    "pregunta_id",
+    "pregunta_enunciado",
+    "pregunta_respuesta_esperada",
+    "pilar_id",
+    "pilar_nombre",
+    "empleado_id",
+    "empleado_nombre",
+    "departamento_nombre",
+    "valor",
+)
+
+
+def _responses_export_stmt(
     empresa_id: int,
     fecha_desde: Optional[date] = None,
     fecha_hasta: Optional[date] = None,
     departamento_ids: Optional[List[int]] = None,
     empleado_ids: Optional[List[int]] = None,
     pilar_ids: Optional[List[int]] = None,
-) -> List[Dict[str, object]]:
-    """Collects raw responses for CSV export honoring the same filters as analytics."""
+):
     dept_filter = [int(x) for x in (departamento_ids or []) if x is not None]
     emp_filter = [int(x) for x in (empleado_ids or []) if x is not None]
     pillar_filter = [int(x) for x in (pilar_ids or []) if x is not None]
@@ -2028,29 +3425,59 @@ def list_responses_for_export(
     if dept_filter:
         stmt = stmt.where(Empleado.departamento_id.in_(dept_filter))
 
-    stmt = stmt.order_by(Respuesta.fecha_respuesta.desc(), Respuesta.id.desc())
-    rows = db.execute(stmt).mappings().all()
-    result: List[Dict[str, object]] = []
-    for row in rows:
-        result.append(
-            {
-                "respuesta_id": row["respuesta_id"],
-                "fecha_respuesta": row["fecha_respuesta"],
-                "asignacion_id": row["asignacion_id"],
-                "alcance_tipo": row["alcance_tipo"],
-                "alcance_id": row["alcance_id"],
-                "pregunta_id": row["pregunta_id"],
-                "pregunta_enunciado": row["pregunta_enunciado"],
-                "pregunta_respuesta_esperada": row["pregunta_respuesta_esperada"],
-                "pilar_id": row["pilar_id"],
-                "pilar_nombre": row["pilar_nombre"],
-                "empleado_id": row["empleado_id"],
-                "empleado_nombre": row["empleado_nombre"],
-                "departamento_nombre": row["departamento_nombre"],
-                "valor": row["valor"],
-            }
-        )
-    return result
+    return stmt.order_by(Respuesta.fecha_respuesta.desc(), Respuesta.id.desc())
+
+
+def iter_responses_for_export(
+    db: Session,
+    empresa_id: int,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    departamento_ids: Optional[List[int]] = None,
+    empleado_ids: Optional[List[int]] = None,
+    pilar_ids: Optional[List[int]] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[Sequence[RowMapping]]:
+    """
+    Igual que list_responses_for_export pero entrega las filas en bloques de
+    chunk_size leídos desde un cursor del servidor (yield_per / stream_results),
+    de modo que la memoria no crece con el tamaño del export.
+    """
+    stmt = _responses_export_stmt(
+        empresa_id,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+        departamento_ids=departamento_ids,
+        empleado_ids=empleado_ids,
+        pilar_ids=pilar_ids,
+    ).execution_options(yield_per=max(int(chunk_size), 1))
+    result = db.execute(stmt)
+    try:
+        for partition in result.mappings().partitions():
+            yield partition
+    finally:
+        result.close()
+
+
+def list_responses_for_export(
+    db: Session,
+    empresa_id: int,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    departamento_ids: Optional[List[int]] = None,
+    empleado_ids: Optional[List[int]] = None,
+    pilar_ids: Optional[List[int]] = None,
+) -> List[Dict[str, object]]:
+    """Collects raw responses for CSV export honoring the same filters as analytics."""
+    stmt = _responses_export_stmt(
+        empresa_id,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+        departamento_ids=departamento_ids,
+        empleado_ids=empleado_ids,
+        pilar_ids=pilar_ids,
+    )
+    return [{col: row[col] for col in _EXPORT_COLUMNS} for row in db.execute(stmt).mappings()]
 
 
 # ======================================================
@@ -0,0 +1,165 @@
+"""
+Lectura incremental de CSV para importaciones masivas.
+
+CsvRecordReader recibe el cuerpo en trozos de bytes (tal como llega del
+request) y entrega filas completas a medida que se cierran; un campo entre
+comillas puede abarcar varias líneas y varios trozos. Acepta ',' o ';' como
+separador (Excel en español exporta con ';') y BOM UTF-8.
+
+parse_empleado_row valida una fila del CSV de empleados y la deja lista para
+crud.bulk_create_empleados.
+"""
+import codecs
+import csv
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .search import normalize_search_text
+
+# Encabezados aceptados (normalizados: minúsculas, sin tildes, '_' en vez de espacios)
+EMPLEADO_IMPORT_HEADERS = {
+    "nombre": "nombre",
+    "nombres": "nombre",
+    "apellidos": "apellidos",
+    "apellido": "apellidos",
+    "rut": "rut",
+    "email": "email",
+    "correo": "email",
+    "e-mail": "email",
+    "cargo": "cargo",
+    "departamento": "departamento",
+    "depto": "departamento",
+    "area": "departamento",
+    "departamento_id": "departamento_id",
+}
+
+# Largo máximo por columna (el mismo de models.Empleado)
+EMPLEADO_IMPORT_LIMITS = {"nombre": 200, "apellidos": 200, "rut": 32, "email": 200, "cargo": 120}
+
+EMPLEADO_IMPORT_FIELDS = ("nombre", "apellidos", "rut", "email", "cargo", "departamento_id")
+
+# Filas por INSERT multi-fila / transacción y errores devueltos como máximo
+EMPLEADO_IMPORT_CHUNK_SIZE = 500
+EMPLEADO_IMPORT_MAX_ERRORS = 1000
+
+# Solo \r\n, \n y \r terminan una línea de CSV (str.splitlines corta además en
+# \x85, \u2028, \x0b, \x0c..., que pueden venir dentro de una celda)
+_CSV_LINE = re.compile(r"[^\r\n]*(?:\r\n|\r|\n)|[^\r\n]+")
+
+
+class CsvRecordReader:
+    r"""
+    Parser de CSV por trozos; cada fila sale con el número de línea donde empieza.
+
+    >>> reader = CsvRecordReader("latin-1")
+    >>> reader.feed("nombre,cargo\nJosé,a\x85b\n".encode("latin-1"))
+    [(1, ['nombre', 'cargo']), (2, ['José', 'a\x85b'])]
+    >>> reader = CsvRecordReader()
+    >>> reader.feed("nombre\nAna\u2028Luz\n".encode("utf-8")) + reader.close()
+    [(1, ['nombre']), (2, ['Ana\u2028Luz'])]
+    """
+
+    def __init__(self, encoding: str = "utf-8"):
+        if codecs.lookup(encoding).name == "utf-8":
+            encoding = "utf-8-sig"
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._pending = ""
+        self._record: List[str] = []
+        self._quotes = 0
+        self._line = 0
+        self._record_line = 1
+        self.delimiter: Optional[str] = None
+
+    @property
+    def line(self) -> int:
+        """Última línea completa leída."""
+        return self._line
+
+    def feed(self, chunk: bytes) -> List[Tuple[int, List[str]]]:
+        return self._parse(self._decoder.decode(chunk))
+
+    def close(self) -> List[Tuple[int, List[str]]]:
+        rows = self._parse(self._decoder.decode(b"", final=True), final=True)
+        if self._record:
+            # Comillas sin cerrar al final del archivo: se entrega tal cual
+            rows.extend(self._read_records([("".join(self._record), self._record_line)]))
+            self._record = []
+        return rows
+
+    def _parse(self, text: str, final: bool = False) -> List[Tuple[int, List[str]]]:
+        text = self._pending + text
+        lines = _CSV_LINE.findall(text)
+        self._pending = ""
+        # La última línea puede estar cortada (o ser un '\r' cuyo '\n' llega en el próximo trozo)
+        if lines and not final and (not lines[-1].endswith(("\n", "\r")) or lines[-1].endswith("\r")):
+            self._pending = lines.pop()
+        complete = []
+        for line in lines:
+            self._line += 1
+            if not self._record:
+                self._record_line = self._line
+            self._record.append(line)
+            self._quotes += line.count('"')
+            if self._quotes % 2 == 0:
+                complete.append(("".join(self._record), self._record_line))
+                self._record = []
+                self._quotes = 0
+        return self._read_records(complete)
+
+    def _read_records(self, records: Sequence[Tuple[str, int]]) -> List[Tuple[int, List[str]]]:
+        rows = []
+        for text, line in records:
+            if not text.strip():
+                continue
+            if self.delimiter is None:
+                header = text.split("\n", 1)[0]
+                self.delimiter = ";" if header.count(";") > header.count(",") else ","
+            for values in csv.reader([text], delimiter=self.delimiter):
+                rows.append((line, values))
+        return rows
+
+
+def map_empleado_headers(values: Sequence[str]) -> Dict[int, str]:
+    """Índice de columna -> campo de Empleado; ignora columnas desconocidas."""
+    mapping = {}
+    for index, raw in enumerate(values):
+        key = normalize_search_text(raw).replace(" ", "_")
+        field = EMPLEADO_IMPORT_HEADERS.get(key)
+        if field and field not in mapping.values():
+            mapping[index] = field
+    return mapping
+
+
+def parse_empleado_row(
+    values: Sequence[str],
+    headers: Dict[int, str],
+    departamentos: Dict[str, int],
+) -> Tuple[Optional[Dict[str, object]], Optional[str]]:
+    """
+    Devuelve (fila, None) lista para insertar o (None, motivo).
+    `departamentos` mapea nombre normalizado e id (como texto) -> id.
+    """
+    data: Dict[str, Optional[str]] = {}
+    for index, field in headers.items():
+        value = values[index].strip() if index < len(values) else ""
+        data[field] = value or None
+
+    if not data.get("nombre"):
+        return None, "nombre es obligatorio"
+    for field, limit in EMPLEADO_IMPORT_LIMITS.items():
+        if data.get(field) and len(data[field]) > limit:
+            return None, f"{field} supera {limit} caracteres"
+
+    departamento_id = None
+    if data.get("departamento_id"):
+        departamento_id = departamentos.get(data["departamento_id"])
+        if departamento_id is None:
+            return None, f"departamento_id {data['departamento_id']} no pertenece a la empresa"
+    elif data.get("departamento"):
+        departamento_id = departamentos.get(normalize_search_text(data["departamento"]))
+        if departamento_id is None:
+            return None, f"departamento '{data['departamento']}' no existe en la empresa"
+
+    row = {field: data.get(field) for field in EMPLEADO_IMPORT_FIELDS}
+    row["departamento_id"] = departamento_id
+    return row, None
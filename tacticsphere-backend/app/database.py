@@ -1,7 +1,13 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.sql.dml import UpdateBase
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from pathlib import Path
+from typing import Optional
+import logging
 import os
 
 BACKEND_ROOT = Path(__file__).resolve().parents[1]
@@ -11,26 +17,236 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL no definido. Crea tacticsphere-backend/.env con la cadena de conexión.")
 
-# Ajuste para SQLite con FastAPI (evita errores de "check_same_thread")
-# Para PostgreSQL, usar psycopg (psycopg3) que es compatible con Python 3.13
-engine_args = {"pool_pre_ping": True}
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}, **engine_args)
-elif DATABASE_URL.startswith("postgresql"):
+# Réplica de solo lectura opcional (analytics, exportaciones y listados)
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL") or None
+
+# Pool de conexiones (por motor: primaria, réplica y sus versiones async)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+
+# Perfil de PRAGMAs para SQLite (se aplica en cada conexión nueva).
+# WAL deja leer mientras otro escribe y, con synchronous=NORMAL, los commits no
+# hacen fsync por transacción; busy_timeout espera el lock en vez de fallar con
+# "database is locked".
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negativo = KiB (64 MiB)
+SQLITE_FOREIGN_KEYS = os.getenv("SQLITE_FOREIGN_KEYS", "1").lower() in ("1", "true", "yes", "on")
+
+
+def _normalize_url(url: str) -> str:
     # Usar psycopg (psycopg3) para PostgreSQL - compatible con Python 3.13
     # Cambiar postgresql:// a postgresql+psycopg:// para usar psycopg3
-    if DATABASE_URL.startswith("postgresql://"):
-        DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg://", 1)
-    engine = create_engine(DATABASE_URL, **engine_args)
-else:
-    engine = create_engine(DATABASE_URL, **engine_args)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+psycopg://", 1)
+    return url
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    return url.startswith("sqlite") and (":memory:" in url or url.split("://", 1)[-1] in ("", "/"))
+
+
+def _engine_args(url: str) -> dict:
+    args = {"pool_pre_ping": True}
+    # SQLite en memoria usa un pool de una sola conexión que no admite estos parámetros
+    if not _is_sqlite_memory(url):
+        args.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_recycle=DB_POOL_RECYCLE_SECONDS,
+            pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+        )
+    # Ajuste para SQLite con FastAPI (evita errores de "check_same_thread")
+    if url.startswith("sqlite"):
+        args["connect_args"] = {"check_same_thread": False}
+    return args
+
+
+def _sqlite_pragmas() -> list:
+    return [
+        f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size={SQLITE_CACHE_SIZE}",
+        f"PRAGMA foreign_keys={'ON' if SQLITE_FOREIGN_KEYS else 'OFF'}",
+    ]
+
+
+def _apply_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in _sqlite_pragmas():
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def _create_engine(url: str):
+    eng = create_engine(url, **_engine_args(url))
+    if eng.dialect.name == "sqlite":
+        event.listen(eng, "connect", _apply_sqlite_pragmas)
+    return eng
+
+
+DATABASE_URL = _normalize_url(DATABASE_URL)
+engine = _create_engine(DATABASE_URL)
+
+replica_engine = None
+if DATABASE_REPLICA_URL:
+    DATABASE_REPLICA_URL = _normalize_url(DATABASE_REPLICA_URL)
+    replica_engine = _create_engine(DATABASE_REPLICA_URL)
+
+
+class RoutingSession(Session):
+    """
+    Session que envía las lecturas a la réplica (info["replica_bind"]) y todo
+    lo que escribe (flush, INSERT/UPDATE/DELETE) a la primaria. Sin réplica se
+    comporta como una Session normal.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica_bind")
+        if replica is not None and not self._flushing and not isinstance(clause, UpdateBase):
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+def uses_replica(session: Session) -> bool:
+    """True si las lecturas de la sesión van a una réplica (pueden ir atrasadas respecto de la primaria)."""
+    return session.info.get("replica_bind") is not None
+
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
+# Lecturas que toleran el retraso de la réplica. Si no hay réplica, es la primaria.
+ReadSessionLocal = sessionmaker(
+    bind=engine,
+    class_=RoutingSession,
+    autoflush=False,
+    autocommit=False,
+    info={"replica_bind": replica_engine},
+)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# ---------------- Motor asíncrono ----------------
+# Mismo esquema de base con driver async: aiosqlite para SQLite y psycopg3
+# (que es sync y async a la vez) para PostgreSQL. ASYNC_DATABASE_URL permite
+# indicarlo a mano (p. ej. mysql+aiomysql://...).
+logger = logging.getLogger("tacticsphere.database")
+
+
+def _async_url(url: str) -> Optional[str]:
+    if url.startswith("sqlite+aiosqlite") or url.startswith("postgresql+psycopg"):
+        return url
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("sqlite+pysqlite://"):
+        return url.replace("sqlite+pysqlite://", "sqlite+aiosqlite://", 1)
+    return None
+
+
+def _create_async(url: Optional[str]):
+    if not url:
+        return None
+    try:
+        async_eng = create_async_engine(url, **_engine_args(url))
+    except ImportError:
+        logger.warning("Driver async no disponible para %s; se usará el motor síncrono", url)
+        return None
+    if async_eng.dialect.name == "sqlite":
+        event.listen(async_eng.sync_engine, "connect", _apply_sqlite_pragmas)
+    return async_eng
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+async_engine = _create_async(ASYNC_DATABASE_URL)
+
+async_replica_engine = None
+if async_engine is not None and DATABASE_REPLICA_URL:
+    async_replica_engine = _create_async(
+        os.getenv("ASYNC_DATABASE_REPLICA_URL") or _async_url(DATABASE_REPLICA_URL)
+    )
+
+AsyncSessionLocal = None
+AsyncReadSessionLocal = None
+if async_engine is not None:
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, autocommit=False)
+# Con réplica pero sin su driver async, las lecturas async pasan por ReadSessionLocal en el threadpool
+if async_engine is not None and (replica_engine is None or async_replica_engine is not None):
+    AsyncReadSessionLocal = async_sessionmaker(
+        bind=async_engine,
+        sync_session_class=RoutingSession,
+        autoflush=False,
+        autocommit=False,
+        info={"replica_bind": async_replica_engine.sync_engine if async_replica_engine is not None else None},
+    )
+
+
+class ThreadedSession:
+    """
+    Sustituto de AsyncSession cuando no hay driver async: expone el mismo
+    run_sync pero ejecuta sobre una Session síncrona en el threadpool.
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+
+@asynccontextmanager
+async def _async_session(factory, sync_factory):
+    if factory is None:
+        db = sync_factory()
+        try:
+            yield ThreadedSession(db)
+        finally:
+            db.close()
+        return
+    async with factory() as db:
+        yield db
+
+
+async def get_async_db():
+    """
+    Sesión para endpoints async. El código de crud sigue siendo síncrono:
+    se invoca con `await db.run_sync(fn, ...)`, que le pasa una Session normal
+    (mismos eventos after_commit/after_rollback) sin ocupar un hilo por request.
+    """
+    async with _async_session(AsyncSessionLocal, SessionLocal) as db:
+        yield db
+
+
+async def get_async_read_db():
+    """Igual que get_async_db, pero las lecturas van a la réplica si está configurada."""
+    async with _async_session(AsyncReadSessionLocal, ReadSessionLocal) as db:
+        yield db
+
+
+async def dispose_async_engine() -> None:
+    for async_eng in (async_engine, async_replica_engine):
+        if async_eng is not None:
+            await async_eng.dispose()
\ No newline at end of file
@@ -2,17 +2,24 @@
 
 from typing import Optional, List, Dict
 
+from contextlib import asynccontextmanager
+
 import csv
 
 import io
 
-from fastapi import FastAPI, Depends, HTTPException, status, Query, Request
+from fastapi import FastAPI, Depends, HTTPException, status, Query, Request, Response
 
 from fastapi.middleware.cors import CORSMiddleware
 
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from fastapi.encoders import jsonable_encoder
+
+from fastapi.concurrency import run_in_threadpool
 
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.database import get_db
@@ -27,7 +34,15 @@ from pydantic import BaseModel  # â¬ï¸ para SimpleBeginRequest
 
 from app import models, database
 
-from .database import Base, engine, get_db
+from .database import (
+    Base,
+    engine,
+    get_db,
+    get_read_db,
+    get_async_db,
+    get_async_read_db,
+    dispose_async_engine,
+)
 
 from .models import (
 
@@ -39,7 +54,17 @@ from .models import (
 
 )
 
-from .auth import verify_password, create_access_token, get_current_user, require_roles
+from .auth import (
+    HashingBusy,
+    create_access_token,
+    get_current_user,
+    get_current_user_async,
+    hash_password,
+    hashing_stats,
+    require_roles,
+    verify_and_update_password,
+    verify_password,
+)
 
 from . import crud
 from .likert_levels import LIKERT_LEVELS
@@ -64,13 +89,13 @@ from .schemas import (
 
     # Empleados
 
-    EmpleadoCreate, EmpleadoRead, EmpleadoUpdate,
+    EmpleadoCreate, EmpleadoRead, EmpleadoUpdate, EmpleadoImportError, EmpleadoImportResult,
 
     # Pilares / Preguntas / Subpilares
 
     PilarCreate, PilarRead, PilarUpdate,
 
-    PreguntaCreate, PreguntaRead, PreguntaUpdate,
+    PreguntaCreate, PreguntaRead, PreguntaUpdate, PreguntaBulkCreate,
     
     SubpilarCreate, SubpilarRead, SubpilarUpdate,
 
@@ -95,6 +120,10 @@ from .schemas import (
 
     AssignmentProgress,
 
+    AssignmentProgressBatch,
+
+    SurveyFullResponse,
+
     LeadCreate,
 
     LeadRead,
@@ -105,15 +134,48 @@ from .schemas import (
 
 )
 
-from passlib.context import CryptContext  # â agregado para bcrypt
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")  # â contexto para hash compatible con login
 
 
+from .pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    decode_cursor,
+    encode_cursor,
+    parse_fields,
+)
 
-from .audit import audit_log
+from .search import ensure_search_indexes
+
+from .csv_import import (
+    EMPLEADO_IMPORT_CHUNK_SIZE,
+    EMPLEADO_IMPORT_MAX_ERRORS,
+    CsvRecordReader,
+    map_empleado_headers,
+    parse_empleado_row,
+)
 
-app = FastAPI(title="TacticSphere API")
+from .audit import audit_log, audit_writer, start_audit_writer, stop_audit_writer
+
+from .audit_retention import start_audit_retention, stop_audit_retention
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Escritor de auditoría por lotes: arranca con la app y drena la cola al apagarse
+    start_audit_writer()
+    # Particiones mensuales y retención/archivado de auditoría
+    start_audit_retention()
+    try:
+        yield
+    finally:
+        stop_audit_retention()
+        stop_audit_writer()
+        await dispose_async_engine()
+
+
+app = FastAPI(title="TacticSphere API", lifespan=lifespan)
 
 
 
@@ -141,6 +203,8 @@ app.add_middleware(
 
     allow_headers=["*"],
 
+    expose_headers=[NEXT_CURSOR_HEADER],
+
 )
 
 
@@ -149,6 +213,9 @@ app.add_middleware(
 
 Base.metadata.create_all(bind=engine)
 
+# Índices de búsqueda de texto (FTS5 en SQLite / pg_trgm en PostgreSQL)
+ensure_search_indexes(engine)
+
 
 
 @app.get("/")
@@ -195,6 +262,12 @@ def __whoami():
 
 # ======================================================
 
+def _verify_current_password(db: Session, current: Usuario, password: str) -> bool:
+    # current puede venir de la caché de principales (sin password_hash)
+    password_hash = crud.get_user_password_hash(db, current.id)
+    return bool(password_hash) and verify_password(password, password_hash)
+
+
 def _ensure_company_access(current: Usuario, target_empresa_id: Optional[int]):
 
     """Valida el acceso a recursos ligados a empresa según rol."""
@@ -265,6 +338,45 @@ def _ensure_assignment_access(db: Session, current: Usuario, asignacion_id: int)
 
 
 
+def _projectable_fields(schema, model) -> List[str]:
+    """Campos del *Read que son columnas de la tabla (los que admite `fields=`)."""
+    columns = set(model.__table__.columns.keys())
+    return [name for name in schema.model_fields if name in columns]
+
+
+def _page_request(
+    limit: Optional[int],
+    cursor: Optional[str],
+    fields: Optional[str],
+    key_types: tuple,
+    allowed_fields: List[str],
+):
+    """Valida limit/cursor/fields de un listado paginable -> (limit, after, fields)."""
+    try:
+        after = decode_cursor(cursor, key_types) if cursor else None
+        selected = parse_fields(fields, allowed_fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if after is not None and limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    return limit, after, selected
+
+
+def _page_response(response: Response, page: "crud.Page", fields: Optional[List[str]]):
+    """
+    Sin `fields` devuelve las entidades (las serializa el response_model);
+    con `fields`, solo esas claves. El siguiente cursor va en X-Next-Cursor.
+    """
+    headers = {}
+    if page.next_key is not None:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(*page.next_key)
+    if fields:
+        return JSONResponse(content=jsonable_encoder(page.items), headers=headers)
+    response.headers.update(headers)
+    return page.items
+
+
+
 # ======================================================
 
 # AUTH
@@ -272,12 +384,25 @@ def _ensure_assignment_access(db: Session, current: Usuario, asignacion_id: int)
 # ======================================================
 
 @app.post("/auth/login", response_model=TokenResponse)
-def login(payload: LoginRequest, request: Request, db: Session = Depends(get_db)):
+async def login(payload: LoginRequest, request: Request, db: Session = Depends(get_db)):
+    # async: bcrypt corre en el pool acotado de auth y la base en el threadpool,
+    # así una ráfaga de logins no acapara los hilos que usan las encuestas
     email_normalized = payload.email.strip().lower()
 
-    user = crud.get_user_by_email(db, email_normalized)
+    user = await run_in_threadpool(crud.get_user_by_email, db, email_normalized)
+
+    valid, new_hash = False, None
+    if user:
+        try:
+            valid, new_hash = await verify_and_update_password(payload.password, user.password_hash)
+        except HashingBusy:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Demasiados inicios de sesión simultáneos, intenta nuevamente",
+                headers={"Retry-After": "1"},
+            )
 
-    if not user or not verify_password(payload.password, user.password_hash):
+    if not valid:
 
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciales inválidas")
 
@@ -291,18 +416,26 @@ def login(payload: LoginRequest, request: Request, db: Session = Depends(get_db)
 
         )
 
+    # Antes del rehash: su commit expira `user` y leerlo después recargaría desde la base en el event loop
+    user_id, rol, empresa_id = user.id, user.rol, user.empresa_id
+
+    if new_hash:
+        # BCRYPT_ROUNDS cambió: se guarda el hash con el costo nuevo sin pedir reset
+        await run_in_threadpool(crud.update_password_hash, db, user_id, new_hash)
+
     token = create_access_token({
-        "sub": str(user.id),
-        "rol": user.rol.value,
-        "empresa_id": user.empresa_id
+        "sub": str(user_id),
+        "rol": rol.value,
+        "empresa_id": empresa_id
     })
-    audit_log(
+    await run_in_threadpool(
+        audit_log,
         db,
         action=AuditActionEnum.LOGIN,
         current_user=user,
-        empresa_id=user.empresa_id,
+        empresa_id=empresa_id,
         entity_type="Usuario",
-        entity_id=user.id,
+        entity_id=user_id,
         notes="Inicio de sesión",
         request=request,
     )
@@ -400,7 +533,7 @@ def list_consulting_leads_endpoint(
 
     offset: int = Query(default=0, ge=0),
 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 
 ):
 
@@ -452,9 +585,17 @@ def clear_consulting_leads_endpoint(
 
 @app.get("/companies", response_model=list[EmpresaRead])
 
-def companies_list(db: Session = Depends(get_db), _user=Depends(get_current_user)):
-
-    return crud.list_empresas(db)
+def companies_list(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None),
+    db: Session = Depends(get_read_db),
+    _user=Depends(get_current_user),
+):
+    limit, after, selected = _page_request(limit, cursor, fields, (int,), _projectable_fields(EmpresaRead, Empresa))
+    page = crud.page_empresas(db, fields=selected, after=after, limit=limit)
+    return _page_response(response, page, selected)
 
 
 
@@ -591,7 +732,7 @@ def list_departments(
 
     empresa_id: int,
 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 
     current: Usuario = Depends(get_current_user),
 
@@ -696,19 +837,30 @@ def delete_department(
 @app.get("/companies/{empresa_id}/employees", response_model=list[EmpleadoRead])
 def list_employees(
     empresa_id: int,
+    response: Response,
     departamento_id: Optional[int] = Query(None),
     search: Optional[str] = Query(None, min_length=1),
-    db: Session = Depends(get_db),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None),
+    db: Session = Depends(get_read_db),
     current: Usuario = Depends(get_current_user),
 ):
     _ensure_company_access(current, empresa_id)
 
-    return crud.list_empleados(
+    limit, after, selected = _page_request(
+        limit, cursor, fields, crud.empleado_page_key_types(search), _projectable_fields(EmpleadoRead, Empleado)
+    )
+    page = crud.page_empleados(
         db,
         empresa_id=empresa_id,
         departamento_id=departamento_id,
         search=search,
+        fields=selected,
+        after=after,
+        limit=limit,
     )
+    return _page_response(response, page, selected)
 
 
 @app.get("/employees/search", response_model=list[EmpleadoRead])
@@ -716,7 +868,7 @@ def search_employees(
     query: str = Query(..., min_length=2),
     empresa_id: Optional[int] = Query(None),
     limit: int = Query(20, ge=1, le=200),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current: Usuario = Depends(get_current_user),
 ):
     target_empresa = empresa_id
@@ -798,6 +950,92 @@ def create_employee(
     )
     return empleado
 
+async def _iter_csv_body(request: Request, reader: CsvRecordReader):
+    """Filas (línea, valores) del CSV a medida que llega el cuerpo del request."""
+    async for body in request.stream():
+        for item in reader.feed(body):
+            yield item
+    for item in reader.close():
+        yield item
+
+
+@app.post("/companies/{empresa_id}/employees/import", response_model=EmpleadoImportResult)
+async def import_employees(
+    empresa_id: int,
+    request: Request,
+    encoding: str = Query("utf-8"),
+    db: AsyncSession = Depends(get_async_db),
+    current: Usuario = Depends(get_current_user_async),
+):
+    """
+    Importa empleados desde un CSV enviado como cuerpo del request (text/csv),
+    separado por ',' o ';'. Columnas: nombre (obligatoria), apellidos, rut,
+    email, cargo y departamento (nombre) o departamento_id.
+    Las filas válidas se insertan por bloques, cada uno en su transacción;
+    las inválidas se informan en `errores` con su número de línea.
+    """
+    _ensure_company_access(current, empresa_id)
+    try:
+        reader = CsvRecordReader(encoding)
+    except LookupError:
+        raise HTTPException(status_code=400, detail=f"Codificación desconocida: {encoding}")
+
+    def load_departamentos(s: Session) -> Dict[str, int]:
+        if not s.get(Empresa, empresa_id):
+            raise HTTPException(status_code=404, detail="Empresa no encontrada")
+        return crud.departamento_import_lookup(s, empresa_id)
+
+    departamentos = await db.run_sync(load_departamentos)
+
+    headers: Optional[Dict[int, str]] = None
+    filas = creados = total_errores = 0
+    errores: List[EmpleadoImportError] = []
+    pendientes: List[dict] = []
+
+    def add_error(linea: int, error: str) -> None:
+        nonlocal total_errores
+        total_errores += 1
+        if len(errores) < EMPLEADO_IMPORT_MAX_ERRORS:
+            errores.append(EmpleadoImportError(linea=linea, error=error))
+
+    try:
+        async for linea, values in _iter_csv_body(request, reader):
+            if headers is None:
+                headers = map_empleado_headers(values)
+                if "nombre" not in headers.values():
+                    raise HTTPException(status_code=400, detail="El CSV debe tener una columna 'nombre'")
+                continue
+            filas += 1
+            row, error = parse_empleado_row(values, headers, departamentos)
+            if error:
+                add_error(linea, error)
+                continue
+            pendientes.append(row)
+            if len(pendientes) >= EMPLEADO_IMPORT_CHUNK_SIZE:
+                creados += await db.run_sync(crud.bulk_create_empleados, empresa_id, pendientes)
+                pendientes = []
+    except UnicodeDecodeError:
+        add_error(reader.line + 1, f"El archivo no está en {encoding}; se detuvo la importación")
+    if headers is None and not total_errores:
+        raise HTTPException(status_code=400, detail="CSV vacío")
+    if pendientes:
+        creados += await db.run_sync(crud.bulk_create_empleados, empresa_id, pendientes)
+
+    await db.run_sync(
+        lambda s: audit_log(
+            s,
+            action=AuditActionEnum.EMPLOYEE_CREATE,
+            current_user=current,
+            empresa_id=empresa_id,
+            entity_type="Empleado",
+            notes=f"Importó {creados} empleados desde CSV",
+            extra={"filas": filas, "creados": creados, "errores": total_errores},
+            request=request,
+        )
+    )
+    return EmpleadoImportResult(filas=filas, creados=creados, total_errores=total_errores, errores=errores)
+
+
 @app.patch("/employees/{empleado_id}", response_model=EmpleadoRead)
 def update_employee(
     empleado_id: int,
@@ -880,9 +1118,17 @@ def update_employee(
 
 def users_list(
 
+    response: Response,
+
     empresa_id: int | None = None,
 
-    db: Session = Depends(get_db),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+
+    cursor: Optional[str] = Query(None),
+
+    fields: Optional[str] = Query(None),
+
+    db: Session = Depends(get_read_db),
 
     current: Usuario = Depends(get_current_user),
 
@@ -894,7 +1140,9 @@ def users_list(
 
         raise HTTPException(status_code=403, detail="Permisos insuficientes")
 
-    return crud.list_usuarios(db, empresa_id)
+    limit, after, selected = _page_request(limit, cursor, fields, (int,), _projectable_fields(UsuarioRead, Usuario))
+    page = crud.page_usuarios(db, empresa_id, fields=selected, after=after, limit=limit)
+    return _page_response(response, page, selected)
 
 
 
@@ -1169,7 +1417,7 @@ def list_password_change_requests_endpoint(
 
     include_resolved: bool = Query(False),
 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 
     current: Usuario = Depends(get_current_user),
 
@@ -1206,7 +1454,7 @@ def list_pillars(
 
     empresa_id: Optional[int] = Query(default=None),
 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 
     current: Usuario = Depends(get_current_user),
 
@@ -1232,7 +1480,7 @@ def list_company_pillars(
 
     empresa_id: int,
 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 
     current: Usuario = Depends(get_current_user),
 
@@ -1402,7 +1650,7 @@ def delete_pillar(
 @app.get("/pillars/{pilar_id}/subpilares", response_model=list[SubpilarRead])
 def list_subpilares(
     pilar_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current: Usuario = Depends(get_current_user),
 ):
     """Lista todos los subpilares de un pilar."""
@@ -1579,7 +1827,15 @@ def list_questions(
 
     pilar_id: int,
 
-    db: Session = Depends(get_db),
+    response: Response,
+
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+
+    cursor: Optional[str] = Query(None),
+
+    fields: Optional[str] = Query(None),
+
+    db: Session = Depends(get_read_db),
 
     current: Usuario = Depends(get_current_user),
 
@@ -1593,7 +1849,9 @@ def list_questions(
 
     _ensure_company_access(current, p.empresa_id)
 
-    return crud.list_preguntas(db, pilar_id)
+    limit, after, selected = _page_request(limit, cursor, fields, (int,), _projectable_fields(PreguntaRead, Pregunta))
+    page = crud.page_preguntas(db, pilar_id, fields=selected, after=after, limit=limit)
+    return _page_response(response, page, selected)
 
 
 
@@ -1603,7 +1861,7 @@ def list_questions_by_pilar(
 
     pilar_id: int,
 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 
     current: Usuario = Depends(get_current_user),
 
@@ -1692,6 +1950,45 @@ def create_question(
 
 
 
+@app.post("/questions/bulk", response_model=list[PreguntaRead], status_code=201)
+def create_questions_bulk(
+    data: PreguntaBulkCreate,
+    request: Request,
+    db: Session = Depends(get_db),
+    current: Usuario = Depends(get_current_user),
+):
+    """
+    Crea varias preguntas (de uno o más pilares) en una sola transacción: o se
+    crean todas o ninguna. Se agregan a los cuestionarios existentes con una
+    sola sentencia y se registra una entrada de auditoría por request.
+    """
+    pilar_ids = {item.pilar_id for item in data.preguntas}
+    pilares = {p.id: p for p in db.scalars(select(Pilar).where(Pilar.id.in_(pilar_ids))).all()}
+    missing = sorted(pilar_ids - set(pilares))
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Pilar no existe: {missing[0]}")
+    for pilar in pilares.values():
+        _ensure_company_access(current, pilar.empresa_id)
+
+    try:
+        preguntas = crud.bulk_create_preguntas(db, [item.model_dump() for item in data.preguntas])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    empresa_ids = {pilar.empresa_id for pilar in pilares.values()}
+    audit_log(
+        db,
+        action=AuditActionEnum.QUESTION_CREATE,
+        current_user=current,
+        empresa_id=next(iter(empresa_ids)) if len(empresa_ids) == 1 else None,
+        entity_type="Pregunta",
+        notes=f"Creó {len(preguntas)} preguntas",
+        extra={"pilar_ids": sorted(pilar_ids), "pregunta_ids": [q.id for q in preguntas]},
+        request=request,
+    )
+    return preguntas
+
+
 @app.put("/questions/{pregunta_id}", response_model=PreguntaRead)
 def update_question(
     pregunta_id: int,
@@ -1858,7 +2155,7 @@ def list_company_questionnaires(
 
     empresa_id: int,
 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 
     current: Usuario = Depends(get_current_user),
 
@@ -1990,9 +2287,17 @@ def create_assignment(
 
 def list_assignments(
 
+    response: Response,
+
     empresa_id: Optional[int] = None,
 
-    db: Session = Depends(get_db),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+
+    cursor: Optional[str] = Query(None),
+
+    fields: Optional[str] = Query(None),
+
+    db: Session = Depends(get_read_db),
 
     current: Usuario = Depends(get_current_user),
 
@@ -2026,7 +2331,11 @@ def list_assignments(
 
 
 
-    return crud.list_asignaciones(db, empresa_id=effective_empresa_id)
+    limit, after, selected = _page_request(
+        limit, cursor, fields, (int,), _projectable_fields(AsignacionRead, Asignacion)
+    )
+    page = crud.page_asignaciones(db, empresa_id=effective_empresa_id, fields=selected, after=after, limit=limit)
+    return _page_response(response, page, selected)
 
 
 
@@ -2187,152 +2496,169 @@ class SimpleBeginRequest(BaseModel):
 
 
 @app.post("/survey/simple/begin", response_model=SurveyBeginResponse)
-
-def survey_simple_begin(
-
+async def survey_simple_begin(
     data: SimpleBeginRequest,
-
-    db: Session = Depends(get_db),
-
-    current: Usuario = Depends(get_current_user),
-
+    db: AsyncSession = Depends(get_async_db),
+    current: Usuario = Depends(get_current_user_async),
 ):
-
     _ensure_company_access(current, data.empresa_id)
 
     # Garantiza cuestionario publicado (auto) y asignaciÃ³n vigente (auto)
+    def begin(s: Session) -> SurveyBeginResponse:
+        try:
+            asg = crud.get_or_create_auto_asignacion(s, empresa_id=data.empresa_id, anonimo=data.anonimo)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        return SurveyBeginResponse(asignacion_id=asg.id)
 
-    try:
-
-        asg = crud.get_or_create_auto_asignacion(db, empresa_id=data.empresa_id, anonimo=data.anonimo)
-
-    except ValueError as exc:
-
-        raise HTTPException(status_code=400, detail=str(exc))
-
-    return SurveyBeginResponse(asignacion_id=asg.id)
+    return await db.run_sync(begin)
 
 
 
 # --- Flujo clÃ¡sico (requiere asignaciÃ³n existente) ---
 
 @app.post("/survey/begin", response_model=SurveyBeginResponse)
-
-def survey_begin(
-
+async def survey_begin(
     data: SurveyBeginRequest,
-
-    db: Session = Depends(get_db),
-
-    current: Usuario = Depends(get_current_user),
-
+    db: AsyncSession = Depends(get_async_db),
+    current: Usuario = Depends(get_current_user_async),
 ):
+    def begin(s: Session) -> SurveyBeginResponse:
+        asg = _ensure_assignment_access(s, current, data.asignacion_id)
 
-    asg = _ensure_assignment_access(db, current, data.asignacion_id)
-
-    # bloquear fuera de vigencia (naive UTC)
-
-    if not crud.is_assignment_active(asg, now=datetime.utcnow()):
+        # bloquear fuera de vigencia (naive UTC)
+        if not crud.is_assignment_active(asg, now=datetime.utcnow()):
+            raise HTTPException(status_code=403, detail="AsignaciÃ³n fuera de vigencia")
 
-        raise HTTPException(status_code=403, detail="AsignaciÃ³n fuera de vigencia")
+        return SurveyBeginResponse(asignacion_id=asg.id)
 
-    return SurveyBeginResponse(asignacion_id=asg.id)
+    return await db.run_sync(begin)
 
 
 
 @app.get("/survey/{asignacion_id}/progress", response_model=AssignmentProgress)
-
-def survey_progress(
-
+async def survey_progress(
     asignacion_id: int,
-
     empleado_id: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+    current: Usuario = Depends(get_current_user_async),
+):
+    def load(s: Session) -> AssignmentProgress:
+        _ensure_assignment_access(s, current, asignacion_id)
+        return AssignmentProgress(**crud.compute_assignment_progress(s, asignacion_id, empleado_id))
 
-    db: Session = Depends(get_db),
-
-    current: Usuario = Depends(get_current_user),
+    return await db.run_sync(load)
 
-):
 
-    _ensure_assignment_access(db, current, asignacion_id)
 
-    pr = crud.compute_assignment_progress(db, asignacion_id, empleado_id)
+@app.get("/survey/{asignacion_id}/progress/batch", response_model=AssignmentProgressBatch)
+async def survey_progress_batch(
+    asignacion_id: int,
+    empleado_ids: Optional[List[int]] = Query(None),
+    departamento_id: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+    current: Usuario = Depends(get_current_user_async),
+):
+    """
+    Progreso de varios empleados en una sola llamada (matriz empleado x pilar).
+    Sin filtros usa el alcance de la asignación.
+    """
+    def load(s: Session) -> AssignmentProgressBatch:
+        _ensure_assignment_access(s, current, asignacion_id)
+        try:
+            data = crud.compute_assignment_progress_batch(
+                s,
+                asignacion_id,
+                empleado_ids=empleado_ids,
+                departamento_id=departamento_id,
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        return AssignmentProgressBatch(**data)
 
-    return AssignmentProgress(**pr)
+    return await db.run_sync(load)
 
 
 
 # lista pilares realmente presentes en el cuestionario de la asignaciÃ³n
 
 @app.get("/survey/{asignacion_id}/pillars", response_model=list[PilarRead])
-
-def survey_pillars(
-
+async def survey_pillars(
     asignacion_id: int,
-
-    db: Session = Depends(get_db),
-
-    current: Usuario = Depends(get_current_user),
-
+    db: AsyncSession = Depends(get_async_db),
+    current: Usuario = Depends(get_current_user_async),
 ):
+    def load(s: Session) -> List[PilarRead]:
+        _ensure_assignment_access(s, current, asignacion_id)
+        return [PilarRead.model_validate(p) for p in crud.list_pilares_por_asignacion(s, asignacion_id)]
 
-    _ensure_assignment_access(db, current, asignacion_id)
-
-    return crud.list_pilares_por_asignacion(db, asignacion_id)
+    return await db.run_sync(load)
 
 
 
 @app.get("/survey/{asignacion_id}/pillars/{pilar_id}", response_model=PillarQuestionsResponse)
-
-def survey_pillar_questions(
-
+async def survey_pillar_questions(
     asignacion_id: int,
-
     pilar_id: int,
-
     empleado_id: Optional[int] = Query(None),
-
-    db: Session = Depends(get_db),
-
-    current: Usuario = Depends(get_current_user),
-
+    db: AsyncSession = Depends(get_async_db),
+    current: Usuario = Depends(get_current_user_async),
 ):
+    def load(s: Session) -> PillarQuestionsResponse:
+        asg = _ensure_assignment_access(s, current, asignacion_id)
+        pil = s.get(Pilar, pilar_id)
+        if not pil or (pil.empresa_id is not None and pil.empresa_id != asg.empresa_id):
+            raise HTTPException(status_code=404, detail="Pilar no encontrado")
+
+        preguntas, rmap = crud.get_pilar_questions_with_answers(s, asignacion_id, pilar_id, empleado_id)
+        include_expected = current.rol in (RolEnum.ADMIN_SISTEMA, RolEnum.ADMIN, RolEnum.ANALISTA)
+
+        items = [{
+            "id": q.id,
+            "enunciado": q.enunciado,
+            "tipo": q.tipo,
+            "es_obligatoria": q.es_obligatoria,
+            "peso": q.peso,
+            "respuesta_actual": (rmap[q.id].valor if q.id in rmap else None),
+            "respuesta_esperada": q.respuesta_esperada if include_expected else None,
+            "subpilar_id": q.subpilar_id,  # Incluir subpilar_id para agrupar preguntas por subpilar
+        } for q in preguntas]
+
+        return PillarQuestionsResponse(
+            pilar_id=pil.id,
+            pilar_nombre=pil.nombre,
+            likert_levels=LIKERT_LEVELS,
+            preguntas=items,
+        )
 
-    asg = _ensure_assignment_access(db, current, asignacion_id)
-
-    pil = db.get(Pilar, pilar_id)
-
-    if not pil or (pil.empresa_id is not None and pil.empresa_id != asg.empresa_id):
-
-        raise HTTPException(status_code=404, detail="Pilar no encontrado")
-
+    return await db.run_sync(load)
 
 
-    preguntas, rmap = crud.get_pilar_questions_with_answers(db, asignacion_id, pilar_id, empleado_id)
-    include_expected = current.rol in (RolEnum.ADMIN_SISTEMA, RolEnum.ADMIN, RolEnum.ANALISTA)
 
-    items = [{
-        "id": q.id,
-        "enunciado": q.enunciado,
-        "tipo": q.tipo,
-        "es_obligatoria": q.es_obligatoria,
-        "peso": q.peso,
-        "respuesta_actual": (rmap[q.id].valor if q.id in rmap else None),
-        "respuesta_esperada": q.respuesta_esperada if include_expected else None,
-        "subpilar_id": q.subpilar_id,  # Incluir subpilar_id para agrupar preguntas por subpilar
-    } for q in preguntas]
+@app.get("/survey/{asignacion_id}/full", response_model=SurveyFullResponse)
+async def survey_full(
+    asignacion_id: int,
+    empleado_id: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+    current: Usuario = Depends(get_current_user_async),
+):
+    """
+    Encuesta completa en un solo viaje: pilares, subpilares, preguntas con la
+    respuesta actual y progreso. Equivale a /pillars + /pillars/{id} por pilar
+    + /progress, con los niveles Likert una sola vez.
+    """
+    def load(s: Session) -> SurveyFullResponse:
+        asg = _ensure_assignment_access(s, current, asignacion_id)
+        include_expected = current.rol in (RolEnum.ADMIN_SISTEMA, RolEnum.ADMIN, RolEnum.ANALISTA)
+        data = crud.get_assignment_survey(s, asg, empleado_id, include_expected=include_expected)
+        return SurveyFullResponse.model_validate(data, from_attributes=True)
 
-    return PillarQuestionsResponse(
-        pilar_id=pil.id,
-        pilar_nombre=pil.nombre,
-        likert_levels=LIKERT_LEVELS,
-        preguntas=items,
-    )
+    return await db.run_sync(load)
 
 
 
 @app.get("/analytics/dashboard", response_model=DashboardAnalyticsResponse)
-def analytics_dashboard(
+async def analytics_dashboard(
     empresa_id: Optional[int] = Query(None),
     fecha_desde: Optional[date] = Query(None),
     fecha_hasta: Optional[date] = Query(None),
@@ -2340,8 +2666,8 @@ def analytics_dashboard(
     empleado_ids: Optional[List[int]] = Query(None),
     pilar_ids: Optional[List[int]] = Query(None),
     include_timeline: bool = Query(True),
-    db: Session = Depends(get_db),
-    current: Usuario = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db),
+    current: Usuario = Depends(get_current_user_async),
 ):
     """
     Endpoint para obtener métricas del dashboard de analytics.
@@ -2364,9 +2690,10 @@ def analytics_dashboard(
         # Modo normal: validar acceso a la empresa específica
         _ensure_company_access(current, empresa_id)
     
-    # compute_dashboard_analytics maneja empresa_id=None agrupando datos de todas las empresas
-    data = crud.compute_dashboard_analytics(
-        db,
+    # compute_dashboard_analytics maneja empresa_id=None agrupando datos de todas las empresas;
+    # get_dashboard_analytics lo envuelve con la caché de resultados por filtros
+    data = await db.run_sync(
+        crud.get_dashboard_analytics,
         empresa_id=empresa_id,
         fecha_desde=fecha_desde,
         fecha_hasta=fecha_hasta,
@@ -2378,6 +2705,14 @@ def analytics_dashboard(
     return DashboardAnalyticsResponse(**data)
 
 
+@app.get("/diagnostics/cache-stats")
+def diagnostics_cache_stats(
+    _admin: Usuario = Depends(require_roles(RolEnum.ADMIN_SISTEMA)),
+):
+    """Tamaño y aciertos/fallos de las cachés en memoria y colas de auditoría y de hashing."""
+    return {**crud.cache_stats(), "audit_writer": audit_writer.stats(), "hashing": hashing_stats()}
+
+
 @app.get("/analytics/responses/export")
 def analytics_responses_export(
     empresa_id: int = Query(...),
@@ -2386,19 +2721,9 @@ def analytics_responses_export(
     departamento_ids: Optional[List[int]] = Query(None),
     empleado_ids: Optional[List[int]] = Query(None),
     pilar_ids: Optional[List[int]] = Query(None),
-    db: Session = Depends(get_db),
     current: Usuario = Depends(get_current_user),
 ):
     _ensure_company_access(current, empresa_id)
-    rows = crud.list_responses_for_export(
-        db,
-        empresa_id=empresa_id,
-        fecha_desde=fecha_desde,
-        fecha_hasta=fecha_hasta,
-        departamento_ids=departamento_ids,
-        empleado_ids=empleado_ids,
-        pilar_ids=pilar_ids,
-    )
 
     headers = [
         "respuesta_id",
@@ -2417,32 +2742,28 @@ def analytics_responses_export(
     ]
 
     def iter_rows():
+        # La sesión de get_db se cierra antes de que empiece el streaming,
+        # así que el cursor vive en una sesión propia del generador.
         buffer = io.StringIO()
         writer = csv.writer(buffer)
         writer.writerow(headers)
         yield buffer.getvalue()
         buffer.seek(0)
         buffer.truncate(0)
-        for row in rows:
-            record = [
-                row["respuesta_id"],
-                row["fecha_respuesta"],
-                row["asignacion_id"],
-                row["alcance_tipo"],
-                row["alcance_id"],
-                row["pregunta_id"],
-                row["pregunta_enunciado"],
-                row["pilar_id"],
-                row["pilar_nombre"],
-                row["empleado_id"],
-                row["empleado_nombre"],
-                row["departamento_nombre"],
-                row["valor"],
-            ]
-            writer.writerow(record)
-            yield buffer.getvalue()
-            buffer.seek(0)
-            buffer.truncate(0)
+        with database.ReadSessionLocal() as stream_db:
+            for chunk in crud.iter_responses_for_export(
+                stream_db,
+                empresa_id=empresa_id,
+                fecha_desde=fecha_desde,
+                fecha_hasta=fecha_hasta,
+                departamento_ids=departamento_ids,
+                empleado_ids=empleado_ids,
+                pilar_ids=pilar_ids,
+            ):
+                writer.writerows([row[col] for col in headers] for row in chunk)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
 
     filename = f"respuestas-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.csv"
     return StreamingResponse(
@@ -2453,68 +2774,41 @@ def analytics_responses_export(
 
 
 @app.post("/survey/{asignacion_id}/answers", response_model=BulkAnswersResponse)
-
-def survey_submit_answers(
-
+async def survey_submit_answers(
     asignacion_id: int,
-
     payload: BulkAnswersRequest,
-
     empleado_id: Optional[int] = Query(None),
-
     request: Request = None,
-
-    db: Session = Depends(get_db),
-
-    current: Usuario = Depends(get_current_user),
-
+    db: AsyncSession = Depends(get_async_db),
+    current: Usuario = Depends(get_current_user_async),
 ):
+    def submit(s: Session) -> BulkAnswersResponse:
+        asg = _ensure_assignment_access(s, current, asignacion_id)
+
+        # bloquear fuera de vigencia (naive UTC)
+        if not crud.is_assignment_active(asg, now=datetime.utcnow()):
+            raise HTTPException(status_code=403, detail="Asignación fuera de vigencia")
+
+        # exigir empleado_id si NO es anónimo
+        if not asg.anonimo and empleado_id is None:
+            raise HTTPException(status_code=400, detail="Se requiere empleado_id para esta asignación")
+
+        empresa_id = asg.empresa_id
+        res = crud.submit_bulk_answers(s, asignacion_id, [a.model_dump() for a in payload.respuestas], empleado_id)
+        audit_log(
+            s,
+            action=AuditActionEnum.SURVEY_ANSWER_BULK,
+            current_user=current,
+            empresa_id=empresa_id,
+            entity_type="Asignacion",
+            entity_id=asignacion_id,
+            notes="Guardó respuestas de encuesta",
+            extra={"creadas": res.get("creadas", 0), "actualizadas": res.get("actualizadas", 0)},
+            request=request,
+        )
+        return BulkAnswersResponse(ok=True, creadas=res.get("creadas", 0), actualizadas=res.get("actualizadas", 0))
 
-    asg = _ensure_assignment_access(db, current, asignacion_id)
-
-
-
-    # bloquear fuera de vigencia (naive UTC)
-
-    if not crud.is_assignment_active(asg, now=datetime.utcnow()):
-
-        raise HTTPException(status_code=403, detail="Asignación fuera de vigencia")
-
-
-
-    # exigir empleado_id si NO es anónimo
-
-    if not asg.anonimo and empleado_id is None:
-
-        raise HTTPException(status_code=400, detail="Se requiere empleado_id para esta asignación")
-
-
-
-    res = crud.submit_bulk_answers(db, asignacion_id, [a.model_dump() for a in payload.respuestas], empleado_id)
-
-    audit_log(
-
-        db,
-
-        action=AuditActionEnum.SURVEY_ANSWER_BULK,
-
-        current_user=current,
-
-        empresa_id=asg.empresa_id,
-
-        entity_type="Asignacion",
-
-        entity_id=asignacion_id,
-
-        notes="Guardó respuestas de encuesta",
-
-        extra={"creadas": res.get("creadas", 0), "actualizadas": res.get("actualizadas", 0)},
-
-        request=request,
-
-    )
-
-    return BulkAnswersResponse(ok=True, creadas=res.get("creadas", 0), actualizadas=res.get("actualizadas", 0))
+    return await db.run_sync(submit)
 
 
 
@@ -2530,6 +2824,8 @@ def list_audit_logs(
 
     request: Request,
 
+    response: Response,
+
     date_from: Optional[datetime] = Query(None),
 
     date_to: Optional[datetime] = Query(None),
@@ -2552,7 +2848,9 @@ def list_audit_logs(
 
     offset: int = Query(0, ge=0),
 
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None),
+
+    db: Session = Depends(get_read_db),
 
     current: Usuario = Depends(get_current_user),
 
@@ -2574,6 +2872,26 @@ def list_audit_logs(
 
 
 
+    # Paginación keyset: el cursor codifica (created_at, id) del último registro entregado
+
+    after = None
+
+    if cursor:
+
+        if offset:
+
+            raise HTTPException(status_code=400, detail="No se puede combinar cursor con offset")
+
+        try:
+
+            after = decode_cursor(cursor, (datetime, int))
+
+        except ValueError as exc:
+
+            raise HTTPException(status_code=400, detail=str(exc))
+
+
+
     logs = crud.list_audit_logs(
 
         db,
@@ -2602,8 +2920,14 @@ def list_audit_logs(
 
         offset=offset,
 
+        after=after,
+
     )
 
+    if len(logs) == limit:
+
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(logs[-1].created_at, logs[-1].id)
+
     return logs
 
 
@@ -2677,9 +3001,7 @@ def export_audit_logs(
 
 
 
-    logs = crud.export_audit_logs(
-
-        db,
+    filters = dict(
 
         date_from=date_from,
 
@@ -2703,6 +3025,8 @@ def export_audit_logs(
 
     )
 
+    total, until_id = crud.audit_export_snapshot(db, **filters)
+
 
 
     audit_log(
@@ -2717,7 +3041,7 @@ def export_audit_logs(
 
         entity_type="AuditLog",
 
-        notes=f"Exportó {len(logs)} registros de auditoría",
+        notes=f"Exportó {total} registros de auditoría",
 
         request=request,
 
@@ -2725,42 +3049,6 @@ def export_audit_logs(
 
 
 
-    rows = [
-
-        {
-
-            "id": log.id,
-
-            "created_at": log.created_at.isoformat() if log.created_at else "",
-
-            "empresa_id": log.empresa_id or "",
-
-            "user_email": log.user_email or "",
-
-            "user_role": log.user_role or "",
-
-            "action": log.action.value if hasattr(log.action, "value") else log.action,
-
-            "entity_type": log.entity_type or "",
-
-            "entity_id": log.entity_id or "",
-
-            "notes": log.notes or "",
-
-            "ip": log.ip or "",
-
-            "method": log.method or "",
-
-            "path": log.path or "",
-
-        }
-
-        for log in logs
-
-    ]
-
-
-
     headers = [
 
         "id",
@@ -2805,41 +3093,51 @@ def export_audit_logs(
 
         buffer.truncate(0)
 
-        for row in rows:
+        if until_id is None:
 
-            writer.writerow([
+            return
 
-                row["id"],
+        # Sesión propia: la de get_db ya está cerrada cuando empieza el streaming
 
-                row["created_at"],
+        with database.SessionLocal() as stream_db:
 
-                row["empresa_id"],
+            for chunk in crud.iter_audit_log_chunks(stream_db, until_id=until_id, **filters):
 
-                row["user_email"],
+                for log in chunk:
 
-                row["user_role"],
+                    writer.writerow([
 
-                row["action"],
+                        log["id"],
 
-                row["entity_type"],
+                        log["created_at"].isoformat() if log["created_at"] else "",
 
-                row["entity_id"],
+                        log["empresa_id"] or "",
 
-                row["notes"],
+                        log["user_email"] or "",
 
-                row["ip"],
+                        log["user_role"] or "",
 
-                row["method"],
+                        log["action"].value if hasattr(log["action"], "value") else log["action"],
 
-                row["path"],
+                        log["entity_type"] or "",
 
-            ])
+                        log["entity_id"] or "",
 
-            yield buffer.getvalue()
+                        log["notes"] or "",
 
-            buffer.seek(0)
+                        log["ip"] or "",
 
-            buffer.truncate(0)
+                        log["method"] or "",
+
+                        log["path"] or "",
+
+                    ])
+
+                yield buffer.getvalue()
+
+                buffer.seek(0)
+
+                buffer.truncate(0)
 
 
 
@@ -2866,7 +3164,7 @@ def delete_audit_entry(
 ):
     if current.rol != RolEnum.ADMIN_SISTEMA:
         raise HTTPException(status_code=403, detail="Solo ADMIN_SISTEMA puede eliminar auditorías")
-    if not verify_password(payload.password, current.password_hash):
+    if not _verify_current_password(db, current, payload.password):
         raise HTTPException(status_code=403, detail="Contraseña inválida")
     if not crud.delete_audit_log(db, log_id):
         raise HTTPException(status_code=404, detail="Registro no encontrado")
@@ -2893,68 +3191,66 @@ def backup_and_clear_audit_logs(
     """Genera un CSV de respaldo y luego vacía el registro de auditoría."""
     if current.rol != RolEnum.ADMIN_SISTEMA:
         raise HTTPException(status_code=403, detail="Solo ADMIN_SISTEMA puede vaciar el registro de auditoría")
-    if not verify_password(payload.password, current.password_hash):
+    if not _verify_current_password(db, current, payload.password):
         raise HTTPException(status_code=403, detail="Contraseña inválida")
     
-    import csv
-    import io
-    from datetime import datetime
-    
-    # Leer todos los registros de auditoría
-    logs = crud.list_audit_logs(
-        db,
-        limit=100000,  # Límite alto para obtener todos
-        offset=0,
-    )
-    
-    # Generar CSV en memoria
-    buffer = io.StringIO()
-    writer = csv.writer(buffer)
-    
-    # Encabezados
-    writer.writerow([
-        "id", "created_at", "user_id", "user_email", "user_role", "empresa_id",
-        "action", "entity_type", "entity_id", "notes", "ip", "user_agent",
-        "method", "path"
-    ])
-    
-    # Escribir datos
-    for log in logs:
-        writer.writerow([
-            log.id,
-            log.created_at.isoformat() if log.created_at else "",
-            log.user_id or "",
-            log.user_email or "",
-            log.user_role or "",
-            log.empresa_id or "",
-            log.action.value if log.action else "",
-            log.entity_type or "",
-            log.entity_id or "",
-            log.notes or "",
-            log.ip or "",
-            log.user_agent or "",
-            log.method or "",
-            log.path or "",
-        ])
-    
-    csv_content = buffer.getvalue()
-    buffer.close()
-    
-    # Vaciar el registro
     scope_empresa_id = None
     if current.rol == RolEnum.ADMIN:
         scope_empresa_id = current.empresa_id
     
-    deleted_count = crud.clear_all_audit_logs(db, scope_empresa_id=scope_empresa_id)
+    _, until_id = crud.audit_export_snapshot(db, scope_empresa_id=scope_empresa_id)
+    
+    def iter_backup():
+        # Se recorre por bloques keyset (created_at, id) y cada bloque se borra
+        # recién después de haberse entregado, así un corte a mitad de camino
+        # no elimina registros que no quedaron en el respaldo.
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        
+        # Encabezados
+        writer.writerow([
+            "id", "created_at", "user_id", "user_email", "user_role", "empresa_id",
+            "action", "entity_type", "entity_id", "notes", "ip", "user_agent",
+            "method", "path"
+        ])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+        if until_id is None:
+            return
+        
+        with database.SessionLocal() as stream_db:
+            for chunk in crud.iter_audit_log_chunks(
+                stream_db, scope_empresa_id=scope_empresa_id, until_id=until_id
+            ):
+                for log in chunk:
+                    writer.writerow([
+                        log["id"],
+                        log["created_at"].isoformat() if log["created_at"] else "",
+                        log["user_id"] or "",
+                        log["user_email"] or "",
+                        log["user_role"] or "",
+                        log["empresa_id"] or "",
+                        log["action"].value if log["action"] else "",
+                        log["entity_type"] or "",
+                        log["entity_id"] or "",
+                        log["notes"] or "",
+                        log["ip"] or "",
+                        log["user_agent"] or "",
+                        log["method"] or "",
+                        log["path"] or "",
+                    ])
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate(0)
+                crud.delete_audit_logs_by_ids(stream_db, [log["id"] for log in chunk])
     
     # Generar nombre de archivo con timestamp
     timestamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
     filename = f"auditoria-respaldo-{timestamp}.csv"
     
-    from fastapi.responses import StreamingResponse
-    
     return StreamingResponse(
-        io.BytesIO(csv_content.encode('utf-8')),
+        iter_backup(),
         media_type="text/csv",
         headers={
             "Content-Disposition": f'attachment; filename="{filename}"',
@@ -2971,7 +3267,7 @@ def clear_all_audit_logs(
 ):
     if current.rol != RolEnum.ADMIN_SISTEMA:
         raise HTTPException(status_code=403, detail="Solo ADMIN_SISTEMA puede vaciar el registro de auditoría")
-    if not verify_password(payload.password, current.password_hash):
+    if not _verify_current_password(db, current, payload.password):
         raise HTTPException(status_code=403, detail="Contraseña inválida")
     
     scope_empresa_id = None
@@ -3025,9 +3321,9 @@ def crear_usuario_simple(
 
     """
 
-    # bcrypt compatible con verify_password
+    # bcrypt compatible con verify_password (en el pool acotado de hashing)
 
-    password_hash = pwd_context.hash(password)
+    password_hash = hash_password(password)
 
 
 
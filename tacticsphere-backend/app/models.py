@@ -1,12 +1,12 @@
 from __future__ import annotations
 from enum import Enum
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, date
 
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy import (
     Integer, String, Boolean, Enum as SAEnum, ForeignKey,
-    Text, DateTime, UniqueConstraint, Index, JSON
+    Text, DateTime, Date, Float, UniqueConstraint, Index, JSON
 )
 
 from .database import Base
@@ -122,6 +122,8 @@ class Empleado(Base):
     rut: Mapped[Optional[str]] = mapped_column(String(32), nullable=True, index=True)
     email: Mapped[Optional[str]] = mapped_column(String(200), nullable=True, index=True)
     cargo: Mapped[Optional[str]] = mapped_column(String(120), nullable=True)
+    # nombre + apellidos + email + RUT normalizados; ver app/search.py
+    search_text: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
     empresa_id: Mapped[int] = mapped_column(
         Integer, ForeignKey("empresas.id", ondelete="CASCADE"), nullable=False, index=True
@@ -236,6 +238,8 @@ class Cuestionario(Base):
     titulo: Mapped[str] = mapped_column(String(200), nullable=False)
     version: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
     estado: Mapped[str] = mapped_column(String(50), default="BORRADOR", nullable=False)
+    # Huella (sha256) del conjunto de preguntas global + empresa con que se sincronizó por última vez
+    preguntas_fingerprint: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
 
     empresa: Mapped["Empresa"] = relationship("Empresa", back_populates="cuestionarios")
 
@@ -328,6 +332,8 @@ class Respuesta(Base):
         Integer, ForeignKey("empleados.id", ondelete="SET NULL"), nullable=True, index=True
     )
     valor: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # Puntaje numérico normalizado al escribir (LIKERT 1..5, SI_NO 0..1, ABIERTA None)
+    score: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     fecha_respuesta: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
     asignacion: Mapped["Asignacion"] = relationship("Asignacion", back_populates="respuestas")
@@ -340,6 +346,92 @@ class Respuesta(Base):
         Index("ix_resp_asig_preg", "asignacion_id", "pregunta_id"),
     )
 
+# -----------------------------
+# Contadores de progreso de encuesta
+# -----------------------------
+class ProgressCounter(Base):
+    """
+    Contadores por (asignación, empleado o anónimo, pilar) mantenidos por submit_bulk_answers:
+    respuestas entregadas y suma/cantidad del puntaje normalizado 0..1.
+    Reflejan el mismo ondelete que Respuesta (empleado borrado => empleado_id NULL),
+    por eso las lecturas siempre suman filas en vez de asumir una por grupo.
+    La unicidad va sobre empleado_key (empleado_id al escribir, 0 si es anónima), que nunca
+    es NULL: así el grupo anónimo también es único y admite INSERT ... ON CONFLICT.
+    """
+    __tablename__ = "progress_counters"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    asignacion_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("asignaciones.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    empleado_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("empleados.id", ondelete="SET NULL"), nullable=True, index=True
+    )
+    # empleado_id al escribir o 0 (anónima); no lo toca el SET NULL de empleado_id
+    empleado_key: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    pilar_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("pilares.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    respondidas: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    score_sum: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    score_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("asignacion_id", "empleado_key", "pilar_id", name="uq_progress_asig_emp_pilar"),
+    )
+
+# -----------------------------
+# Agregados diarios para analytics
+# -----------------------------
+class AnalyticsDailyRollup(Base):
+    """
+    Resumen diario de respuestas LIKERT por (empresa, día, pilar, departamento, alcance, empleado).
+    value_sum / weight_sum / level_N ya vienen ponderados por peso de pregunta × peso de pilar,
+    de modo que el dashboard solo suma grupos en vez de recorrer cada respuesta.
+    La unicidad va sobre columnas nunca NULL (empleado_key en vez de empleado_id) para que
+    submit_bulk_answers sume con INSERT ... ON CONFLICT; departamento_id no entra porque se
+    deriva del empleado y del alcance (cambiar el departamento de un empleado recalcula sus grupos).
+    """
+    __tablename__ = "analytics_daily_rollup"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    empresa_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("empresas.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    dia: Mapped[date] = mapped_column(Date, nullable=False)
+    pilar_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("pilares.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    # departamento efectivo: el del empleado o, si no tiene, el alcance DEPARTAMENTO de la asignación
+    departamento_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, index=True)
+    # departamento del alcance de la asignación (0 si no es por DEPARTAMENTO): el filtro por
+    # departamento incluye también a quienes respondieron una asignación de ese departamento
+    alcance_departamento_id: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0", index=True
+    )
+    empleado_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("empleados.id", ondelete="SET NULL"), nullable=True, index=True
+    )
+    # empleado_id al escribir o 0 (anónima / empleado borrado); no lo toca el SET NULL de empleado_id
+    empleado_key: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    anonimo: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+
+    value_sum: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    weight_sum: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    level_1: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    level_2: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    level_3: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    level_4: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    level_5: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "empresa_id", "dia", "pilar_id", "alcance_departamento_id", "empleado_key", "anonimo",
+            name="uq_rollup_grupo",
+        ),
+        Index("ix_rollup_empresa_dia", "empresa_id", "dia"),
+    )
+
 # -----------------------------
 # Umbrales y Recomendaciones por Pilar
 # -----------------------------
@@ -451,3 +543,8 @@ class AuditLog(Base):
     extra: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
 
     user: Mapped[Optional["Usuario"]] = relationship("Usuario", back_populates="audit_logs")
+
+    __table_args__ = (
+        # Orden (created_at, id) de listados, exports y paginación por cursor
+        Index("ix_audit_logs_created_at_id", "created_at", "id"),
+    )
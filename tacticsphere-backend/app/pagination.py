@@ -0,0 +1,80 @@
+"""
+Cursores opacos para paginación keyset.
+
+El cursor es la última clave de orden de la página (p. ej. (created_at, id))
+serializada en JSON y codificada en base64 url-safe; el cliente solo lo
+devuelve tal cual en el siguiente request.
+
+Los listados paginables aceptan además `fields=a,b,c` para proyectar solo
+esas columnas (parse_fields valida contra las permitidas).
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Tamaño de página cuando llega un cursor sin limit, y máximo aceptado
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if hasattr(value, "value"):  # Enum
+        return value.value
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+    return value
+
+
+def encode_cursor(*values: Any) -> str:
+    payload = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> Tuple[Any, ...]:
+    """
+    Decodifica un cursor cuyos valores deben ser de los tipos indicados
+    (None se acepta en cualquier posición); ValueError si está mal formado.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        if not isinstance(raw, list) or len(raw) != len(types):
+            raise ValueError
+        values = tuple(_decode_value(v) for v in raw)
+        for value, expected in zip(values, types):
+            if value is not None and not isinstance(value, expected):
+                raise ValueError
+        return values
+    except (ValueError, TypeError, KeyError, binascii.Error, UnicodeError):
+        raise ValueError("Cursor inválido") from None
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> Optional[List[str]]:
+    """'id,nombre' -> ['id', 'nombre'] (sin repetidos); ValueError si alguno no está permitido."""
+    if fields is None:
+        return None
+    selected: List[str] = []
+    for name in (part.strip() for part in fields.split(",")):
+        if not name or name in selected:
+            continue
+        if name not in allowed:
+            raise ValueError(f"Campo no disponible: {name}. Permitidos: {', '.join(allowed)}")
+        selected.append(name)
+    if not selected:
+        raise ValueError("fields no puede estar vacío")
+    return selected
@@ -135,6 +135,16 @@ class EmpleadoRead(BaseModel):
     cargo: Optional[str] = None
     model_config = ConfigDict(from_attributes=True)
 
+class EmpleadoImportError(BaseModel):
+    linea: int
+    error: str
+
+class EmpleadoImportResult(BaseModel):
+    filas: int
+    creados: int
+    total_errores: int
+    errores: List[EmpleadoImportError]  # hasta EMPLEADO_IMPORT_MAX_ERRORS
+
 # ======================================================
 # PILARES / PREGUNTAS
 # ======================================================
@@ -168,6 +178,10 @@ class PreguntaCreate(BaseModel):
     respuesta_esperada: Optional[str] = Field(default=None, max_length=500)
 
 
+class PreguntaBulkCreate(BaseModel):
+    preguntas: List[PreguntaCreate] = Field(min_length=1, max_length=1000)
+
+
 class PreguntaUpdate(BaseModel):
     enunciado: Optional[str] = None
     tipo: Optional[TipoPreguntaEnum] = None
@@ -402,6 +416,54 @@ class AssignmentProgress(BaseModel):
     por_pilar: List[PillarProgress]
 
 
+# --- Encuesta completa de una asignación en una sola llamada ---
+class SurveyFullQuestion(SurveyQuestionRead):
+    subpilar_id: Optional[int] = None
+
+
+class SurveyFullPillar(BaseModel):
+    id: int
+    empresa_id: Optional[int] = None
+    nombre: str
+    descripcion: Optional[str] = None
+    peso: int
+    subpilares: List[SubpilarRead]
+    preguntas: List[SurveyFullQuestion]
+
+
+class SurveyFullResponse(BaseModel):
+    asignacion_id: int
+    empleado_id: Optional[int] = None
+    likert_levels: List[LikertLevel]
+    pilares: List[SurveyFullPillar]
+    progreso: AssignmentProgress
+
+
+class ProgressBatchPillar(BaseModel):
+    pilar_id: int
+    pilar_nombre: str
+    total: int
+
+
+class EmployeeProgressRow(BaseModel):
+    empleado_id: int
+    nombre: str
+    departamento_id: Optional[int] = None
+    respondidas: int
+    progreso: float       # 0..1
+    completion: float     # 0..1
+    # Alineados con AssignmentProgressBatch.pilares (misma posición = mismo pilar)
+    respondidas_por_pilar: List[int]
+    progreso_por_pilar: List[float]
+
+
+class AssignmentProgressBatch(BaseModel):
+    asignacion_id: int
+    total: int
+    pilares: List[ProgressBatchPillar]
+    empleados: List[EmployeeProgressRow]
+
+
 class PillarHighlight(BaseModel):
     id: int
     name: str
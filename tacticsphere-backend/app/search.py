@@ -0,0 +1,236 @@
+"""
+Índices de búsqueda de texto.
+
+- SQLite: tablas FTS5 con tokenizer trigram (búsqueda por subcadena, sin
+  distinguir mayúsculas) en modo external content, sincronizadas con triggers
+  sobre la tabla base.
+- PostgreSQL: índices GIN pg_trgm sobre lower(col), que sirven directamente
+  los `lower(col) LIKE '%x%'` de siempre.
+
+Empleados se buscan sobre una sola columna, empleados.search_text: nombre,
+apellidos, email y RUT normalizados (minúsculas, sin tildes, RUT sin puntos ni
+guion). La escriben create_empleado/update_empleado y al arrancar se completan
+las filas que la tengan vacía.
+
+Si el índice no existe o el motor no lo soporta, las consultas vuelven al LIKE.
+"""
+import logging
+import re
+import threading
+import unicodedata
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, case, column, func, inspect, or_, select, table, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from .models import AuditLog, Empleado
+
+logger = logging.getLogger("tacticsphere.search")
+
+# El tokenizer trigram no indexa consultas de menos de 3 caracteres
+FTS_MIN_CHARS = 3
+
+AUDIT_FTS_TABLE = "audit_logs_fts"
+AUDIT_SEARCH_COLUMNS = ("notes", "user_email", "entity_type", "path")
+
+EMPLEADO_FTS_TABLE = "empleados_fts"
+EMPLEADO_SEARCH_COLUMNS = ("search_text",)
+EMPLEADO_BACKFILL_CHUNK_SIZE = 1000
+
+# Consulta con forma de RUT (12.345.678-k, 12345678, 12.345): se compara sin puntos ni guion
+_RUT_QUERY = re.compile(r"^[0-9.\-]*[0-9][0-9.\-]*k?$")
+
+_fts_available: Dict[Tuple[str, str], bool] = {}
+_fts_lock = threading.Lock()
+
+
+def _sqlite_fts_ddl(fts_table: str, base_table: str, columns: Tuple[str, ...]) -> list:
+    cols = ", ".join(columns)
+    new_vals = ", ".join(f"new.{c}" for c in columns)
+    old_vals = ", ".join(f"old.{c}" for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+        f"{cols}, content='{base_table}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {base_table} BEGIN "
+        f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_vals}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {base_table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_vals}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE ON {base_table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_vals}); "
+        f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_vals}); END",
+    ]
+
+
+def ensure_sqlite_fts(conn: Connection, fts_table: str, base_table: str, columns: Tuple[str, ...]) -> bool:
+    """Crea (si falta) la tabla FTS5 + triggers y la puebla desde la tabla base."""
+    existing = set(inspect(conn).get_table_names())
+    if base_table not in existing:
+        return False
+    try:
+        for ddl in _sqlite_fts_ddl(fts_table, base_table, columns):
+            conn.exec_driver_sql(ddl)
+        if fts_table not in existing:
+            conn.exec_driver_sql(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+    except Exception:
+        logger.warning("FTS5 trigram no disponible para %s; se usará LIKE", base_table, exc_info=True)
+        return False
+    return True
+
+
+def ensure_postgres_trgm(conn: Connection, base_table: str, columns: Tuple[str, ...]) -> bool:
+    """Crea la extensión pg_trgm (si hay permisos) y un índice GIN por columna."""
+    if base_table not in inspect(conn).get_table_names():
+        return False
+    try:
+        with conn.begin_nested():
+            conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for col in columns:
+                conn.exec_driver_sql(
+                    f"CREATE INDEX IF NOT EXISTS ix_{base_table}_{col}_trgm "
+                    f"ON {base_table} USING gin (lower({col}) gin_trgm_ops)"
+                )
+    except Exception:
+        logger.warning("pg_trgm no disponible para %s; se usará LIKE sin índice", base_table, exc_info=True)
+        return False
+    return True
+
+
+def normalize_search_text(value: Optional[str]) -> str:
+    """Minúsculas, sin tildes ni diacríticos y con espacios colapsados."""
+    text = unicodedata.normalize("NFKD", value or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+def normalize_rut(value: Optional[str]) -> str:
+    """RUT sin puntos, guion ni espacios: '12.345.678-K' -> '12345678k'."""
+    return re.sub(r"[^0-9k]", "", normalize_search_text(value))
+
+
+def empleado_search_text(
+    nombre: Optional[str],
+    apellidos: Optional[str],
+    email: Optional[str],
+    rut: Optional[str],
+) -> str:
+    parts = (
+        normalize_search_text(nombre),
+        normalize_search_text(apellidos),
+        normalize_search_text(email),
+        normalize_rut(rut),
+    )
+    return " ".join(part for part in parts if part)
+
+
+def normalize_search_query(search: str) -> str:
+    term = normalize_search_text(search)
+    if _RUT_QUERY.match(term):
+        term = normalize_rut(term)
+    return term
+
+
+def backfill_empleado_search_text(conn: Connection) -> int:
+    """Completa search_text en empleados creados sin pasar por crud (seeds, imports)."""
+    stmt = (
+        select(Empleado.id, Empleado.nombre, Empleado.apellidos, Empleado.email, Empleado.rut)
+        .where(Empleado.search_text.is_(None))
+        .order_by(Empleado.id)
+        .limit(EMPLEADO_BACKFILL_CHUNK_SIZE)
+    )
+    total = 0
+    while True:
+        rows = conn.execute(stmt).all()
+        if not rows:
+            return total
+        conn.execute(
+            update(Empleado.__table__)
+            .where(Empleado.__table__.c.id == bindparam("b_id"))
+            .values(search_text=bindparam("b_search_text")),
+            [
+                {"b_id": row.id, "b_search_text": empleado_search_text(row.nombre, row.apellidos, row.email, row.rut)}
+                for row in rows
+            ],
+        )
+        total += len(rows)
+
+
+def _has_column(conn: Connection, table_name: str, column_name: str) -> bool:
+    inspector = inspect(conn)
+    if table_name not in inspector.get_table_names():
+        return False
+    return column_name in {col["name"] for col in inspector.get_columns(table_name)}
+
+
+def ensure_search_indexes(engine: Engine) -> None:
+    """Idempotente; se llama al arrancar después de create_all."""
+    with engine.begin() as conn:
+        # Sin la migración de search_text, los triggers de FTS romperían los INSERT en empleados
+        empleados_ready = _has_column(conn, "empleados", "search_text")
+        if empleados_ready:
+            backfill_empleado_search_text(conn)
+        if conn.dialect.name == "sqlite":
+            ok = ensure_sqlite_fts(conn, AUDIT_FTS_TABLE, "audit_logs", AUDIT_SEARCH_COLUMNS)
+            with _fts_lock:
+                _fts_available[(str(engine.url), AUDIT_FTS_TABLE)] = ok
+            if empleados_ready:
+                ok = ensure_sqlite_fts(conn, EMPLEADO_FTS_TABLE, "empleados", EMPLEADO_SEARCH_COLUMNS)
+                with _fts_lock:
+                    _fts_available[(str(engine.url), EMPLEADO_FTS_TABLE)] = ok
+        elif conn.dialect.name == "postgresql":
+            ensure_postgres_trgm(conn, "audit_logs", AUDIT_SEARCH_COLUMNS)
+            if empleados_ready:
+                ensure_postgres_trgm(conn, "empleados", EMPLEADO_SEARCH_COLUMNS)
+
+
+def fts_available(db: Session, fts_table: str) -> bool:
+    bind = db.get_bind()
+    if bind.dialect.name != "sqlite":
+        return False
+    key = (str(bind.engine.url), fts_table)
+    with _fts_lock:
+        cached = _fts_available.get(key)
+    if cached is None:
+        cached = fts_table in inspect(bind).get_table_names()
+        with _fts_lock:
+            _fts_available[key] = cached
+    return cached
+
+
+def fts_phrase(term: str) -> str:
+    """Consulta FTS5 que busca `term` literal como frase (subcadena con trigram)."""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def audit_search_condition(db: Session, search: str):
+    """
+    Condición para /audit?search=: subcadena sin distinguir mayúsculas en notes,
+    user_email, entity_type o path. En SQLite usa la tabla FTS5 si existe.
+    """
+    if len(search) >= FTS_MIN_CHARS and fts_available(db, AUDIT_FTS_TABLE):
+        fts = table(AUDIT_FTS_TABLE, column("rowid"), column(AUDIT_FTS_TABLE))
+        matches = select(fts.c.rowid).where(fts.c[AUDIT_FTS_TABLE].match(fts_phrase(search)))
+        return AuditLog.id.in_(matches)
+    pattern = f"%{search.lower()}%"
+    return or_(*(func.lower(getattr(AuditLog, name)).like(pattern) for name in AUDIT_SEARCH_COLUMNS))
+
+
+def empleado_search_condition(db: Session, term: str):
+    """
+    Condición para buscar empleados por `term` ya normalizado (normalize_search_query)
+    como subcadena de search_text. En SQLite usa la tabla FTS5 si existe.
+    """
+    if len(term) >= FTS_MIN_CHARS and fts_available(db, EMPLEADO_FTS_TABLE):
+        fts = table(EMPLEADO_FTS_TABLE, column("rowid"), column(EMPLEADO_FTS_TABLE))
+        matches = select(fts.c.rowid).where(fts.c[EMPLEADO_FTS_TABLE].match(fts_phrase(term)))
+        return Empleado.id.in_(matches)
+    return func.lower(Empleado.search_text).like(f"%{term}%")
+
+
+def empleado_search_rank(term: str):
+    """0 si el nombre empieza por el término, 1 si alguna palabra empieza por él, 2 si lo contiene."""
+    return case(
+        (Empleado.search_text.like(f"{term}%"), 0),
+        (Empleado.search_text.like(f"% {term}%"), 1),
+        else_=2,
+    )
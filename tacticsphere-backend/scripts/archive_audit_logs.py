@@ -0,0 +1,43 @@
+"""
+Archiva en CSV comprimidos (AUDIT_ARCHIVE_DIR) y elimina los meses de auditoría
+anteriores a la ventana de retención. En PostgreSQL además crea las particiones
+mensuales de los próximos meses.
+
+Uso:
+    python scripts/archive_audit_logs.py          # usa AUDIT_RETENTION_MONTHS
+    python scripts/archive_audit_logs.py 12       # conserva los últimos 12 meses
+"""
+from pathlib import Path
+import sys
+
+# Ensure project root is on sys.path
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.append(str(BACKEND_ROOT))
+
+from app.database import SessionLocal, engine
+from app.audit_retention import AUDIT_RETENTION_MONTHS, ensure_audit_partitions, run_audit_retention
+
+
+def main():
+    months = int(sys.argv[1]) if len(sys.argv) > 1 else AUDIT_RETENTION_MONTHS
+    with engine.begin() as conn:
+        created = ensure_audit_partitions(conn)
+    if created:
+        print(f"[OK] {created} particiones nuevas de auditoría.")
+    if months <= 0:
+        print("[INFO] Retención desactivada (AUDIT_RETENTION_MONTHS=0); no se archiva nada.")
+        return
+    db = SessionLocal()
+    try:
+        for result in run_audit_retention(db, retention_months=months):
+            print(f"[OK] {result['month']}: {result['archived']} registros -> {result['file'] or '(vacío)'}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,7 @@ if str(BACKEND_ROOT) not in sys.path:
 
 from sqlalchemy import select, func
 from app.database import SessionLocal
+from app.crud import refresh_analytics_rollup, refresh_progress_counters
 from app.models import Empleado, Respuesta
 
 def clear_employees():
@@ -47,6 +48,9 @@ def clear_employees():
         
         db.flush()
         print(f"   ✓ {len(empleados_eliminados)} empleados eliminados")
+
+        refresh_progress_counters(db, commit=False)
+        refresh_analytics_rollup(db, commit=False)
         
         db.commit()
         print("✅ Empleados y respuestas eliminados correctamente.")
@@ -20,6 +20,7 @@ if str(BACKEND_ROOT) not in sys.path:
 
 from sqlalchemy import select
 from app.database import SessionLocal
+from app.crud import refresh_analytics_rollup, refresh_progress_counters, refresh_respuesta_scores
 from app.models import (
     Usuario, Empresa, Departamento, Empleado,
     Pilar, Pregunta, Cuestionario, CuestionarioPregunta,
@@ -305,6 +306,11 @@ def main():
                 total_imported += imported
                 total_skipped += skipped
                 total_errors += errors
+
+        # Recalcular puntajes, contadores de progreso y rollup de analytics a partir de las respuestas importadas
+        refresh_respuesta_scores(db, only_missing=True, commit=False)
+        refresh_progress_counters(db, commit=False)
+        refresh_analytics_rollup(db)
         
         print("=" * 50)
         print(f"[OK] Importacion completada:")
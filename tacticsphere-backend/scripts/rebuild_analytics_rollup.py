@@ -0,0 +1,46 @@
+"""
+Reconstruye la tabla analytics_daily_rollup, los contadores de progreso y los Respuesta.score
+faltantes a partir de las respuestas existentes.
+Usar después de cargar respuestas por fuera de la API (scripts, SQL manual, etc.).
+
+Uso:
+    python scripts/rebuild_analytics_rollup.py            # todas las empresas
+    python scripts/rebuild_analytics_rollup.py 3          # solo la empresa 3
+"""
+from pathlib import Path
+import sys
+
+# Ensure project root is on sys.path
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.append(str(BACKEND_ROOT))
+
+from sqlalchemy import select
+
+from app.database import SessionLocal
+from app.models import Asignacion
+from app.crud import refresh_analytics_rollup, refresh_progress_counters, refresh_respuesta_scores
+
+
+def main():
+    empresa_id = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    db = SessionLocal()
+    try:
+        refresh_respuesta_scores(db, only_missing=True, commit=False)
+        if empresa_id is None:
+            refresh_progress_counters(db, commit=False)
+        else:
+            for asignacion_id in db.scalars(select(Asignacion.id).where(Asignacion.empresa_id == empresa_id)):
+                refresh_progress_counters(db, asignacion_id=asignacion_id, commit=False)
+        grupos = refresh_analytics_rollup(db, empresa_id=empresa_id)
+        alcance = f"empresa {empresa_id}" if empresa_id is not None else "todas las empresas"
+        print(f"[OK] Rollup reconstruido para {alcance}: {grupos} grupos.")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
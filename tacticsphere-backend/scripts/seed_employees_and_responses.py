@@ -22,6 +22,7 @@ if str(BACKEND_ROOT) not in sys.path:
     sys.path.append(str(BACKEND_ROOT))
 
 from app.database import SessionLocal
+from app.crud import refresh_analytics_rollup, refresh_progress_counters, refresh_respuesta_scores
 from app.models import (
     Empresa, Departamento, Empleado, Pregunta, Asignacion, Respuesta, CuestionarioPregunta
 )
@@ -366,6 +367,11 @@ def main():
                 respuestas = crear_respuestas_para_empleados(db, empresa, empleados)
                 total_respuestas += len(respuestas)
         
+        # Recalcular puntajes, contadores de progreso y rollup de analytics (las respuestas se insertaron directamente)
+        refresh_respuesta_scores(db, only_missing=True, commit=False)
+        refresh_progress_counters(db, commit=False)
+        refresh_analytics_rollup(db, commit=False)
+
         # Commit final
         db.commit()
         
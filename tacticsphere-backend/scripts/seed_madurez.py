@@ -25,6 +25,7 @@ if str(BACKEND_ROOT) not in sys.path:
     sys.path.append(str(BACKEND_ROOT))
 
 from app.database import SessionLocal
+from app.crud import refresh_analytics_rollup, refresh_progress_counters, refresh_respuesta_scores
 from app.models import (
     Empresa,
     Departamento,
@@ -1125,6 +1126,11 @@ def main():
         # Paso 7: Crear umbrales
         crear_umbrales_pilares(session, pilares)
         
+        # Recalcular puntajes, contadores de progreso y rollup de analytics (las respuestas se insertaron directamente)
+        refresh_respuesta_scores(session, only_missing=True, commit=False)
+        refresh_progress_counters(session, commit=False)
+        refresh_analytics_rollup(session, commit=False)
+
         # Commit final
         session.commit()
         